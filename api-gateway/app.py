@@ -4,7 +4,13 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
 from modelos import db
-from vistas import VistaBusquedaGateway, VistaBusquedaGatewayNaive
+from metricas import instrumentar_app, memorizar, registro
+from vistas import VistaBusquedaGateway, VistaBusquedaGatewayNaive, VistaCircuitoGateway
+from vistas.vistas import breaker_busqueda
+from hedging import hedger
+from cache_respuestas import cache_respuestas
+
+ESTADOS_CIRCUITO = {"cerrado": 0, "medio_abierto": 1, "abierto": 2}
 
 def create_flask_app():
     app = Flask(__name__)
@@ -24,15 +30,51 @@ def create_flask_app():
     
     api = Api(app)
     api.add_resource(VistaBusquedaGateway, '/search')
+    api.add_resource(VistaCircuitoGateway, '/search/circuito')
     # Naive endpoint (sin tácticas)
     api.add_resource(VistaBusquedaGatewayNaive, '/search/naive')
     
     jwt = JWTManager(app)
+    db.init_app(app)
+
+    # Latencia por endpoint, requests en vuelo, tiempo de DB y GET /metrics
+    instrumentar_app(app)
+    registrar_metricas()
 
     return app
 
-app = create_flask_app()
-db.init_app(app)
+def registrar_metricas():
+    # Estado del Circuit Breaker, hedging y cache SWR (se calculan al consultar /metrics)
+    circuito = memorizar(breaker_busqueda.estadisticas)
+    registro.gauge(
+        "circuit_breaker_state", "Estado del circuito (0 cerrado, 1 medio abierto, 2 abierto).", ("circuito",),
+        funcion=lambda: {("busqueda",): ESTADOS_CIRCUITO[circuito()["estado"]]},
+    )
+    registro.gauge(
+        "circuit_breaker_error_rate", "Tasa de errores en la ventana del circuito.", ("circuito",),
+        funcion=lambda: {("busqueda",): circuito()["tasa_errores"]},
+    )
+    registro.gauge(
+        "circuit_breaker_slow_call_rate", "Tasa de llamadas lentas en la ventana del circuito.", ("circuito",),
+        funcion=lambda: {("busqueda",): circuito()["tasa_lentas"]},
+    )
+    registro.gauge(
+        "hedge_requests_total", "Búsquedas con hedging por tipo (solicitudes, hedges, hedges_ganadores).", ("tipo",),
+        funcion=lambda: {
+            (tipo,): valor for tipo, valor in hedger.estadisticas().items()
+            if tipo in ("solicitudes", "hedges", "hedges_ganadores")
+        },
+        tipo="counter",
+    )
+    registro.gauge(
+        "swr_cache_total", "Consultas al cache stale-while-revalidate por resultado.", ("resultado",),
+        funcion=lambda: {
+            (resultado,): valor for resultado, valor in cache_respuestas.estadisticas().items() if resultado != "entradas"
+        },
+        tipo="counter",
+    )
 
 if __name__ == "__main__":
+    # Servidor de desarrollo (un proceso). En producción: gunicorn -c gunicorn.conf.py wsgi:app
+    app = create_flask_app()
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5007)), debug=False)
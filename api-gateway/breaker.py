@@ -0,0 +1,229 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import functools
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin flock (y sin gunicorn), un solo proceso usa el archivo
+    fcntl = None
+
+# Ventana deslizante (segundos) sobre la que se calculan las tasas de error y de lentitud.
+BREAKER_VENTANA_SEGUNDOS = int(os.environ.get("BREAKER_VENTANA_SEGUNDOS", 30))
+# Se abre si, con al menos `min_llamadas` en la ventana, alguna tasa alcanza su umbral.
+BREAKER_UMBRAL_ERRORES = float(os.environ.get("BREAKER_UMBRAL_ERRORES", 0.5))
+BREAKER_UMBRAL_LENTAS = float(os.environ.get("BREAKER_UMBRAL_LENTAS", 0.5))
+# Una llamada exitosa que tarda más que esto cuenta como lenta.
+BREAKER_LLAMADA_LENTA_MS = float(os.environ.get("BREAKER_LLAMADA_LENTA_MS", 1000))
+# Medio abierto: sondeos admitidos a la vez, y sondeos exitosos seguidos para cerrar.
+BREAKER_SONDEOS = int(os.environ.get("BREAKER_SONDEOS", 2))
+# Un sondeo que no reporta resultado en este tiempo deja de ocupar su cupo.
+BREAKER_SONDEO_TIMEOUT = float(os.environ.get("BREAKER_SONDEO_TIMEOUT", 10))
+# Backoff de recuperación: cada reapertura desde medio abierto duplica la espera, hasta este máximo.
+BREAKER_RECUPERACION_MAX = float(os.environ.get("BREAKER_RECUPERACION_MAX", 300))
+# Archivo de estado compartido por los workers del gateway en el mismo host (memoria compartida si existe).
+BREAKER_ESTADO_DIR = os.environ.get(
+    "BREAKER_ESTADO_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+)
+
+_lock_local = threading.Lock()
+
+CERRADO = 'cerrado'
+ABIERTO = 'abierto'
+MEDIO_ABIERTO = 'medio_abierto'
+
+
+class BreakerAdaptativo:
+    """
+    Circuit breaker por tasas sobre una ventana deslizante (H3).
+
+    - Cerrado: registra cada llamada en buckets de 1 segundo; se abre si la tasa de errores
+      o de llamadas lentas (> BREAKER_LLAMADA_LENTA_MS) alcanza su umbral.
+    - Abierto: todas las llamadas van al fallback hasta que vence la espera de recuperación.
+    - Medio abierto: sólo BREAKER_SONDEOS llamadas a la vez llegan al servicio; si todas
+      salen bien se cierra, y ante el primer fallo vuelve a abrir con el doble de espera.
+
+    El estado vive en un archivo JSON protegido con flock: todos los workers del gateway
+    comparten lo que aprendió cualquiera de ellos. Cada llamada hace una actualización
+    bajo lock antes (`permitir`) y otra después (`registrar`).
+    """
+    def __init__(self, nombre, min_llamadas, recuperacion, fallback_function=None):
+        self.nombre = nombre
+        self.min_llamadas = min_llamadas
+        self.recuperacion = recuperacion
+        self.fallback_function = fallback_function
+        self.ruta = os.path.join(BREAKER_ESTADO_DIR, f"travelhub_breaker_{nombre}.json")
+
+    # ------------------------------------------------------------------
+    # Estado compartido
+    # ------------------------------------------------------------------
+    def _estado_inicial(self):
+        return {
+            "estado": CERRADO,
+            "ventana": [],  # [segundo, llamadas, errores, lentas]
+            "abierto_hasta": 0.0,
+            "espera": self.recuperacion,
+            "sondeos": [],  # vencimiento de cada sondeo en vuelo
+            "sondeos_ok": 0,
+            "aperturas": 0,
+        }
+
+    @staticmethod
+    @contextmanager
+    def _lock_exclusivo(f):
+        if fcntl is None:
+            with _lock_local:
+                yield
+            return
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _actualizar(self, cambio):
+        """Aplica `cambio(estado, ahora)` al estado compartido bajo lock exclusivo y retorna su resultado."""
+        with open(self.ruta, "a+") as f, self._lock_exclusivo(f):
+            f.seek(0)
+            crudo = f.read()
+            try:
+                estado = json.loads(crudo) if crudo else self._estado_inicial()
+            except ValueError:
+                estado = self._estado_inicial()
+            resultado = cambio(estado, time.time())
+            nuevo = json.dumps(estado)
+            if nuevo != crudo:
+                # Circuito cerrado y sin cambios (el caso común de `permitir`): no se reescribe
+                f.seek(0)
+                f.truncate()
+                f.write(nuevo)
+                f.flush()
+            return resultado
+
+    def _abrir(self, estado, ahora, motivo):
+        estado["estado"] = ABIERTO
+        estado["abierto_hasta"] = ahora + estado["espera"]
+        estado["sondeos"] = []
+        estado["sondeos_ok"] = 0
+        estado["aperturas"] += 1
+        print(f"Circuit '{self.nombre}' opened for {estado['espera']:.0f}s ({motivo})")
+
+    @staticmethod
+    def _tasas(estado, ahora):
+        desde = int(ahora) - BREAKER_VENTANA_SEGUNDOS
+        estado["ventana"] = [b for b in estado["ventana"] if b[0] > desde]
+        llamadas = sum(b[1] for b in estado["ventana"])
+        errores = sum(b[2] for b in estado["ventana"])
+        lentas = sum(b[3] for b in estado["ventana"])
+        return llamadas, (errores / llamadas if llamadas else 0.0), (lentas / llamadas if llamadas else 0.0)
+
+    # ------------------------------------------------------------------
+    # Transiciones
+    # ------------------------------------------------------------------
+    def permitir(self):
+        """
+        Retorna (permitida, es_sondeo). (True, False) significa circuito cerrado: el llamador
+        puede usar su cache; un sondeo debe llegar al servicio y reportarse con `registrar`.
+        """
+        def cambio(estado, ahora):
+            if estado["estado"] == CERRADO:
+                return True, False
+            if estado["estado"] == ABIERTO:
+                if ahora < estado["abierto_hasta"]:
+                    return False, False
+                estado["estado"] = MEDIO_ABIERTO
+                estado["sondeos"] = []
+                estado["sondeos_ok"] = 0
+            estado["sondeos"] = [vence for vence in estado["sondeos"] if vence > ahora]
+            if len(estado["sondeos"]) >= BREAKER_SONDEOS:
+                return False, False
+            estado["sondeos"].append(ahora + BREAKER_SONDEO_TIMEOUT)
+            return True, True
+        return self._actualizar(cambio)
+
+    def registrar(self, exito, duracion_ms, sondeo=False):
+        lenta = duracion_ms > BREAKER_LLAMADA_LENTA_MS
+
+        def cambio(estado, ahora):
+            if sondeo:
+                if estado["estado"] != MEDIO_ABIERTO:
+                    return
+                if estado["sondeos"]:
+                    estado["sondeos"].pop(0)
+                if not exito or lenta:
+                    estado["espera"] = min(estado["espera"] * 2, BREAKER_RECUPERACION_MAX)
+                    self._abrir(estado, ahora, "half-open probe failed" if not exito else "half-open probe slow")
+                    return
+                estado["sondeos_ok"] += 1
+                if estado["sondeos_ok"] >= BREAKER_SONDEOS:
+                    estado.update(self._estado_inicial(), aperturas=estado["aperturas"])
+                    print(f"Circuit '{self.nombre}' closed after {BREAKER_SONDEOS} successful probes")
+                return
+
+            if estado["estado"] != CERRADO:
+                return
+            segundo = int(ahora)
+            if not estado["ventana"] or estado["ventana"][-1][0] != segundo:
+                estado["ventana"].append([segundo, 0, 0, 0])
+            bucket = estado["ventana"][-1]
+            bucket[1] += 1
+            bucket[2] += 0 if exito else 1
+            bucket[3] += 1 if exito and lenta else 0
+
+            llamadas, tasa_errores, tasa_lentas = self._tasas(estado, ahora)
+            if llamadas < self.min_llamadas:
+                return
+            if tasa_errores >= BREAKER_UMBRAL_ERRORES:
+                self._abrir(estado, ahora, f"error rate {tasa_errores:.0%} over {llamadas} calls")
+            elif tasa_lentas >= BREAKER_UMBRAL_LENTAS:
+                self._abrir(estado, ahora, f"slow-call rate {tasa_lentas:.0%} over {llamadas} calls")
+        self._actualizar(cambio)
+
+    @property
+    def opened(self):
+        """True mientras el circuito no está cerrado (abierto o medio abierto)."""
+        return self.estadisticas()["estado"] != CERRADO
+
+    def estadisticas(self):
+        def cambio(estado, ahora):
+            llamadas, tasa_errores, tasa_lentas = self._tasas(estado, ahora)
+            return {
+                "estado": estado["estado"],
+                "llamadas_ventana": llamadas,
+                "tasa_errores": round(tasa_errores, 3),
+                "tasa_lentas": round(tasa_lentas, 3),
+                "reintento_en_segundos": round(max(estado["abierto_hasta"] - ahora, 0), 1),
+                "espera_recuperacion": estado["espera"],
+                "aperturas": estado["aperturas"],
+            }
+        return self._actualizar(cambio)
+
+    # ------------------------------------------------------------------
+    # Decorador
+    # ------------------------------------------------------------------
+    def ejecutar(self, permiso, function, *args, **kwargs):
+        """Ejecuta `function` con un permiso ya obtenido de `permitir` y registra el resultado."""
+        permitida, sondeo = permiso
+        if not permitida:
+            if self.fallback_function:
+                return self.fallback_function(*args, **kwargs)
+            raise RuntimeError(f"Circuit '{self.nombre}' is open")
+        inicio = time.perf_counter()
+        try:
+            resultado = function(*args, **kwargs)
+        except Exception:
+            self.registrar(False, (time.perf_counter() - inicio) * 1000, sondeo)
+            raise
+        self.registrar(True, (time.perf_counter() - inicio) * 1000, sondeo)
+        return resultado
+
+    def __call__(self, function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            return self.ejecutar(self.permitir(), function, *args, **kwargs)
+        # Para quien ya llamó a `permitir` (p. ej. para decidir si sirve desde cache)
+        wrapper.con_permiso = lambda permiso, *args, **kwargs: self.ejecutar(permiso, function, *args, **kwargs)
+        return wrapper
@@ -0,0 +1,98 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+
+# Máximo de búsquedas distintas en memoria (LRU).
+SWR_MAX_ENTRADAS = int(os.environ.get("SWR_MAX_ENTRADAS", 256))
+# Antigüedad hasta la que una respuesta se sirve sin consultar a Búsqueda.
+SWR_FRESH_SECONDS = float(os.environ.get("SWR_FRESH_SECONDS", 5))
+# Antigüedad máxima de una respuesta servida como stale (circuito abierto o Búsqueda fallando).
+SWR_MAX_STALE = float(os.environ.get("SWR_MAX_STALE", 3600))
+
+
+class Entrada:
+    def __init__(self, datos):
+        self.datos = datos
+        self.guardado_en = time.time()
+
+    def antiguedad(self):
+        return time.time() - self.guardado_en
+
+    def fresca(self):
+        return self.antiguedad() <= SWR_FRESH_SECONDS
+
+    def utilizable(self):
+        return self.antiguedad() <= SWR_MAX_STALE
+
+
+class CacheSWR:
+    """
+    Cache stale-while-revalidate de las últimas respuestas buenas de Búsqueda (H3).
+
+    - Fresca (< SWR_FRESH_SECONDS): se sirve directo desde memoria.
+    - Stale (< SWR_MAX_STALE): se sirve y se revalida en segundo plano; una sola
+      revalidación en vuelo por clave.
+    - Con el circuito abierto, el fallback sirve la entrada stale en lugar de un
+      mensaje vacío.
+    """
+    def __init__(self, max_entradas=SWR_MAX_ENTRADAS):
+        self._max_entradas = max_entradas
+        self._entradas = OrderedDict()
+        self._revalidando = set()
+        self._lock = threading.Lock()
+        self._stats = {"frescas": 0, "stale": 0, "misses": 0, "revalidaciones": 0, "revalidaciones_fallidas": 0}
+
+    @staticmethod
+    def clave(params):
+        return urlencode(sorted(
+            (str(k).strip().lower(), str(v).strip().lower())
+            for k, v in (params or {}).items() if str(v).strip()
+        ))
+
+    def obtener(self, clave):
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None or not entrada.utilizable():
+                self._stats["misses"] += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self._stats["frescas" if entrada.fresca() else "stale"] += 1
+            return entrada
+
+    def guardar(self, clave, datos):
+        with self._lock:
+            self._entradas[clave] = Entrada(datos)
+            self._entradas.move_to_end(clave)
+            while len(self._entradas) > self._max_entradas:
+                self._entradas.popitem(last=False)
+
+    def revalidar(self, clave, consultar):
+        """Lanza `consultar()` en segundo plano si no hay otra revalidación de `clave` en vuelo."""
+        with self._lock:
+            if clave in self._revalidando:
+                return
+            self._revalidando.add(clave)
+            self._stats["revalidaciones"] += 1
+
+        def tarea():
+            try:
+                # `consultar` pasa por el circuit breaker y guarda la respuesta si fue buena
+                consultar()
+            except Exception as e:
+                with self._lock:
+                    self._stats["revalidaciones_fallidas"] += 1
+                print(f"Background revalidation failed for '{clave}': {e}")
+            finally:
+                with self._lock:
+                    self._revalidando.discard(clave)
+
+        threading.Thread(target=tarea, daemon=True).start()
+
+    def estadisticas(self):
+        with self._lock:
+            return dict(self._stats, entradas=len(self._entradas))
+
+
+cache_respuestas = CacheSWR()
@@ -0,0 +1,191 @@
+import os
+import time
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from metricas import SALIENTE_DURACION
+
+# Conexiones keep-alive por host (una Session y un pool por host destino).
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 32))
+# Tiempo máximo para establecer la conexión TCP; el timeout de lectura lo fija cada llamada.
+HTTP_TIMEOUT_CONEXION = float(os.environ.get("HTTP_TIMEOUT_CONEXION", 0.5))
+HTTP_TIMEOUT_LECTURA = float(os.environ.get("HTTP_TIMEOUT_LECTURA", 5))
+# Presupuesto de reintentos: cada llamada deposita este ratio de "fichas" y cada reintento
+# consume una. Acota los reintentos a ~10% del tráfico, evitando tormentas de reintentos
+# cuando un upstream se degrada.
+HTTP_REINTENTOS_RATIO = float(os.environ.get("HTTP_REINTENTOS_RATIO", 0.1))
+HTTP_REINTENTOS_MAX_FICHAS = float(os.environ.get("HTTP_REINTENTOS_MAX_FICHAS", 10))
+
+# Deadline absoluto del request original (epoch en ms). Cada servicio lo reenvía hacia
+# abajo para que nadie siga trabajando cuando el cliente ya se rindió.
+DEADLINE_HEADER = "X-Request-Deadline"
+
+# Límites superiores (ms) de los buckets de los histogramas de latencia.
+BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+
+
+class DeadlineExcedido(requests.Timeout):
+    pass
+
+
+def deadline_entrante(headers, por_defecto=None):
+    """Deadline (epoch en segundos) del header entrante, o `por_defecto` si no viene o es inválido."""
+    try:
+        deadline = int(headers.get(DEADLINE_HEADER)) / 1000
+    except (TypeError, ValueError):
+        return por_defecto
+    return min(deadline, por_defecto) if por_defecto is not None else deadline
+
+
+def cabecera_deadline(deadline):
+    return {DEADLINE_HEADER: str(int(deadline * 1000))}
+
+
+class HistogramaLatencia:
+    def __init__(self):
+        self.buckets = [0] * len(BUCKETS_MS)
+        self.llamadas = 0
+        self.errores = 0
+        self.reintentos = 0
+        self.suma_ms = 0.0
+
+    def observar(self, ms, error=False):
+        for i, limite in enumerate(BUCKETS_MS):
+            if ms <= limite:
+                self.buckets[i] += 1
+                break
+        self.llamadas += 1
+        self.suma_ms += ms
+        if error:
+            self.errores += 1
+
+    def percentil(self, q):
+        """Cota superior del percentil `q` según los buckets (como histogram_quantile)."""
+        if not self.llamadas:
+            return None
+        objetivo = q * self.llamadas
+        acumulado = 0
+        for limite, cantidad in zip(BUCKETS_MS, self.buckets):
+            acumulado += cantidad
+            if acumulado >= objetivo:
+                return limite
+        return BUCKETS_MS[-1]
+
+    def resumen(self):
+        return {
+            "llamadas": self.llamadas,
+            "errores": self.errores,
+            "reintentos": self.reintentos,
+            "latencia_promedio_ms": round(self.suma_ms / self.llamadas, 2) if self.llamadas else None,
+            "latencia_p50_ms": self.percentil(0.50),
+            "latencia_p95_ms": self.percentil(0.95),
+            "latencia_p99_ms": self.percentil(0.99),
+            "buckets_ms": {str(limite): cantidad for limite, cantidad in zip(BUCKETS_MS, self.buckets)},
+        }
+
+
+class PresupuestoReintentos:
+    def __init__(self, ratio=HTTP_REINTENTOS_RATIO, maximo=HTTP_REINTENTOS_MAX_FICHAS):
+        self._ratio = ratio
+        self._maximo = maximo
+        self._fichas = maximo
+        self._lock = threading.Lock()
+
+    def depositar(self):
+        with self._lock:
+            self._fichas = min(self._maximo, self._fichas + self._ratio)
+
+    def retirar(self):
+        with self._lock:
+            if self._fichas < 1:
+                return False
+            self._fichas -= 1
+            return True
+
+
+class ClienteHTTP:
+    """
+    Cliente HTTP compartido para las llamadas entre servicios.
+
+    - Una `requests.Session` por host destino, con pool keep-alive de HTTP_POOL_SIZE
+      conexiones: sin handshake TCP ni puerto efímero nuevo por llamada.
+    - Timeout por llamada: (HTTP_TIMEOUT_CONEXION, timeout de lectura). Con `deadline=`
+      el timeout se acota a lo que resta y el deadline viaja en DEADLINE_HEADER.
+    - Reintentos opcionales por llamada (sólo en errores de red o 5xx), limitados por un
+      presupuesto global de reintentos.
+    - Histograma de latencia por upstream (`upstream=` o el host de la URL).
+    """
+    def __init__(self, pool_size=HTTP_POOL_SIZE):
+        self._pool_size = pool_size
+        self._sesiones = {}
+        self._histogramas = {}
+        self._presupuesto = PresupuestoReintentos()
+        self._lock = threading.Lock()
+
+    def _sesion(self, host):
+        sesion = self._sesiones.get(host)
+        if sesion is None:
+            with self._lock:
+                sesion = self._sesiones.get(host)
+                if sesion is None:
+                    sesion = requests.Session()
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self._pool_size, max_retries=0)
+                    sesion.mount("http://", adapter)
+                    sesion.mount("https://", adapter)
+                    self._sesiones[host] = sesion
+        return sesion
+
+    def _registrar(self, upstream, ms, error=False, reintento=False):
+        SALIENTE_DURACION.observar(ms / 1000, upstream=upstream, resultado="error" if error else "ok")
+        with self._lock:
+            histograma = self._histogramas.get(upstream)
+            if histograma is None:
+                histograma = self._histogramas[upstream] = HistogramaLatencia()
+            histograma.observar(ms, error)
+            if reintento:
+                histograma.reintentos += 1
+
+    def request(self, method, url, upstream=None, timeout=HTTP_TIMEOUT_LECTURA, reintentos=0, deadline=None, **kwargs):
+        partes = urlsplit(url)
+        sesion = self._sesion(f"{partes.scheme}://{partes.netloc}")
+        upstream = upstream or partes.netloc
+        self._presupuesto.depositar()
+
+        if deadline is not None:
+            kwargs["headers"] = dict(kwargs.get("headers") or {}, **cabecera_deadline(deadline))
+
+        for intento in range(reintentos + 1):
+            ultimo = intento == reintentos
+            limite = timeout
+            if deadline is not None:
+                limite = min(timeout, deadline - time.time())
+                if limite <= 0:
+                    raise DeadlineExcedido(f"Deadline exceeded before calling {upstream}")
+            inicio = time.perf_counter()
+            try:
+                resp = sesion.request(
+                    method, url, timeout=(min(HTTP_TIMEOUT_CONEXION, limite), limite), **kwargs
+                )
+            except requests.RequestException:
+                self._registrar(upstream, (time.perf_counter() - inicio) * 1000, error=True, reintento=intento > 0)
+                if ultimo or not self._presupuesto.retirar():
+                    raise
+                continue
+            error = resp.status_code >= 500
+            self._registrar(upstream, (time.perf_counter() - inicio) * 1000, error=error, reintento=intento > 0)
+            if not error or ultimo or not self._presupuesto.retirar():
+                return resp
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request("POST", url, **kwargs)
+
+    def estadisticas(self):
+        with self._lock:
+            return {upstream: h.resumen() for upstream, h in sorted(self._histogramas.items())}
+
+
+cliente_http = ClienteHTTP()
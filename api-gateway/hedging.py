@@ -0,0 +1,98 @@
+import os
+import time
+import threading
+import concurrent.futures
+from collections import deque
+from cliente_http import PresupuestoReintentos, DeadlineExcedido
+
+# Hedging opcional: tras un retardo basado en el p95, se envía un duplicado y gana la primera respuesta.
+GATEWAY_HEDGING = os.environ.get("GATEWAY_HEDGING", "0") == "1"
+HEDGE_PERCENTIL = float(os.environ.get("HEDGE_PERCENTIL", 0.95))
+# Retardo mientras no hay muestras suficientes, y retardo mínimo (evita duplicar todo si el p95 es ínfimo).
+HEDGE_RETARDO_INICIAL_MS = float(os.environ.get("HEDGE_RETARDO_INICIAL_MS", 300))
+HEDGE_RETARDO_MIN_MS = float(os.environ.get("HEDGE_RETARDO_MIN_MS", 20))
+HEDGE_MUESTRAS = int(os.environ.get("HEDGE_MUESTRAS", 200))
+# Carga extra máxima: a lo sumo ~10% de las solicitudes llevan un duplicado.
+HEDGE_RATIO_MAX = float(os.environ.get("HEDGE_RATIO_MAX", 0.1))
+HEDGE_MAX_WORKERS = int(os.environ.get("HEDGE_MAX_WORKERS", 32))
+
+
+class Hedger:
+    """
+    Hedged requests (H3): si la llamada original no respondió tras el p95 de las latencias
+    recientes, se envía un duplicado y se usa la primera respuesta exitosa. Con un retardo
+    en el p95 sólo ~5% de las solicitudes se duplican; además un presupuesto (HEDGE_RATIO_MAX)
+    acota la carga extra cuando el upstream entero se pone lento.
+    """
+    def __init__(self, habilitado=GATEWAY_HEDGING):
+        self.habilitado = habilitado
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=HEDGE_MAX_WORKERS, thread_name_prefix="hedge")
+        self._latencias = deque(maxlen=HEDGE_MUESTRAS)
+        self._presupuesto = PresupuestoReintentos(ratio=HEDGE_RATIO_MAX, maximo=10)
+        self._lock = threading.Lock()
+        self._stats = {"solicitudes": 0, "hedges": 0, "hedges_ganadores": 0}
+
+    def retardo(self):
+        with self._lock:
+            if len(self._latencias) < 20:
+                return HEDGE_RETARDO_INICIAL_MS / 1000
+            ordenadas = sorted(self._latencias)
+        p = ordenadas[min(int(len(ordenadas) * HEDGE_PERCENTIL), len(ordenadas) - 1)]
+        return max(p, HEDGE_RETARDO_MIN_MS / 1000)
+
+    def _medida(self, llamar, es_hedge):
+        inicio = time.monotonic()
+        resultado = llamar(es_hedge)
+        with self._lock:
+            self._latencias.append(time.monotonic() - inicio)
+        return resultado
+
+    def ejecutar(self, llamar, deadline):
+        """
+        Ejecuta `llamar(es_hedge)` (que lanza excepción si falla) con hedging, sin pasar de
+        `deadline` (epoch). `es_hedge` permite marcar el duplicado hacia el upstream.
+        """
+        if not self.habilitado:
+            return llamar(False)
+
+        with self._lock:
+            self._stats["solicitudes"] += 1
+        self._presupuesto.depositar()
+
+        original = self._executor.submit(self._medida, llamar, False)
+        pendientes = {original}
+        hechos, _ = concurrent.futures.wait(pendientes, timeout=max(min(self.retardo(), deadline - time.time()), 0))
+        if not hechos and deadline > time.time() and self._presupuesto.retirar():
+            with self._lock:
+                self._stats["hedges"] += 1
+            pendientes.add(self._executor.submit(self._medida, llamar, True))
+
+        error = None
+        while pendientes:
+            hechos, pendientes = concurrent.futures.wait(
+                pendientes, timeout=max(deadline - time.time(), 0), return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            if not hechos:
+                break
+            for futuro in hechos:
+                try:
+                    resultado = futuro.result()
+                except Exception as e:
+                    error = e
+                    continue
+                if futuro is not original:
+                    with self._lock:
+                        self._stats["hedges_ganadores"] += 1
+                return resultado
+        raise error or DeadlineExcedido("Deadline exceeded waiting for hedged requests")
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["habilitado"] = self.habilitado
+        stats["tasa_hedge"] = round(stats["hedges"] / stats["solicitudes"], 3) if stats["solicitudes"] else 0.0
+        stats["retardo_ms"] = round(self.retardo() * 1000, 1)
+        return stats
+
+
+hedger = Hedger()
@@ -1 +1 @@
-from .vistas import VistaBusquedaGateway, VistaBusquedaGatewayNaive
+from .vistas import VistaBusquedaGateway, VistaBusquedaGatewayNaive, VistaCircuitoGateway
@@ -1,14 +1,32 @@
+from flask import request
 from flask_restful import Resource
-from circuitbreaker import circuit
-import requests
+import time
 import datetime
+from cliente_http import cliente_http, deadline_entrante, DeadlineExcedido
+from hedging import hedger
+from cache_respuestas import cache_respuestas
+from breaker import BreakerAdaptativo
 
 # Configuración del Circuit Breaker
-# Se abre tras 3 fallos seguidos. Tiempo de recuperación 30s.
+# Se abre cuando, con al menos 3 llamadas en la ventana, la tasa de errores o de llamadas
+# lentas supera su umbral (ver breaker.py). Recuperación: 30s, duplicándose en cada
+# sondeo fallido.
 FAIL_THRESHOLD = 3
 RECOVERY_TIMEOUT = 30
+# Tiempo máximo de una búsqueda si el cliente no trae su propio deadline (X-Request-Deadline).
+SEARCH_TIMEOUT = 2
 
-def fallback_search():
+def fallback_search(params=None, deadline=None):
+    # Degradación con datos reales: la última respuesta buena de esta búsqueda, si no es demasiado vieja
+    entrada = cache_respuestas.obtener(cache_respuestas.clave(params))
+    if entrada is not None:
+        return {
+            "mensaje": "Servicio de búsqueda no disponible temporalmente. Resultados cacheados.",
+            "origen": "Fallback (Circuit Breaker Abierto) - Cache",
+            "resultados": entrada.datos,
+            "antiguedad_segundos": round(entrada.antiguedad(), 1),
+            "timestamp": str(datetime.datetime.now())
+        }, 200, {"X-Cache": "STALE"}
     return {
         "mensaje": "Servicio de búsqueda no disponible temporalmente. Resultados cacheados/limitados.",
         "origen": "Fallback (Circuit Breaker Abierto)",
@@ -24,37 +42,83 @@ Para probar esta táctica:
 3. INYECTAR FALLO: Matar el proceso de `microservicio-busqueda` (puerto 5001).
    $ lsof -i :5001 -> obtener PID -> kill -9 <PID>
 4. Intentar buscar nuevamente (3 veces).
-   - Fallos 1-3: responderán con error 500/Timeout. El CB cuenta fallos.
+   - Fallos 1-3: responderán con error 500/Timeout. El CB cuenta fallos en su ventana.
+   - Si la búsqueda ya estaba en el cache SWR, se sirve stale (X-Cache: STALE) y
+     la revalidación en segundo plano es la que falla y cuenta para el CB.
 5. Intento 4 (Circuit Breaker Abierto):
    - Responderá INMEDIATAMENTE con el JSON de abajo (Fallback).
-   - "origen": "Fallback (Circuit Breaker Abierto)"
+   - "origen": "Fallback (Circuit Breaker Abierto)", con "resultados" cacheados si los hay.
    - ÉXITO: El sistema se degradó funcionalmente en lugar de fallar.
 6. RECUPERACIÓN:
    - Reiniciar `microservicio-busqueda`.
-   - Esperar 30s (RECOVERY_TIMEOUT).
-   - El siguiente intento cerrará el circuito y funcionará normal.
+   - Esperar 30s (RECOVERY_TIMEOUT; el doble por cada sondeo fallido previo).
+   - Los siguientes intentos son sondeos (máx. BREAKER_SONDEOS a la vez); si salen bien,
+     el circuito se cierra y funciona normal. Estado: GET /search/circuito
 """
 
+breaker_busqueda = BreakerAdaptativo(
+    "busqueda", min_llamadas=FAIL_THRESHOLD, recuperacion=RECOVERY_TIMEOUT, fallback_function=fallback_search
+)
+
 # Decorador
-@circuit(failure_threshold=FAIL_THRESHOLD, recovery_timeout=RECOVERY_TIMEOUT, fallback_function=fallback_search)
-def external_search():
+@breaker_busqueda
+def external_search(params=None, deadline=None):
     # URL del Microservicio Búsqueda
     # Si falla (ConnectionError, 500, timeout), lanza excepción y cuenta para el CB
     url = "http://127.0.0.1:5001/busqueda"
-    response = requests.get(url, timeout=2)
-    if response.status_code >= 500:
-        raise Exception("Server Error")
+    deadline = deadline or time.time() + SEARCH_TIMEOUT
+
+    def llamar(es_hedge):
+        # El deadline viaja en X-Request-Deadline: Búsqueda abandona el trabajo si ya venció
+        response = cliente_http.get(
+            url, params=params, timeout=SEARCH_TIMEOUT, deadline=deadline, upstream="busqueda",
+            headers={"X-Hedged-Request": "1"} if es_hedge else None,
+        )
+        if response.status_code == 504:
+            raise DeadlineExcedido("Search abandoned: deadline exceeded")
+        if response.status_code >= 500:
+            raise Exception("Server Error")
+        return response
+
+    # Con GATEWAY_HEDGING=1, un duplicado tras el p95 recorta la cola de latencia
+    response = hedger.ejecutar(llamar, deadline)
+    if response.status_code == 200:
+        cache_respuestas.guardar(cache_respuestas.clave(params), response.json())
     return response.json(), response.status_code
 
 class VistaBusquedaGateway(Resource):
     def get(self):
+        params = request.args.to_dict()
+        clave = cache_respuestas.clave(params)
+        deadline = deadline_entrante(request.headers, time.time() + SEARCH_TIMEOUT)
+
+        # Stale-while-revalidate: con el circuito cerrado, una respuesta cacheada se sirve
+        # al instante; si ya no está fresca se revalida en segundo plano.
+        # Con el circuito abierto se delega en el fallback (que sirve la entrada como stale).
+        # Un solo `permitir` decide ambas cosas: una actualización del estado antes de la llamada.
+        permiso = breaker_busqueda.permitir()
+        permitida, sondeo = permiso
+        entrada = cache_respuestas.obtener(clave) if permitida and not sondeo else None
+        if entrada is not None:
+            if entrada.fresca():
+                return entrada.datos, 200, {"X-Cache": "HIT"}
+            cache_respuestas.revalidar(clave, lambda: external_search(params))
+            return entrada.datos, 200, {"X-Cache": "STALE"}
+
         try:
-            return external_search()
+            return external_search.con_permiso(permiso, params, deadline)
+        except DeadlineExcedido as e:
+            return {"error": str(e)}, 504
         except Exception as e:
             # Si el CB está cerrado pero falla la llamada (y no saltó al fallback del decorador por alguna razón)
             return {"error": str(e)}, 503
 
 
+class VistaCircuitoGateway(Resource):
+    def get(self):
+        return dict(breaker_busqueda.estadisticas(), hedging=hedger.estadisticas()), 200
+
+
 # =============================================================================
 # VERSIÓN NAIVE (SIN TÁCTICAS) — Para contraste experimental
 # =============================================================================
@@ -67,7 +131,7 @@ class VistaBusquedaGatewayNaive(Resource):
     def get(self):
         try:
             url = "http://127.0.0.1:5001/busqueda"
-            response = requests.get(url, timeout=5)
+            response = cliente_http.get(url, timeout=5, upstream="busqueda")
             return response.json(), response.status_code
         except Exception as e:
             return {"error": str(e), "tactica": "ninguna"}, 503
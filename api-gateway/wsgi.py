@@ -0,0 +1,5 @@
+# Punto de entrada de producción:  gunicorn -c gunicorn.conf.py wsgi:app
+# Cada worker importa este módulo después del fork y arma su propia app.
+from app import create_flask_app
+
+app = create_flask_app()
@@ -0,0 +1,194 @@
+"""
+BENCHMARK: Tiempo de resincronización (catch-up) del consumidor de la Outbox (H1)
+
+Simula una caída larga de Inventario: llena `reservation_events` con N eventos
+pendientes y mide cuánto tarda `tasks.poll_reservations` en drenar el backlog.
+
+Uso:
+    python benchmarks/bench_outbox_catchup.py                      # SQLite, 10k y 100k
+    python benchmarks/bench_outbox_catchup.py --eventos 10000 --batch-size 1000
+    python benchmarks/bench_outbox_catchup.py --workers 1 2 4    # escalamiento con N consumidores
+    python benchmarks/bench_outbox_catchup.py --productos 20     # eventos repartidos en 20 productos
+    python benchmarks/bench_outbox_catchup.py --formato json      # payloads JSON anteriores al sobre
+    python benchmarks/bench_outbox_catchup.py \\
+        --reservas-url postgresql://localhost/bookings_bench \\
+        --inventario-url postgresql://localhost/inventory_bench
+
+Con Postgres, las bases deben existir (createdb); las tablas se recrean en cada corrida.
+Cada evento reserva 1-3 unidades de uno de `--productos` productos; `sentencias_inventario`
+cuenta las sentencias SQL ejecutadas contra la base de Inventario durante el drenado.
+Los payloads usan el sobre binario de `eventos.py` (o JSON con `--formato json`, para comparar
+tamaño y decodificación); `bytes_payload_promedio` reporta el tamaño medio del payload.
+El resultado se imprime como JSON para poder compararlo entre commits.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import (Column, DateTime, Integer, LargeBinary, MetaData, String, Table,
+                        create_engine, event, func, insert, select)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+INVENTARIO_DIR = os.path.join(ROOT, 'microservicio-inventario')
+sys.path.insert(0, INVENTARIO_DIR)
+
+from flask import Flask  # noqa: E402
+import reservas_db  # noqa: E402
+import stock  # noqa: E402
+import tasks  # noqa: E402
+from eventos import codificar  # noqa: E402
+from modelos import db, Inventario  # noqa: E402
+
+# Espejo de `ReservationEvent` (microservicio-reservas/modelos/modelos.py).
+# No se importa directamente porque ambos servicios exponen un paquete `modelos`.
+metadata = MetaData()
+reservation_events = Table(
+    'reservation_events', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('event_type', String(50)),
+    Column('reservation_id', Integer),
+    Column('payload', LargeBinary),
+    Column('created_at', DateTime, default=datetime.now),
+    Column('processed_at', DateTime, nullable=True),
+    Column('claimed_by', String(100), nullable=True),
+    Column('lease_expires_at', DateTime, nullable=True),
+)
+
+
+def producto(i):
+    return f"{stock.PRODUCTO_POR_DEFECTO}_{i}" if i else stock.PRODUCTO_POR_DEFECTO
+
+
+def payload(formato, i, nombre, cantidad):
+    if formato == "json":
+        return json.dumps({"cliente": "Bench", "monto": 100, "producto": nombre, "cantidad": cantidad}).encode()
+    return codificar("RESERVATION_CREATED", i, nombre, cantidad, 100)
+
+
+def preparar_backlog(reservas_url, n_eventos, n_productos, formato):
+    """Llena la Outbox y retorna (engine, unidades reservadas por producto, bytes medios por payload)."""
+    engine = create_engine(reservas_url)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    ahora = datetime.now()
+    demanda = {}
+    filas = []
+    for i in range(1, n_eventos + 1):
+        nombre, cantidad = producto(i % n_productos), i % 3 + 1
+        demanda[nombre] = demanda.get(nombre, 0) + cantidad
+        filas.append({
+            "event_type": "RESERVATION_CREATED", "reservation_id": i, "created_at": ahora,
+            "payload": payload(formato, i, nombre, cantidad),
+        })
+    with engine.begin() as conn:
+        for i in range(0, len(filas), 10000):
+            conn.execute(insert(reservation_events), filas[i:i + 10000])
+    bytes_promedio = sum(len(f["payload"]) for f in filas) / len(filas)
+    return engine, demanda, bytes_promedio
+
+
+def contar_pendientes(engine):
+    with engine.connect() as conn:
+        return conn.execute(
+            select(func.count()).select_from(reservation_events).where(reservation_events.c.processed_at.is_(None))
+        ).scalar()
+
+
+def consumir(app, worker):
+    with app.app_context():
+        with reservas_db.conectar() as connection:
+            while tasks.procesar_lote(connection, worker=worker):
+                pass
+        db.session.remove()
+
+
+def correr(n_eventos, reservas_url, inventario_url, batch_size, workers, n_productos, formato):
+    reservas_db.RESERVAS_DB_URL = reservas_url
+    reservas_db.dispose_engine()
+    tasks.OUTBOX_BATCH_SIZE = batch_size
+
+    reservas_engine, demanda, bytes_promedio = preparar_backlog(reservas_url, n_eventos, n_productos, formato)
+
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = inventario_url
+    db.init_app(app)
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        db.session.add_all([Inventario(producto=nombre, cantidad=n * 2) for nombre, n in demanda.items()])
+        db.session.commit()
+
+        sentencias = [0]
+
+        def contar(*args):
+            sentencias[0] += 1
+        event.listen(db.engine, "before_cursor_execute", contar)
+
+        inicio = time.perf_counter()
+        if workers == 1:
+            tasks.poll_reservations()
+        else:
+            # N consumidores concurrentes, cada uno con su propia identidad de lease
+            hilos = [threading.Thread(target=consumir, args=(app, f"bench-{i}")) for i in range(workers)]
+            for hilo in hilos:
+                hilo.start()
+            for hilo in hilos:
+                hilo.join()
+        duracion = time.perf_counter() - inicio
+        event.remove(db.engine, "before_cursor_execute", contar)
+
+        stock = {i.producto: i.cantidad for i in Inventario.query.all()}
+        db.session.remove()
+        db.engine.dispose()
+
+    pendientes = contar_pendientes(reservas_engine)
+    reservas_engine.dispose()
+    return {
+        "eventos": n_eventos,
+        "batch_size": batch_size,
+        "workers": workers,
+        "productos": n_productos,
+        "formato": formato,
+        "bytes_payload_promedio": round(bytes_promedio, 1),
+        "segundos": round(duracion, 3),
+        "eventos_por_segundo": round(n_eventos / duracion, 1) if duracion else None,
+        "pendientes_restantes": pendientes,
+        "sentencias_inventario": sentencias[0],
+        "stock_consistente": stock == demanda,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--eventos", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1])
+    parser.add_argument("--productos", type=int, default=5)
+    parser.add_argument("--formato", choices=["binario", "json"], default="binario")
+    parser.add_argument("--reservas-url", default=None)
+    parser.add_argument("--inventario-url", default=None)
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_outbox_")
+    reservas_url = args.reservas_url or f"sqlite:///{os.path.join(tmp, 'reservas.sqlite')}"
+    inventario_url = args.inventario_url or f"sqlite:///{os.path.join(tmp, 'inventario.sqlite')}"
+
+    resultados = [
+        correr(n, reservas_url, inventario_url, args.batch_size, w, args.productos, args.formato)
+        for n in args.eventos for w in args.workers
+    ]
+    print(json.dumps({
+        "benchmark": "outbox_catchup",
+        "reservas_url": reservas_url.split("@")[-1],
+        "inventario_url": inventario_url.split("@")[-1],
+        "resultados": resultados,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""
+BENCHMARK: Costo del escaneo de eventos pendientes vs. tamaño del histórico (H1)
+
+Llena `reservation_events` con N eventos ya procesados (histórico) más unos pocos
+pendientes, y mide la consulta de pendientes en tres escenarios:
+
+1.  sin_indice: la consulta original (ORDER BY created_at) y el reclamo actual, sin índices.
+2.  indice_parcial: el reclamo actual (ORDER BY id) con `ix_reservation_events_pendientes`.
+3.  archivado: tras mover el histórico a `reservation_events_archive`.
+
+Uso:
+    python benchmarks/bench_pending_scan.py                       # SQLite, 1M filas
+    python benchmarks/bench_pending_scan.py --historico 100000 --repeticiones 50
+    python benchmarks/bench_pending_scan.py --url postgresql://localhost/bookings_bench
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import (Column, DateTime, Index, Integer, LargeBinary, MetaData, String, Table,
+                        create_engine, insert, text)
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT, 'microservicio-reservas'))
+from eventos import codificar  # noqa: E402
+
+# Espejo de `ReservationEvent` / `ReservationEventArchive` (microservicio-reservas/modelos/modelos.py).
+metadata = MetaData()
+
+
+def _columnas():
+    return [
+        Column('event_type', String(50)),
+        Column('reservation_id', Integer),
+        Column('payload', LargeBinary),
+        Column('created_at', DateTime),
+        Column('processed_at', DateTime, nullable=True),
+    ]
+
+
+reservation_events = Table(
+    'reservation_events', metadata,
+    Column('id', Integer, primary_key=True),
+    *_columnas(),
+    Column('claimed_by', String(100), nullable=True),
+    Column('lease_expires_at', DateTime, nullable=True),
+)
+reservation_events_archive = Table(
+    'reservation_events_archive', metadata,
+    Column('id', Integer, primary_key=True, autoincrement=False),
+    *_columnas(),
+)
+indice_pendientes = Index(
+    'ix_reservation_events_pendientes', reservation_events.c.id, reservation_events.c.lease_expires_at,
+    postgresql_where=text('processed_at IS NULL'),
+    sqlite_where=text('processed_at IS NULL'),
+)
+
+CONSULTA_ORIGINAL = text(
+    "SELECT id, event_type, payload FROM reservation_events "
+    "WHERE processed_at IS NULL ORDER BY created_at ASC"
+)
+CONSULTA_RECLAMO = text(
+    "SELECT id FROM reservation_events "
+    "WHERE processed_at IS NULL AND (lease_expires_at IS NULL OR lease_expires_at < :now) "
+    "ORDER BY id LIMIT 500"
+)
+
+
+def poblar(engine, historico, pendientes):
+    metadata.drop_all(engine)
+    reservation_events.create(engine)
+    reservation_events_archive.create(engine)
+    # El índice se crea después, para medir primero el escenario sin índice
+    indice_pendientes.drop(engine)
+    base = datetime.now() - timedelta(days=30)
+    with engine.begin() as conn:
+        lote = []
+        for i in range(1, historico + pendientes + 1):
+            procesado = i <= historico
+            lote.append({
+                "id": i, "event_type": "RESERVATION_CREATED", "reservation_id": i,
+                "payload": codificar("RESERVATION_CREATED", i, "Habitacion_Standard", 1, 100),
+                "created_at": base + timedelta(seconds=i),
+                "processed_at": base + timedelta(seconds=i + 1) if procesado else None,
+            })
+            if len(lote) == 50000:
+                conn.execute(insert(reservation_events), lote)
+                lote = []
+        if lote:
+            conn.execute(insert(reservation_events), lote)
+
+
+def medir(engine, consulta, repeticiones):
+    tiempos = []
+    with engine.connect() as conn:
+        conn.execute(consulta, {"now": datetime.now()}).fetchall()  # calentar caché
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            conn.execute(consulta, {"now": datetime.now()}).fetchall()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        "p50_ms": round(statistics.median(tiempos), 3),
+        "max_ms": round(max(tiempos), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--historico", type=int, default=1_000_000)
+    parser.add_argument("--pendientes", type=int, default=1000)
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--url", default=None)
+    args = parser.parse_args()
+
+    url = args.url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='bench_scan_'), 'reservas.sqlite')}"
+    engine = create_engine(url)
+
+    inicio = time.perf_counter()
+    poblar(engine, args.historico, args.pendientes)
+    carga_s = time.perf_counter() - inicio
+
+    resultados = {
+        "sin_indice": medir(engine, CONSULTA_ORIGINAL, args.repeticiones),
+        "reclamo_sin_indice": medir(engine, CONSULTA_RECLAMO, args.repeticiones),
+    }
+
+    indice_pendientes.create(engine)
+    with engine.begin() as conn:
+        if engine.dialect.name == "postgresql":
+            conn.execute(text("ANALYZE reservation_events"))
+    resultados["indice_parcial"] = medir(engine, CONSULTA_RECLAMO, args.repeticiones)
+
+    columnas = "id, event_type, reservation_id, payload, created_at, processed_at"
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"INSERT INTO reservation_events_archive ({columnas}) "
+            f"SELECT {columnas} FROM reservation_events WHERE processed_at IS NOT NULL"
+        ))
+        conn.execute(text("DELETE FROM reservation_events WHERE processed_at IS NOT NULL"))
+    resultados["archivado"] = medir(engine, CONSULTA_RECLAMO, args.repeticiones)
+
+    print(json.dumps({
+        "benchmark": "pending_scan",
+        "url": url.split("@")[-1],
+        "historico": args.historico,
+        "pendientes": args.pendientes,
+        "carga_segundos": round(carga_s, 1),
+        "resultados": resultados,
+    }, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""
+BENCHMARK: Creación de reservas una a una vs. POST /reservas/bulk (H1)
+
+Levanta Reservas (app.py real, SQLite temporal o PostgreSQL) y crea N reservas de tres
+formas, midiendo el throughput de punta a punta (HTTP incluido):
+
+1.  individual: N `POST /reservas` secuenciales sobre una sesión keep-alive (un flush,
+    dos inserts y un commit por reserva).
+2.  bulk_json: un `POST /reservas/bulk` con el arreglo JSON (inserts multi-fila con
+    RETURNING, un commit por lote de RESERVAS_BULK_LOTE).
+3.  bulk_ndjson: lo mismo en NDJSON (`application/x-ndjson`), leído como stream.
+
+Al final verifica la garantía de la Outbox: cada reserva creada tiene su evento.
+
+Uso:
+    python benchmarks/bench_reservas_bulk.py                         # SQLite, 1k reservas
+    python benchmarks/bench_reservas_bulk.py --reservas 1000 10000 --lote 1000
+    python benchmarks/bench_reservas_bulk.py --url postgresql://localhost/bookings_bench
+
+El puerto 5002 debe estar libre.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+RESERVAS = "http://127.0.0.1:5002"
+PRODUCTOS = ["Habitacion_Standard", "Habitacion_Montana", "Suite", "Cabana", "Hostal"]
+
+
+def _esperar_listo(timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            if requests.get(f"{RESERVAS}/metrics", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"reservas did not become ready at {RESERVAS}")
+
+
+def reservas_de_prueba(n):
+    return [
+        {"cliente": f"cliente-{i}", "monto": 45.0, "producto": PRODUCTOS[i % len(PRODUCTOS)], "cantidad": 1}
+        for i in range(n)
+    ]
+
+
+def individual(sesion, items):
+    for item in items:
+        resp = sesion.post(f"{RESERVAS}/reservas", json=item, timeout=10)
+        resp.raise_for_status()
+    return len(items)
+
+
+def bulk(sesion, items, ndjson):
+    if ndjson:
+        cuerpo = "\n".join(json.dumps(item) for item in items).encode()
+        resp = sesion.post(f"{RESERVAS}/reservas/bulk", data=cuerpo,
+                           headers={"Content-Type": "application/x-ndjson"}, timeout=120)
+    else:
+        resp = sesion.post(f"{RESERVAS}/reservas/bulk", json=items, timeout=120)
+    resp.raise_for_status()
+    datos = resp.json()
+    assert datos["fallidas"] == 0, datos
+    return datos["creadas"]
+
+
+def medir(nombre, funcion):
+    inicio = time.perf_counter()
+    creadas = funcion()
+    segundos = time.perf_counter() - inicio
+    print(f"  {nombre}: {creadas} in {segundos:.2f}s", file=sys.stderr)
+    return {"creadas": creadas, "segundos": round(segundos, 3), "reservas_por_segundo": round(creadas / segundos, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reservas", type=int, nargs="+", default=[1000])
+    parser.add_argument("--lote", type=int, default=500, help="RESERVAS_BULK_LOTE")
+    parser.add_argument("--url", default=None, help="DATABASE_URL de Reservas (por defecto SQLite temporal)")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_bulk_")
+    url = args.url or f"sqlite:///{os.path.join(tmp, 'reservas.sqlite')}"
+    entorno = dict(os.environ, DATABASE_URL=url, RESERVAS_BULK_LOTE=str(args.lote),
+                   RESERVAS_BULK_MAX=str(max(args.reservas)), LIDER_DIR=tmp, PYTHONUNBUFFERED="1")
+    log = open(os.path.join(tmp, "reservas.log"), "a")
+    proceso = subprocess.Popen([sys.executable, "app.py"], cwd=os.path.join(ROOT, "microservicio-reservas"),
+                               env=entorno, stdout=log, stderr=subprocess.STDOUT)
+    resultados = {"db": url.split(":")[0], "lote": args.lote, "corridas": []}
+    try:
+        _esperar_listo()
+        sesion = requests.Session()
+        for n in args.reservas:
+            print(f"{n} reservations", file=sys.stderr)
+            items = reservas_de_prueba(n)
+            corrida = {
+                "reservas": n,
+                "individual": medir("individual", lambda: individual(sesion, items)),
+                "bulk_json": medir("bulk_json", lambda: bulk(sesion, items, ndjson=False)),
+                "bulk_ndjson": medir("bulk_ndjson", lambda: bulk(sesion, items, ndjson=True)),
+            }
+            base = corrida["individual"]["reservas_por_segundo"]
+            corrida["aceleracion_bulk_json"] = round(corrida["bulk_json"]["reservas_por_segundo"] / base, 1)
+            corrida["aceleracion_bulk_ndjson"] = round(corrida["bulk_ndjson"]["reservas_por_segundo"] / base, 1)
+            resultados["corridas"].append(corrida)
+    finally:
+        proceso.terminate()
+        proceso.wait(timeout=10)
+
+    # Garantía de la Outbox: ninguna reserva sin su evento RESERVATION_CREATED
+    engine = create_engine(url)
+    with engine.connect() as conn:
+        resultados["reservas_sin_evento"] = conn.execute(text(
+            "SELECT COUNT(*) FROM reservas r WHERE NOT EXISTS "
+            "(SELECT 1 FROM reservation_events e WHERE e.reservation_id = r.id)"
+        )).scalar()
+    engine.dispose()
+    print(json.dumps(resultados, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,431 @@
+"""
+BENCHMARK: Tácticas H1/H2/H3 de punta a punta, con carga abierta e inyección de fallos
+
+Levanta los servicios reales (el mismo layout que `scripts/start_backend.sh`), genera carga
+de lazo abierto (open-loop: las solicitudes salen a tasa fija aunque el sistema se atrase,
+y la latencia se mide desde el instante programado, sin "coordinated omission") contra los
+endpoints con táctica y sus contrapartes `/naive`, e inyecta fallos:
+
+  - h3: se mata Búsqueda (SIGKILL) a mitad de la carga sobre `/search` y `/search/naive`,
+        luego se reinicia. Reporta fases normal / fallo / recuperación (5xx visibles).
+  - h1: se detiene Inventario mientras llegan `POST /reservas` y `/reservas/naive`; al
+        reiniciarlo se mide el tiempo hasta que el backlog de la Outbox llega a 0.
+  - h2: la réplica 5 de Pagos es un servidor del propio benchmark que responde bien y,
+        tras inyectar el fallo, corrompe el monto (x10). Se mide la tasa de montos
+        incorrectos en `/reservas/<id>/pagar` y `/pagar/naive` y cuánto tarda la
+        réplica en quedar en cuarentena (detección).
+        La versión naive sólo llama a la réplica 1: no ve la réplica corrupta, pero
+        tampoco tiene forma de detectarla.
+
+Uso:
+    python benchmarks/bench_tactics.py                              # SQLite temporal, h1 h2 h3
+    python benchmarks/bench_tactics.py --escenarios h3 --rps 50 --fase 20
+    python benchmarks/bench_tactics.py --salida resultados.json
+    python benchmarks/bench_tactics.py --postgres postgresql://localhost
+
+Con --postgres se usan las bases <url>/bookings_bench, payments_bench, inventory_bench,
+search_bench y monitor_bench (deben existir: createdb). Los puertos 5001-5004 y 5007
+deben estar libres. El resultado se imprime como JSON para poder compararlo entre commits.
+"""
+import argparse
+import concurrent.futures
+import json
+import os
+import random
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+GATEWAY = "http://127.0.0.1:5007"
+RESERVAS = "http://127.0.0.1:5002"
+MONTO = 45.0
+DESTINOS = ["cancun", "cartagena", "cusco", "madrid", "lima", "santiago", "bogota", "roma"]
+
+# nombre -> (directorio, puerto, base de datos en Postgres)
+SERVICIOS = {
+    "pagos": ("microservicio-pagos", 5003, "payments_bench"),
+    "reservas": ("microservicio-reservas", 5002, "bookings_bench"),
+    "inventario": ("microservicio-inventario", 5004, "inventory_bench"),
+    "busqueda": ("microservicio-busqueda", 5001, "search_bench"),
+    "gateway": ("api-gateway", 5007, "monitor_bench"),
+}
+
+
+# -----------------------------------------------------------------------------
+# Procesos de los servicios
+# -----------------------------------------------------------------------------
+
+class Servicios:
+    def __init__(self, tmp, postgres=None, puerto_replica=None):
+        self.tmp = tmp
+        self.postgres = postgres.rstrip("/") if postgres else None
+        self.puerto_replica = puerto_replica
+        self.procesos = {}
+
+    def _url_db(self, nombre):
+        if self.postgres:
+            return f"{self.postgres}/{SERVICIOS[nombre][2]}"
+        return f"sqlite:///{os.path.join(self.tmp, nombre + '.sqlite')}"
+
+    def _entorno(self, nombre):
+        entorno = dict(os.environ, DATABASE_URL=self._url_db(nombre), PYTHONUNBUFFERED="1")
+        if nombre == "inventario":
+            # Cross-database read hacia la Outbox de Reservas
+            entorno["RESERVAS_DB_URL"] = self._url_db("reservas")
+        if nombre == "busqueda":
+            entorno.setdefault("CACHE_BACKEND", "memoria")
+        if nombre == "reservas" and self.puerto_replica:
+            # Réplicas 1-4: Pagos real; réplica 5: servidor controlado por el benchmark
+            replicas = [{"id": i, "url": "http://127.0.0.1:5003/pago"} for i in range(1, 5)]
+            replicas.append({"id": 5, "url": f"http://127.0.0.1:{self.puerto_replica}/pago"})
+            entorno["PAGOS_REPLICAS"] = json.dumps(replicas)
+        return entorno
+
+    def iniciar(self, nombre):
+        directorio, puerto, _ = SERVICIOS[nombre]
+        if _puerto_ocupado(puerto):
+            raise RuntimeError(f"Port {puerto} is busy, cannot start {nombre}")
+        log = open(os.path.join(self.tmp, nombre + ".log"), "a")
+        self.procesos[nombre] = subprocess.Popen(
+            [sys.executable, "app.py"], cwd=os.path.join(ROOT, directorio),
+            env=self._entorno(nombre), stdout=log, stderr=subprocess.STDOUT,
+        )
+        _esperar_listo(f"http://127.0.0.1:{puerto}/metrics", nombre)
+
+    def detener(self, nombre, senal=signal.SIGTERM):
+        proceso = self.procesos.pop(nombre, None)
+        if proceso is None:
+            return
+        proceso.send_signal(senal)
+        try:
+            proceso.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proceso.kill()
+            proceso.wait()
+
+    def detener_todos(self):
+        for nombre in list(self.procesos):
+            self.detener(nombre, signal.SIGKILL)
+
+
+def _puerto_ocupado(puerto):
+    with socket.socket() as s:
+        return s.connect_ex(("127.0.0.1", puerto)) == 0
+
+
+def _esperar_listo(url, nombre, timeout=30):
+    limite = time.monotonic() + timeout
+    while time.monotonic() < limite:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"{nombre} did not become ready at {url}")
+
+
+def leer_metrica(url, nombre):
+    """Valor de una métrica sin etiquetas de GET /metrics (None si no está)."""
+    for linea in requests.get(url, timeout=5).text.splitlines():
+        if linea.startswith(nombre + " "):
+            return float(linea.split()[1])
+    return None
+
+
+# -----------------------------------------------------------------------------
+# Réplica de Pagos controlable (fallo bizantino inyectable)
+# -----------------------------------------------------------------------------
+
+class ReplicaControlada:
+    def __init__(self):
+        self.corrupta = False
+        replica = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                cuerpo = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                monto = float(cuerpo.get("amount", MONTO)) * (10 if replica.corrupta else 1)
+                datos = json.dumps({"replica_id": cuerpo.get("replica_id"), "processed_amount": monto}).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(datos)))
+                self.end_headers()
+                self.wfile.write(datos)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.puerto = self.servidor.server_address[1]
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+
+    def cerrar(self):
+        self.servidor.shutdown()
+
+
+# -----------------------------------------------------------------------------
+# Generador de carga de lazo abierto
+# -----------------------------------------------------------------------------
+
+class Objetivo:
+    """Un endpoint bajo carga: `enviar(sesion)` hace la llamada y retorna la respuesta."""
+    def __init__(self, nombre, enviar, correcta=None):
+        self.nombre = nombre
+        self.enviar = enviar
+        self.correcta = correcta  # respuesta -> bool (sólo para endpoints con resultado verificable)
+
+
+class CargaAbierta:
+    def __init__(self, objetivos, rps, max_workers=256):
+        self.objetivos = objetivos
+        self.rps = rps
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="carga")
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.muestras = []  # (objetivo, programado, latencia_s, estado, correcta)
+
+    def _sesion(self):
+        if not hasattr(self._local, "sesion"):
+            self._local.sesion = requests.Session()
+        return self._local.sesion
+
+    def _ejecutar(self, objetivo, programado):
+        estado, correcta = None, None
+        try:
+            resp = objetivo.enviar(self._sesion())
+            estado = resp.status_code
+            if objetivo.correcta is not None and resp.status_code == 200:
+                correcta = objetivo.correcta(resp)
+        except requests.RequestException:
+            pass
+        latencia = time.monotonic() - programado
+        with self._lock:
+            self.muestras.append((objetivo.nombre, programado, latencia, estado, correcta))
+
+    def correr(self, duracion):
+        """Envía `rps` solicitudes/s a CADA objetivo durante `duracion` segundos (sin esperar respuestas)."""
+        inicio = time.monotonic()
+        intervalo = 1.0 / self.rps
+        n = 0
+        while True:
+            programado = inicio + n * intervalo
+            if programado - inicio >= duracion:
+                break
+            espera = programado - time.monotonic()
+            if espera > 0:
+                time.sleep(espera)
+            for objetivo in self.objetivos:
+                self._executor.submit(self._ejecutar, objetivo, programado)
+            n += 1
+
+    def esperar(self):
+        self._executor.shutdown(wait=True)
+
+    def resumen(self, desde, hasta):
+        """Estadísticas por objetivo de las solicitudes programadas en [desde, hasta)."""
+        with self._lock:
+            muestras = [m for m in self.muestras if desde <= m[1] < hasta]
+        return {
+            objetivo.nombre: estadisticas([m for m in muestras if m[0] == objetivo.nombre], hasta - desde)
+            for objetivo in self.objetivos
+        }
+
+
+def percentil(ordenados, p):
+    if not ordenados:
+        return None
+    return round(ordenados[min(int(len(ordenados) * p), len(ordenados) - 1)] * 1000, 1)
+
+
+def estadisticas(muestras, duracion):
+    latencias = sorted(m[2] for m in muestras)
+    errores = sum(1 for m in muestras if m[3] is None or m[3] >= 400)
+    verificadas = [m[4] for m in muestras if m[4] is not None]
+    resultado = {
+        "enviadas": len(muestras),
+        "throughput_rps": round(sum(1 for m in muestras if m[3] is not None and m[3] < 400) / duracion, 1) if duracion else None,
+        "p50_ms": percentil(latencias, 0.50),
+        "p95_ms": percentil(latencias, 0.95),
+        "p99_ms": percentil(latencias, 0.99),
+        "errores": errores,
+        "errores_5xx": sum(1 for m in muestras if m[3] is not None and m[3] >= 500),
+        "sin_respuesta": sum(1 for m in muestras if m[3] is None),
+        "tasa_error": round(errores / len(muestras), 4) if muestras else None,
+    }
+    if verificadas:
+        resultado["incorrectas"] = verificadas.count(False)
+    return resultado
+
+
+# -----------------------------------------------------------------------------
+# Escenarios
+# -----------------------------------------------------------------------------
+
+def _busqueda(ruta):
+    return lambda s: s.get(f"{GATEWAY}{ruta}", params={"destino": random.choice(DESTINOS)}, timeout=10)
+
+
+def escenario_h3(servicios, rps, fase):
+    """Búsqueda muere a mitad de la carga: el Gateway debe degradar sin 5xx."""
+    carga = CargaAbierta([Objetivo("/search", _busqueda("/search")), Objetivo("/search/naive", _busqueda("/search/naive"))], rps)
+    inicio = time.monotonic()
+    hilo = threading.Thread(target=carga.correr, args=(3 * fase,))
+    hilo.start()
+
+    time.sleep(max(inicio + fase - time.monotonic(), 0))
+    t_fallo = time.monotonic()
+    servicios.detener("busqueda", signal.SIGKILL)
+    time.sleep(max(t_fallo + fase - time.monotonic(), 0))
+    t_reinicio = time.monotonic()
+    servicios.iniciar("busqueda")
+    t_listo = time.monotonic()
+
+    hilo.join()
+    carga.esperar()
+    return {
+        "fases": {
+            "normal": carga.resumen(inicio, t_fallo),
+            "busqueda_caida": carga.resumen(t_fallo, t_reinicio),
+            "recuperacion": carga.resumen(t_listo, inicio + 3 * fase),
+        },
+        "reinicio_busqueda_segundos": round(t_listo - t_reinicio, 2),
+        "circuito": requests.get(f"{GATEWAY}/search/circuito", timeout=5).json(),
+    }
+
+
+def _reserva(ruta):
+    return lambda s: s.post(f"{RESERVAS}{ruta}", json={"cliente": "Bench", "monto": 100}, timeout=10)
+
+
+def escenario_h1(servicios, rps, fase, timeout_resync):
+    """Inventario detenido mientras se crean reservas; al volver debe drenar la Outbox."""
+    metricas = f"{RESERVAS}/metrics"
+    servicios.detener("inventario")
+
+    carga = CargaAbierta([Objetivo("/reservas", _reserva("/reservas")), Objetivo("/reservas/naive", _reserva("/reservas/naive"))], rps)
+    inicio = time.monotonic()
+    carga.correr(fase)
+    carga.esperar()
+    backlog = leer_metrica(metricas, "outbox_backlog_events")
+
+    t_reinicio = time.monotonic()
+    servicios.iniciar("inventario")
+    resync = None
+    while time.monotonic() - t_reinicio < timeout_resync:
+        if leer_metrica(metricas, "outbox_backlog_events") == 0:
+            resync = round(time.monotonic() - t_reinicio, 2)
+            break
+        time.sleep(0.5)
+
+    naive = carga.resumen(inicio, inicio + fase)["/reservas/naive"]
+    return {
+        "carga_con_inventario_detenido": carga.resumen(inicio, inicio + fase),
+        "backlog_al_reiniciar": backlog,
+        "resync_segundos": resync,
+        "backlog_final": leer_metrica(metricas, "outbox_backlog_events"),
+        # Sin Outbox no hay evento: estas reservas nunca llegan a Inventario
+        "reservas_naive_sin_sincronizar": naive["enviadas"] - naive["errores"],
+    }
+
+
+def _pago(ruta, campo):
+    return Objetivo(
+        ruta,
+        lambda s: s.post(f"{RESERVAS}/reservas/1{ruta}", json={}, timeout=10),
+        correcta=lambda resp: abs(float(resp.json().get(campo) or 0) - MONTO) < 1e-6,
+    )
+
+
+def escenario_h2(servicios, replica, rps, fase, timeout_deteccion):
+    """La réplica 5 empieza a corromper montos: la votación debe enmascararla y aislarla."""
+    carga = CargaAbierta([_pago("/pagar", "monto_acordado"), _pago("/pagar/naive", "monto")], rps)
+    inicio = time.monotonic()
+    hilo = threading.Thread(target=carga.correr, args=(2 * fase,))
+    hilo.start()
+
+    time.sleep(max(inicio + fase - time.monotonic(), 0))
+    t_fallo = time.monotonic()
+    replica.corrupta = True
+    deteccion = None
+    while time.monotonic() - t_fallo < timeout_deteccion:
+        estado = requests.get(f"{RESERVAS}/pagos/replicas", timeout=5).json()["replicas"].get("5", {})
+        if estado.get("estado") == "cuarentena":
+            deteccion = round(time.monotonic() - t_fallo, 2)
+            break
+        time.sleep(0.2)
+
+    hilo.join()
+    carga.esperar()
+    replica.corrupta = False
+    return {
+        "fases": {
+            "normal": carga.resumen(inicio, t_fallo),
+            "replica_corrupta": carga.resumen(t_fallo, inicio + 2 * fase),
+        },
+        "deteccion_segundos": deteccion,
+    }
+
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--escenarios", nargs="+", choices=["h1", "h2", "h3"], default=["h1", "h2", "h3"])
+    parser.add_argument("--rps", type=float, default=20, help="solicitudes/s por endpoint")
+    parser.add_argument("--fase", type=float, default=10, help="segundos por fase de cada escenario")
+    parser.add_argument("--timeout-resync", type=float, default=120)
+    parser.add_argument("--timeout-deteccion", type=float, default=120)
+    parser.add_argument("--postgres", default=None, help="URL base de PostgreSQL (sin nombre de base)")
+    parser.add_argument("--salida", default=None, help="además de imprimirlo, escribe el JSON en este archivo")
+    args = parser.parse_args()
+
+    tmp = tempfile.mkdtemp(prefix="bench_tactics_")
+    replica = ReplicaControlada()
+    servicios = Servicios(tmp, args.postgres, replica.puerto)
+    resultados = {}
+    try:
+        for nombre in SERVICIOS:
+            servicios.iniciar(nombre)
+        if "h3" in args.escenarios:
+            resultados["h3_busqueda_caida"] = escenario_h3(servicios, args.rps, args.fase)
+        if "h1" in args.escenarios:
+            resultados["h1_inventario_detenido"] = escenario_h1(servicios, args.rps, args.fase, args.timeout_resync)
+        if "h2" in args.escenarios:
+            resultados["h2_replica_corrupta"] = escenario_h2(servicios, replica, args.rps, args.fase, args.timeout_deteccion)
+    finally:
+        servicios.detener_todos()
+        replica.cerrar()
+
+    reporte = {
+        "benchmark": "tactics",
+        "commit": _commit(),
+        "base_de_datos": args.postgres.split("@")[-1] if args.postgres else "sqlite",
+        "rps_por_endpoint": args.rps,
+        "fase_segundos": args.fase,
+        "logs": tmp,
+        "escenarios": resultados,
+    }
+    salida = json.dumps(reporte, indent=2)
+    if args.salida:
+        with open(args.salida, "w") as f:
+            f.write(salida + "\n")
+    print(salida)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+import os
+import threading
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import select, delete, func, union_all
+from modelos import db, MarcaAgua, ReservasPorMinuto, VotosPorMinuto, OutboxPorMinuto
+from fuentes import conectar, reservas, reservation_events, reservation_events_archive, payment_votes
+
+# AGREGACIÓN INCREMENTAL
+# Filas leídas por consulta a cada fuente (se repite hasta alcanzar la cabeza).
+ANALISIS_LOTE = int(os.environ.get("ANALISIS_LOTE", 5000))
+# Los votos se agregan por minuto COMPLETO (la mayoría se calcula con todas las réplicas del
+# minuto); este margen extra cubre los votos que el write-behind de Pagos aún no escribió.
+ANALISIS_MARGEN_VOTOS_SEGUNDOS = float(os.environ.get("ANALISIS_MARGEN_VOTOS_SEGUNDOS", 5))
+# Un evento que sigue pendiente tras este tiempo mientras Inventario ya procesó eventos
+# posteriores quedó trabado (payload ilegible, lease perdido): la marca de agua lo salta
+# en vez de esperarlo para siempre. Sigue contando en el backlog mientras esté pendiente.
+ANALISIS_PENDIENTE_MAX_SEGUNDOS = float(os.environ.get("ANALISIS_PENDIENTE_MAX_SEGUNDOS", 300))
+# Los agregados más viejos que esto se borran (las tablas se mantienen compactas).
+ANALISIS_RETENCION_HORAS = int(os.environ.get("ANALISIS_RETENCION_HORAS", 24 * 7))
+
+_lock = threading.Lock()
+_filas_agregadas = defaultdict(int)  # fuente -> filas leídas desde el arranque
+_eventos_saltados = 0  # eventos trabados en pendiente que la marca de agua dejó atrás
+
+
+def _minuto(momento):
+    return momento.replace(second=0, microsecond=0) if momento else None
+
+
+def _marca(fuente):
+    marca = db.session.get(MarcaAgua, fuente)
+    if marca is None:
+        marca = MarcaAgua(fuente=fuente, ultimo_id=0)
+        db.session.add(marca)
+    return marca
+
+
+def _acumular(modelo, clave, **incrementos):
+    """Suma `incrementos` a la fila agregada de `clave` (la crea si no existe)."""
+    fila = db.session.get(modelo, clave)
+    if fila is None:
+        fila = modelo(**dict(zip([c.name for c in modelo.__table__.primary_key], clave)))
+        for columna, valor in incrementos.items():
+            setattr(fila, columna, valor)
+        db.session.add(fila)
+        return fila
+    for columna, valor in incrementos.items():
+        setattr(fila, columna, (getattr(fila, columna) or 0) + valor)
+    return fila
+
+
+def _agregar_reservas(ultimo_id):
+    with conectar("reservas") as connection:
+        filas = connection.execute(
+            select(reservas.c.id, reservas.c.fecha_reserva, reservas.c.monto)
+            .where(reservas.c.id > ultimo_id)
+            .order_by(reservas.c.id)
+            .limit(ANALISIS_LOTE)
+        ).all()
+    por_minuto = defaultdict(lambda: [0, 0.0])
+    for _, fecha, monto in filas:
+        acumulado = por_minuto[_minuto(fecha or datetime.now())]
+        acumulado[0] += 1
+        acumulado[1] += monto or 0.0
+    for minuto, (cantidad, ingresos) in por_minuto.items():
+        _acumular(ReservasPorMinuto, (minuto,), reservas=cantidad, ingresos=ingresos)
+    return (filas[-1][0] if filas else ultimo_id), len(filas), len(filas) == ANALISIS_LOTE
+
+
+def _agregar_eventos(ultimo_id):
+    """
+    Lag de la Outbox: se avanza sólo sobre eventos YA procesados por Inventario y se corta en
+    el primer pendiente, así que cada evento se cuenta una vez y con su lag definitivo. Se lee
+    también el archivo: si Análisis estuvo caído más que la retención, no se pierden eventos.
+
+    Excepción: un pendiente más viejo que ANALISIS_PENDIENTE_MAX_SEGUNDOS con eventos
+    posteriores ya procesados (Inventario consume en orden de id, así que lo dejó atrás) se
+    salta sin lag; queda en `backlog_max` mientras siga pendiente.
+    """
+    global _eventos_saltados
+    columnas = lambda tabla: select(tabla.c.id, tabla.c.created_at, tabla.c.processed_at).where(tabla.c.id > ultimo_id)
+    consulta = union_all(columnas(reservation_events), columnas(reservation_events_archive)).subquery()
+    with conectar("reservas") as connection:
+        filas = connection.execute(select(consulta).order_by(consulta.c.id).limit(ANALISIS_LOTE)).all()
+        # Backlog actual por el índice parcial de pendientes (costo proporcional a lo pendiente)
+        backlog = connection.execute(
+            select(func.count(reservation_events.c.id)).where(reservation_events.c.processed_at.is_(None))
+        ).scalar() or 0
+
+    por_minuto = defaultdict(lambda: [0, 0.0, 0.0])
+    leidas = saltados = 0
+    limite_pendiente = datetime.now() - timedelta(seconds=ANALISIS_PENDIENTE_MAX_SEGUNDOS)
+    ultimo_procesado = max((i for i, fila in enumerate(filas) if fila[2] is not None), default=-1)
+    for i, (id_evento, creado, procesado) in enumerate(filas):
+        if procesado is None:
+            if i > ultimo_procesado or creado is None or creado >= limite_pendiente:
+                break
+            ultimo_id = id_evento
+            leidas += 1
+            saltados += 1
+            continue
+        acumulado = por_minuto[_minuto(creado or procesado)]
+        lag = max((procesado - creado).total_seconds(), 0.0) if creado else 0.0
+        acumulado[0] += 1
+        acumulado[1] += lag
+        acumulado[2] = max(acumulado[2], lag)
+        ultimo_id = id_evento
+        leidas += 1
+
+    for minuto, (eventos, lag_total, lag_max) in por_minuto.items():
+        fila = _acumular(OutboxPorMinuto, (minuto,), eventos=eventos, lag_total_segundos=lag_total)
+        fila.lag_max_segundos = max(fila.lag_max_segundos or 0.0, lag_max)
+    fila = _acumular(OutboxPorMinuto, (_minuto(datetime.now()),))
+    fila.backlog_max = max(fila.backlog_max or 0, backlog)
+    if saltados:
+        print(f"Skipped {saltados} events stuck pending for more than {ANALISIS_PENDIENTE_MAX_SEGUNDOS:.0f}s")
+        with _lock:
+            _eventos_saltados += saltados
+    # Lote lleno de procesados: quedan más; si se cortó en un pendiente, hay que esperar
+    return ultimo_id, leidas, leidas == ANALISIS_LOTE
+
+
+def _agregar_votos(ultimo_id):
+    """
+    Desacuerdo por réplica: en cada minuto, un monto es "de mayoría" si lo votó más de la mitad
+    de las réplicas que votaron en ese minuto (con varios pagos por minuto cada monto correcto
+    tiene su propia mayoría; el x10 de una réplica corrupta no). Los votos no traen el id del
+    pago, así que ésta es la mejor aproximación a la ronda de votación. Por eso cada minuto se
+    agrega entero en una sola corrida: sólo minutos ya cerrados y sin partirlos entre lotes.
+    """
+    corte = _minuto(datetime.now() - timedelta(seconds=ANALISIS_MARGEN_VOTOS_SEGUNDOS))
+    filas, desde = [], ultimo_id
+    with conectar("pagos") as connection:
+        while True:
+            pagina = connection.execute(
+                select(payment_votes.c.id, payment_votes.c.replica_id, payment_votes.c.amount, payment_votes.c.timestamp)
+                .where(payment_votes.c.id > desde)
+                .order_by(payment_votes.c.id)
+                .limit(ANALISIS_LOTE)
+            ).all()
+            filas.extend(pagina)
+            hay_mas = len(pagina) == ANALISIS_LOTE
+            # Un minuto con más votos que el lote se lee completo (memoria: a lo sumo un minuto)
+            if not hay_mas or _minuto(filas[-1][3]) != _minuto(filas[0][3]):
+                break
+            desde = pagina[-1][0]
+    # Corte en el primer voto de un minuto abierto: la marca de agua nunca salta votos sin leer
+    for i, fila in enumerate(filas):
+        if fila[3] is not None and fila[3] >= corte:
+            filas, hay_mas = filas[:i], False
+            break
+    if hay_mas:
+        # Lote lleno: el último minuto puede seguir en el lote siguiente, se deja para entonces
+        ultimo_minuto = _minuto(filas[-1][3])
+        filas = [fila for fila in filas if _minuto(fila[3]) != ultimo_minuto]
+
+    por_minuto = defaultdict(list)
+    for _, replica_id, amount, momento in filas:
+        por_minuto[_minuto(momento or corte)].append((replica_id, round(amount or 0.0, 2)))
+
+    for minuto, votos in por_minuto.items():
+        replicas = {replica_id for replica_id, _ in votos}
+        replicas_por_monto = defaultdict(set)
+        for replica_id, monto in votos:
+            replicas_por_monto[monto].add(replica_id)
+        mayoria = {monto for monto, quienes in replicas_por_monto.items() if len(quienes) * 2 > len(replicas)}
+        conteo = defaultdict(lambda: [0, 0])
+        for replica_id, monto in votos:
+            conteo[replica_id][0] += 1
+            conteo[replica_id][1] += monto not in mayoria
+        for replica_id, (cantidad, desacuerdos) in conteo.items():
+            _acumular(VotosPorMinuto, (minuto, replica_id), votos=cantidad, desacuerdos=desacuerdos)
+    return (filas[-1][0] if filas else ultimo_id), len(filas), hay_mas
+
+
+def _purgar():
+    limite = datetime.now() - timedelta(hours=ANALISIS_RETENCION_HORAS)
+    for modelo in (ReservasPorMinuto, VotosPorMinuto, OutboxPorMinuto):
+        db.session.execute(delete(modelo).where(modelo.minuto < limite))
+
+
+# Cada agregador recibe la marca de agua y retorna (nueva marca, filas leídas, quedan más).
+AGREGADORES = {
+    "reservas": _agregar_reservas,
+    "eventos": _agregar_eventos,
+    "votos": _agregar_votos,
+}
+
+
+def agregar_fuente(fuente):
+    """
+    Lee lo nuevo de una fuente desde su marca de agua y lo suma a los agregados.
+
+    Los agregados y la marca de agua se confirman en la MISMA transacción de la DB de Análisis:
+    si algo falla, la corrida siguiente relee exactamente el mismo rango (sin dobles conteos).
+    El costo de cada corrida es proporcional a las filas nuevas, no al histórico.
+    """
+    total = 0
+    try:
+        while True:
+            marca = _marca(fuente)
+            marca.ultimo_id, leidas, hay_mas = AGREGADORES[fuente](marca.ultimo_id)
+            db.session.commit()
+            total += leidas
+            if not hay_mas:
+                break
+    except Exception as e:
+        print(f"Error aggregating {fuente}: {e}")
+        db.session.rollback()
+
+    if total:
+        with _lock:
+            _filas_agregadas[fuente] += total
+    return total
+
+
+def agregar_incremental():
+    """Job del scheduler (sólo en el líder): una pasada por cada fuente y purga de lo vencido."""
+    totales = {fuente: agregar_fuente(fuente) for fuente in AGREGADORES}
+    try:
+        _purgar()
+        db.session.commit()
+    except Exception as e:
+        print(f"Error purging aggregates: {e}")
+        db.session.rollback()
+    if any(totales.values()):
+        print(f"[{datetime.now()}] Aggregated new rows: {totales}")
+    return totales
+
+
+def filas_agregadas():
+    with _lock:
+        return dict(_filas_agregadas)
+
+
+def eventos_saltados():
+    with _lock:
+        return _eventos_saltados
+
+
+def marcas_de_agua():
+    filas = db.session.query(MarcaAgua.fuente, MarcaAgua.ultimo_id).all()
+    db.session.rollback()
+    return {fuente: ultimo_id for fuente, ultimo_id in filas}
+
+
+def resumen(minutos):
+    """Agregados de la ventana de los últimos `minutos`, servidos sólo desde las tablas compactas."""
+    desde = _minuto(datetime.now()) - timedelta(minutes=minutos - 1)
+
+    reservas_serie = (
+        db.session.query(ReservasPorMinuto)
+        .filter(ReservasPorMinuto.minuto >= desde)
+        .order_by(ReservasPorMinuto.minuto)
+        .all()
+    )
+    total_reservas = sum(f.reservas for f in reservas_serie)
+
+    por_replica = {}
+    for replica_id, votos, desacuerdos in (
+        db.session.query(VotosPorMinuto.replica_id, func.sum(VotosPorMinuto.votos), func.sum(VotosPorMinuto.desacuerdos))
+        .filter(VotosPorMinuto.minuto >= desde)
+        .group_by(VotosPorMinuto.replica_id)
+        .order_by(VotosPorMinuto.replica_id)
+    ):
+        por_replica[str(replica_id)] = {
+            "votos": int(votos or 0),
+            "desacuerdos": int(desacuerdos or 0),
+            "tasa_desacuerdo": round((desacuerdos or 0) / votos, 4) if votos else 0.0,
+        }
+
+    outbox = db.session.query(
+        func.sum(OutboxPorMinuto.eventos),
+        func.sum(OutboxPorMinuto.lag_total_segundos),
+        func.max(OutboxPorMinuto.lag_max_segundos),
+        func.max(OutboxPorMinuto.backlog_max),
+    ).filter(OutboxPorMinuto.minuto >= desde).one()
+    eventos, lag_total, lag_max, backlog_max = outbox
+    db.session.rollback()
+
+    return {
+        "ventana_minutos": minutos,
+        "desde": desde.isoformat(),
+        "reservas": {
+            "total": total_reservas,
+            "por_minuto": round(total_reservas / minutos, 3),
+            "ingresos": round(sum(f.ingresos for f in reservas_serie), 2),
+            "serie": [
+                {"minuto": f.minuto.isoformat(), "reservas": f.reservas, "ingresos": round(f.ingresos, 2)}
+                for f in reservas_serie
+            ],
+        },
+        "votos_por_replica": por_replica,
+        "outbox": {
+            "eventos_procesados": int(eventos or 0),
+            "lag_promedio_segundos": round(lag_total / eventos, 3) if eventos else 0.0,
+            "lag_max_segundos": round(lag_max or 0.0, 3),
+            "backlog_max": int(backlog_max or 0),
+        },
+        "marcas_de_agua": marcas_de_agua(),
+    }
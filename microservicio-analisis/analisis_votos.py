@@ -0,0 +1,362 @@
+"""
+ANÁLISIS OFFLINE DE VOTOS DE PAGOS (H2)
+
+Recorre `payment_votes` (replica_id, amount, timestamp) por chunks y, con NumPy (sin loops
+por fila), reconstruye las rondas de votación, mide cuánto se desvía cada réplica de la
+mayoría y en cuánto tiempo se la habría detectado con la regla de reputación de Reservas
+(REPUTACION_VENTANA / REPUTACION_MIN_MUESTRAS / REPUTACION_UMBRAL_DESACUERDO).
+
+- Ronda: votos consecutivos (por timestamp) separados por menos de VOTOS_VENTANA_RONDA_MS,
+  cortados además cada VOTOS_RONDA_MAX_MS (con carga continua los fan-outs se solapan y no
+  hay huecos). Los votos no traen el id del pago, así que una ronda puede juntar varios pagos.
+- Mayoría: un monto es de mayoría si lo votó más de la mitad de las réplicas de la ronda
+  (con pagos concurrentes en la misma ventana, cada monto correcto tiene su mayoría).
+- Latencia de detección: desde el inicio de la racha de desacuerdos que hizo cruzar el
+  umbral (el desacuerdo más viejo dentro de la ventana de reputación en ese momento) hasta
+  el cruce. No se mide desde el primer desacuerdo del histórico: los cortes fijos de ronda
+  producen desacuerdos aislados en réplicas sanas. H2 pide menos de 2 minutos.
+
+Uso:
+    python analisis_votos.py                                   # PAGOS_DB_URL, todo el histórico
+    python analisis_votos.py --horas 24 --historial reportes_votos.jsonl
+    python analisis_votos.py --pagos-url postgresql://localhost/payments_db --guardar
+    python analisis_votos.py --sinteticos 2000000              # mide el análisis sin DB
+
+Análisis también lo corre cada ANALISIS_VOTOS_INTERVALO_MINUTOS y guarda el reporte en
+`analisis_reportes_votos` (GET /analisis/votos).
+"""
+import os
+import json
+import time
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import create_engine, select
+from fuentes import get_engine, payment_votes
+from modelos import db, ReporteVotos
+
+# Separación máxima entre votos de una misma ronda (el fan-out escribe sus votos en ms).
+VOTOS_VENTANA_RONDA_MS = int(os.environ.get("VOTOS_VENTANA_RONDA_MS", 100))
+# Duración máxima de una ronda (ventanas fijas): acota la memoria y el tamaño de cada ronda.
+VOTOS_RONDA_MAX_MS = int(os.environ.get("VOTOS_RONDA_MAX_MS", 1000))
+# Filas leídas por consulta (memoria acotada: un chunk a la vez).
+VOTOS_CHUNK = int(os.environ.get("VOTOS_CHUNK", 200000))
+# Regla de cuarentena de Reservas (reputacion.py): mismos nombres y valores por defecto.
+REPUTACION_VENTANA = int(os.environ.get("REPUTACION_VENTANA", 50))
+REPUTACION_MIN_MUESTRAS = int(os.environ.get("REPUTACION_MIN_MUESTRAS", 5))
+REPUTACION_UMBRAL_DESACUERDO = float(os.environ.get("REPUTACION_UMBRAL_DESACUERDO", 0.5))
+# Job de Análisis: ventana de votos que cubre cada reporte periódico.
+ANALISIS_VOTOS_VENTANA_HORAS = float(os.environ.get("ANALISIS_VOTOS_VENTANA_HORAS", 24))
+# Objetivo de la hipótesis H2: detectar la réplica corrupta en menos de 2 minutos.
+H2_OBJETIVO_SEGUNDOS = float(os.environ.get("H2_OBJETIVO_SEGUNDOS", 120))
+# Inicio fijo de los votos sintéticos: el mismo --sinteticos da siempre el mismo reporte.
+EPOCA_SINTETICA = datetime(2026, 1, 1)
+
+
+def _grupos(*claves):
+    """Id de grupo (0..n-1) por fila para la combinación de `claves`, y la cantidad de grupos."""
+    orden = np.lexsort(claves[::-1])
+    cambio = np.zeros(len(orden), dtype=bool)
+    if len(orden):
+        cambio[0] = True
+        for clave in claves:
+            ordenada = clave[orden]
+            cambio[1:] |= ordenada[1:] != ordenada[:-1]
+    ids = np.empty(len(orden), dtype=np.int64)
+    ids[orden] = np.cumsum(cambio) - 1
+    return ids, int(cambio.sum())
+
+
+def _ms(momentos):
+    """datetime (hora local, sin zona, como los guarda Pagos) -> ms como int64."""
+    return np.array(momentos, dtype="datetime64[ms]").astype(np.int64)
+
+
+def _iso(ms):
+    return str(np.datetime64(ms, "ms")) if ms is not None else None
+
+
+class EstadoReplica:
+    """Acumulados de una réplica entre chunks (sumas y la cola de la ventana de reputación)."""
+    def __init__(self):
+        self.votos = 0
+        self.desacuerdos = 0
+        self.desviacion_total = 0.0
+        self.desviacion_max = 0.0
+        self.cola = np.zeros(0, dtype=bool)  # últimos REPUTACION_VENTANA desacuerdos...
+        self.cola_ts = np.zeros(0, dtype=np.int64)  # ...y sus timestamps (ms)
+        self.primer_desacuerdo = None  # ms
+        self.inicio_racha = None  # ms: desacuerdo más viejo en la ventana al detectar
+        self.detectada = None  # ms
+
+    def observar(self, ts, desacuerdo, desviacion):
+        """Suma un tramo (ya ordenado por tiempo) de votos de la réplica."""
+        if self.primer_desacuerdo is None and desacuerdo.any():
+            self.primer_desacuerdo = int(ts[np.argmax(desacuerdo)])
+        if self.detectada is None:
+            self._detectar(ts, desacuerdo)
+        self.votos += len(ts)
+        self.desacuerdos += int(desacuerdo.sum())
+        self.desviacion_total += float(desviacion.sum())
+        if len(desviacion):
+            self.desviacion_max = max(self.desviacion_max, float(desviacion.max()))
+        self.cola = np.concatenate([self.cola, desacuerdo])[-REPUTACION_VENTANA:]
+        self.cola_ts = np.concatenate([self.cola_ts, ts])[-REPUTACION_VENTANA:]
+
+    def _detectar(self, ts, desacuerdo):
+        # Tasa de desacuerdo en la ventana deslizante después de cada voto, vectorizada
+        combinado = np.concatenate([self.cola, desacuerdo])
+        acumulado = np.concatenate([[0], np.cumsum(combinado)])
+        posiciones = np.arange(len(self.cola), len(combinado))
+        observaciones = self.votos + posiciones - len(self.cola) + 1
+        ventana = np.minimum(observaciones, REPUTACION_VENTANA)
+        en_ventana = acumulado[posiciones + 1] - acumulado[posiciones + 1 - ventana]
+        cruza = (observaciones >= REPUTACION_MIN_MUESTRAS) & (en_ventana >= REPUTACION_UMBRAL_DESACUERDO * ventana)
+        if cruza.any():
+            i = int(np.argmax(cruza))
+            fin = int(posiciones[i]) + 1
+            desde = fin - int(ventana[i])
+            tiempos = np.concatenate([self.cola_ts, ts])
+            self.detectada = int(tiempos[fin - 1])
+            self.inicio_racha = int(tiempos[desde + int(np.argmax(combinado[desde:fin]))])
+
+    def reporte(self):
+        latencia = None
+        if self.detectada is not None:
+            latencia = round((self.detectada - self.inicio_racha) / 1000, 3)
+        return {
+            "votos": self.votos,
+            "desacuerdos": self.desacuerdos,
+            "tasa_desacuerdo": round(self.desacuerdos / self.votos, 4) if self.votos else 0.0,
+            "desviacion_media": round(self.desviacion_total / self.votos, 4) if self.votos else 0.0,
+            "desviacion_max": round(self.desviacion_max, 4),
+            "primer_desacuerdo": _iso(self.primer_desacuerdo),
+            "inicio_racha": _iso(self.inicio_racha),
+            "detectada_en": _iso(self.detectada),
+            "latencia_deteccion_segundos": latencia,
+        }
+
+
+class AnalizadorVotos:
+    """
+    Análisis en streaming: `agregar` recibe chunks (ms, replica_id, monto) y `reporte` resume.
+
+    La última ronda de cada chunk se guarda y se procesa con el chunk siguiente, así que una
+    ronda nunca queda partida entre dos chunks.
+    """
+    def __init__(self, ventana_ronda_ms=VOTOS_VENTANA_RONDA_MS):
+        self.ventana_ronda_ms = ventana_ronda_ms
+        self.replicas = {}
+        self.rondas = 0
+        self.votos = 0
+        self.desde = None
+        self.hasta = None
+        self._pendiente = None
+
+    def agregar(self, ts, replica, monto):
+        ts = np.asarray(ts, dtype=np.int64)
+        replica = np.asarray(replica, dtype=np.int64)
+        centavos = np.rint(np.asarray(monto, dtype=np.float64) * 100).astype(np.int64)
+        if self._pendiente is not None:
+            ts, replica, centavos = (np.concatenate([a, b]) for a, b in zip(self._pendiente, (ts, replica, centavos)))
+            self._pendiente = None
+        if not len(ts):
+            return
+        orden = np.argsort(ts, kind="stable")
+        ts, replica, centavos = ts[orden], replica[orden], centavos[orden]
+
+        nueva = (np.diff(ts) > self.ventana_ronda_ms) | (np.diff(ts // VOTOS_RONDA_MAX_MS) != 0)
+        ronda = np.concatenate([[0], np.cumsum(nueva)])
+        # La última ronda puede seguir en el próximo chunk: se difiere
+        corte = int(np.searchsorted(ronda, ronda[-1]))
+        self._pendiente = (ts[corte:], replica[corte:], centavos[corte:])
+        if corte:
+            self._procesar(ts[:corte], replica[:corte], centavos[:corte], ronda[:corte])
+
+    def cerrar(self):
+        """Procesa la última ronda diferida (fin del histórico)."""
+        if self._pendiente is not None:
+            ts, replica, centavos = self._pendiente
+            self._pendiente = None
+            if len(ts):
+                self._procesar(ts, replica, centavos, np.zeros(len(ts), dtype=np.int64))
+
+    def _procesar(self, ts, replica, centavos, ronda):
+        rondas = int(ronda[-1]) + 1
+        # Réplicas distintas por ronda, y por (ronda, monto)
+        rr, _ = _grupos(ronda, replica)
+        _, primero_rr = np.unique(rr, return_index=True)
+        replicas_por_ronda = np.bincount(ronda[primero_rr], minlength=rondas)
+
+        ra, n_ra = _grupos(ronda, centavos)
+        rar, _ = _grupos(ra, replica)
+        _, primero_rar = np.unique(rar, return_index=True)
+        replicas_por_ra = np.bincount(ra[primero_rar], minlength=n_ra)
+
+        mayoria = replicas_por_ra[ra] * 2 > replicas_por_ronda[ronda]
+
+        desacuerdo = ~mayoria
+        # Desviación de un voto en desacuerdo: distancia relativa al monto de mayoría más
+        # cercano de su ronda (clave ronda|centavos ordenada + searchsorted, sin loops)
+        desviacion = np.zeros(len(ts))
+        claves_mayoria = np.unique((ronda[mayoria] << 40) | centavos[mayoria])
+        if desacuerdo.any() and len(claves_mayoria):
+            claves = (ronda[desacuerdo] << 40) | centavos[desacuerdo]
+            pos = np.searchsorted(claves_mayoria, claves)
+            cercanos = []
+            for candidata in (np.clip(pos - 1, 0, None), np.clip(pos, None, len(claves_mayoria) - 1)):
+                vecina = claves_mayoria[candidata]
+                misma_ronda = (vecina >> 40) == ronda[desacuerdo]
+                cercanos.append(np.where(misma_ronda, vecina & ((1 << 40) - 1), -1))
+            distancias = [np.where(c >= 0, np.abs(centavos[desacuerdo] - c), np.inf) for c in cercanos]
+            referencia = np.where(distancias[0] <= distancias[1], cercanos[0], cercanos[1])
+            desviacion[desacuerdo] = np.where(
+                referencia >= 0, np.min(distancias, axis=0) / np.maximum(np.abs(referencia), 1), 0.0
+            )
+
+        orden_replica = np.argsort(replica, kind="stable")  # mantiene el orden temporal
+        ids, inicios = np.unique(replica[orden_replica], return_index=True)
+        for replica_id, tramo in zip(ids, np.split(orden_replica, inicios[1:])):
+            estado = self.replicas.setdefault(int(replica_id), EstadoReplica())
+            estado.observar(ts[tramo], desacuerdo[tramo], desviacion[tramo])
+
+        self.rondas += rondas
+        self.votos += len(ts)
+        self.desde = int(ts[0]) if self.desde is None else min(self.desde, int(ts[0]))
+        self.hasta = int(ts[-1]) if self.hasta is None else max(self.hasta, int(ts[-1]))
+
+    def reporte(self):
+        replicas = {str(r): e.reporte() for r, e in sorted(self.replicas.items())}
+        latencias = [r["latencia_deteccion_segundos"] for r in replicas.values() if r["latencia_deteccion_segundos"] is not None]
+        return {
+            "generado_en": datetime.now().isoformat(timespec="seconds"),
+            "votos": self.votos,
+            "rondas": self.rondas,
+            "desde": _iso(self.desde),
+            "hasta": _iso(self.hasta),
+            "ventana_ronda_ms": self.ventana_ronda_ms,
+            "replicas": replicas,
+            "replicas_detectadas": [r for r, datos in replicas.items() if datos["detectada_en"]],
+            "latencia_deteccion_max_segundos": max(latencias) if latencias else None,
+            "h2_cumple": all(l < H2_OBJETIVO_SEGUNDOS for l in latencias) if latencias else None,
+        }
+
+
+def leer_votos(engine, desde=None, chunk=VOTOS_CHUNK):
+    """Itera la tabla `payment_votes` por chunks (keyset por id): (ms, replica_id, monto)."""
+    ultimo_id = 0
+    while True:
+        consulta = (
+            select(payment_votes.c.id, payment_votes.c.replica_id, payment_votes.c.amount, payment_votes.c.timestamp)
+            .where(payment_votes.c.id > ultimo_id)
+            .order_by(payment_votes.c.id)
+            .limit(chunk)
+        )
+        if desde is not None:
+            consulta = consulta.where(payment_votes.c.timestamp >= desde)
+        with engine.connect() as connection:
+            filas = connection.execute(consulta).all()
+        if not filas:
+            return
+        ids, replicas, montos, momentos = zip(*filas)
+        yield _ms(momentos), np.array(replicas, dtype=np.int64), np.array(montos, dtype=np.float64)
+        ultimo_id = ids[-1]
+        if len(filas) < chunk:
+            return
+
+
+def analizar_votos(engine, desde=None, chunk=VOTOS_CHUNK, ventana_ronda_ms=VOTOS_VENTANA_RONDA_MS):
+    """Reporte del histórico de votos (desde `desde` si se indica)."""
+    inicio = time.perf_counter()
+    analizador = AnalizadorVotos(ventana_ronda_ms)
+    for ts, replicas, montos in leer_votos(engine, desde, chunk):
+        analizador.agregar(ts, replicas, montos)
+    analizador.cerrar()
+    reporte = analizador.reporte()
+    reporte["duracion_segundos"] = round(time.perf_counter() - inicio, 3)
+    return reporte
+
+
+def votos_sinteticos(n, replicas=5, replica_corrupta=5, falla_desde=0.5, pagos_por_segundo=20, semilla=7,
+                     inicio=EPOCA_SINTETICA):
+    """
+    `n` votos simulados desde `inicio`: rondas de `replicas` votos cada 1/pagos_por_segundo,
+    montos variados; la réplica corrupta vota x10 a partir de la fracción `falla_desde`.
+    """
+    rng = np.random.default_rng(semilla)
+    rondas = n // replicas
+    inicio_ms = int(_ms([inicio])[0])
+    base_ronda = inicio_ms + np.arange(rondas, dtype=np.int64) * (1000 // pagos_por_segundo)
+    ts = np.repeat(base_ronda, replicas) + rng.integers(0, 20, rondas * replicas)
+    replica = np.tile(np.arange(1, replicas + 1, dtype=np.int64), rondas)
+    monto = np.repeat(rng.choice([45.0, 60.0, 120.0, 300.0], rondas), replicas)
+    corrupta = (replica == replica_corrupta) & (np.repeat(np.arange(rondas), replicas) >= int(rondas * falla_desde))
+    monto[corrupta] *= 10
+    return ts, replica, monto
+
+
+def guardar_reporte(reporte):
+    """Guarda el reporte en `analisis_reportes_votos` (requiere contexto de la app de Análisis)."""
+    db.session.add(ReporteVotos(votos=reporte["votos"], reporte=json.dumps(reporte)))
+    db.session.commit()
+
+
+def generar_reporte_votos():
+    """Job del scheduler de Análisis: reporte de las últimas ANALISIS_VOTOS_VENTANA_HORAS."""
+    desde = datetime.now() - timedelta(hours=ANALISIS_VOTOS_VENTANA_HORAS)
+    try:
+        reporte = analizar_votos(get_engine("pagos"), desde)
+        guardar_reporte(reporte)
+    except Exception as e:
+        print(f"Error analysing payment votes: {e}")
+        db.session.rollback()
+        return None
+    print(
+        f"[{datetime.now()}] Vote report: {reporte['votos']} votes in {reporte['duracion_segundos']}s, "
+        f"detected replicas {reporte['replicas_detectadas']}"
+    )
+    return reporte
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pagos-url", default=None, help="DB de Pagos (por defecto PAGOS_DB_URL)")
+    parser.add_argument("--horas", type=float, default=None, help="sólo los votos de las últimas N horas")
+    parser.add_argument("--chunk", type=int, default=VOTOS_CHUNK)
+    parser.add_argument("--ventana-ms", type=int, default=VOTOS_VENTANA_RONDA_MS)
+    parser.add_argument("--sinteticos", type=int, default=None, help="analizar N votos simulados (sin DB)")
+    parser.add_argument("--historial", default=None, help="agrega el reporte como una línea JSON a este archivo")
+    parser.add_argument("--guardar", action="store_true", help="guarda el reporte en la DB de Análisis")
+    args = parser.parse_args()
+
+    if args.sinteticos:
+        ts, replica, monto = votos_sinteticos(args.sinteticos)
+        inicio = time.perf_counter()
+        analizador = AnalizadorVotos(args.ventana_ms)
+        for desde in range(0, len(ts), args.chunk):
+            analizador.agregar(ts[desde:desde + args.chunk], replica[desde:desde + args.chunk], monto[desde:desde + args.chunk])
+        analizador.cerrar()
+        reporte = analizador.reporte()
+        reporte["duracion_segundos"] = round(time.perf_counter() - inicio, 3)
+    else:
+        if args.pagos_url:
+            engine = create_engine(args.pagos_url.replace("postgres://", "postgresql://", 1))
+        else:
+            engine = get_engine("pagos")
+        desde = datetime.now() - timedelta(hours=args.horas) if args.horas else None
+        reporte = analizar_votos(engine, desde, args.chunk, args.ventana_ms)
+
+    print(json.dumps(reporte, indent=2))
+    if args.historial:
+        with open(args.historial, "a") as archivo:
+            archivo.write(json.dumps(reporte) + "\n")
+    if args.guardar:
+        from app import create_flask_app, inicializar_db
+        app = create_flask_app()
+        inicializar_db(app)
+        with app.app_context():
+            guardar_reporte(reporte)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,21 @@
 import os
+import atexit
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
 from modelos import db
+from vistas import VistaResumenAnalisis, VistaReportesVotos
+from agregacion import agregar_incremental, eventos_saltados, filas_agregadas, marcas_de_agua
+from analisis_votos import generar_reporte_votos
+from metricas import instrumentar_app, medir_job, registro
 from apscheduler.schedulers.background import BackgroundScheduler
+from liderazgo import EleccionLider
+
+# Cada cuánto el líder agrega lo nuevo de Reservas y Pagos.
+ANALISIS_INTERVALO_SEGUNDOS = float(os.environ.get("ANALISIS_INTERVALO_SEGUNDOS", 30))
+# Cada cuánto se genera el reporte offline de votos (H2); 0 lo desactiva.
+ANALISIS_VOTOS_INTERVALO_MINUTOS = float(os.environ.get("ANALISIS_VOTOS_INTERVALO_MINUTOS", 60))
 
 def create_flask_app():
     app = Flask(__name__)
@@ -22,18 +33,76 @@ def create_flask_app():
     CORS(app, resources={r"/*": {"origins": "*"}})
     
     api = Api(app)
+    api.add_resource(VistaResumenAnalisis, '/analisis/resumen')
+    api.add_resource(VistaReportesVotos, '/analisis/votos')
     
     jwt = JWTManager(app)
+    db.init_app(app)
+
+    # Latencia por endpoint, requests en vuelo, tiempo de DB y GET /metrics
+    instrumentar_app(app)
+    registrar_metricas()
 
     return app
 
-app = create_flask_app()
-db.init_app(app)
+def registrar_metricas():
+    registro.gauge(
+        "analisis_watermark_id", "Último id agregado de cada fuente.", ("fuente",),
+        funcion=lambda: {(fuente,): ultimo_id for fuente, ultimo_id in marcas_de_agua().items()},
+    )
+    registro.gauge(
+        "analisis_rows_aggregated_total", "Filas nuevas leídas por el job de agregación.", ("fuente",),
+        funcion=lambda: {(fuente,): filas for fuente, filas in filas_agregadas().items()},
+        tipo="counter",
+    )
+    registro.gauge(
+        "analisis_outbox_events_skipped_total",
+        "Eventos de la Outbox trabados en pendiente que la agregación dejó atrás sin lag.",
+        funcion=eventos_saltados, tipo="counter",
+    )
+
+def inicializar_db(app):
+    """Crea las tablas de agregados. Con gunicorn corre una sola vez en el master (on_starting)."""
+    with app.app_context():
+        db.create_all()
+
+def iniciar_tareas(app):
+    """
+    Agregación incremental de Reservas y Pagos y reporte periódico de votos. El scheduler
+    arranca pausado en cada proceso y sólo el líder electo lo reanuda: una sola escritura de
+    agregados y reportes por servicio.
+    """
+    @medir_job("agregar_incremental")
+    def job_agregar_incremental():
+        with app.app_context():
+            agregar_incremental()
+
+    @medir_job("reporte_votos")
+    def job_reporte_votos():
+        with app.app_context():
+            generar_reporte_votos()
+
+    scheduler = BackgroundScheduler()
+    # max_instances=1: si una corrida se atrasa (backlog grande), la siguiente espera
+    scheduler.add_job(job_agregar_incremental, 'interval', seconds=ANALISIS_INTERVALO_SEGUNDOS, max_instances=1)
+    if ANALISIS_VOTOS_INTERVALO_MINUTOS > 0:
+        scheduler.add_job(job_reporte_votos, 'interval', minutes=ANALISIS_VOTOS_INTERVALO_MINUTOS, max_instances=1)
+    scheduler.start(paused=True)
+
+    lider = EleccionLider(
+        "analisis", app.config["SQLALCHEMY_DATABASE_URI"], al_ganar=scheduler.resume, al_perder=scheduler.pause
+    ).iniciar()
 
-# Scheduler setup
-scheduler = BackgroundScheduler()
-# scheduler.add_job(func, 'interval', seconds=30)
-scheduler.start()
+    def apagar():
+        # Primero soltar el liderazgo (otro worker lo toma), luego detener los jobs
+        lider.detener()
+        scheduler.shutdown(wait=False)
+    atexit.register(apagar)
+    return scheduler
 
 if __name__ == "__main__":
+    # Servidor de desarrollo (un proceso). En producción: gunicorn -c gunicorn.conf.py wsgi:app
+    app = create_flask_app()
+    inicializar_db(app)
+    iniciar_tareas(app)
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5005)), debug=False)
@@ -0,0 +1,91 @@
+import os
+import atexit
+import threading
+from contextlib import contextmanager
+from sqlalchemy import create_engine, MetaData, Table, Column, Integer, Float, String, DateTime
+
+# Análisis sólo LEE las bases operativas (Reservas y Pagos); sus agregados viven en su propia DB.
+basedir = os.path.abspath(os.path.dirname(__file__))
+
+
+def _url(variable, servicio):
+    url = os.environ.get(variable, f"sqlite:///{os.path.join(basedir, '..', servicio, 'instance', 'db.sqlite')}")
+    if url.startswith("postgres://"):
+        url = url.replace("postgres://", "postgresql://", 1)
+    return url
+
+
+FUENTES_URL = {
+    "reservas": _url("RESERVAS_DB_URL", "microservicio-reservas"),
+    "pagos": _url("PAGOS_DB_URL", "microservicio-pagos"),
+}
+# Pool chico: un solo job (el del líder) consulta las fuentes.
+ANALISIS_FUENTES_POOL_SIZE = int(os.environ.get("ANALISIS_FUENTES_POOL_SIZE", 2))
+ANALISIS_FUENTES_POOL_RECYCLE = int(os.environ.get("ANALISIS_FUENTES_POOL_RECYCLE", 1800))
+
+# Sólo las columnas que se agregan; las tablas las crean y migran Reservas y Pagos.
+metadata = MetaData()
+reservas = Table(
+    'reservas', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('fecha_reserva', DateTime),
+    Column('monto', Float),
+)
+reservation_events = Table(
+    'reservation_events', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('event_type', String(50)),
+    Column('created_at', DateTime),
+    Column('processed_at', DateTime),
+)
+reservation_events_archive = Table(
+    'reservation_events_archive', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('event_type', String(50)),
+    Column('created_at', DateTime),
+    Column('processed_at', DateTime),
+)
+payment_votes = Table(
+    'payment_votes', metadata,
+    Column('id', Integer, primary_key=True),
+    Column('replica_id', Integer),
+    Column('amount', Float),
+    Column('timestamp', DateTime),
+)
+
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def get_engine(fuente):
+    """Engine (con pool) hacia la DB de `fuente`; se crea una sola vez por proceso."""
+    if fuente not in _engines:
+        with _engines_lock:
+            if fuente not in _engines:
+                url = FUENTES_URL[fuente]
+                opciones = {"pool_pre_ping": True, "pool_recycle": ANALISIS_FUENTES_POOL_RECYCLE}
+                if not url.startswith("sqlite"):
+                    opciones.update(pool_size=ANALISIS_FUENTES_POOL_SIZE, max_overflow=0)
+                _engines[fuente] = create_engine(url, **opciones)
+    return _engines[fuente]
+
+
+@contextmanager
+def conectar(fuente):
+    """Conexión de sólo lectura: la transacción se revierte siempre (no retiene snapshots)."""
+    connection = get_engine(fuente).connect()
+    try:
+        yield connection
+    finally:
+        connection.rollback()
+        connection.close()
+
+
+def dispose_engines():
+    with _engines_lock:
+        for engine in _engines.values():
+            engine.dispose()
+        _engines.clear()
+
+
+atexit.register(dispose_engines)
@@ -1,3 +1 @@
-from flask_sqlalchemy import SQLAlchemy
-
-db = SQLAlchemy()
+from .modelos import db, MarcaAgua, ReservasPorMinuto, VotosPorMinuto, OutboxPorMinuto, ReporteVotos
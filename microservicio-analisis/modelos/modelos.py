@@ -0,0 +1,46 @@
+from flask_sqlalchemy import SQLAlchemy
+import datetime as dt
+
+db = SQLAlchemy()
+
+class MarcaAgua(db.Model):
+    """Último id leído de cada fuente (reservas, eventos, votos): cada corrida lee sólo lo nuevo."""
+    __tablename__ = 'analisis_marcas_agua'
+    fuente = db.Column(db.String(50), primary_key=True)
+    ultimo_id = db.Column(db.Integer, nullable=False, default=0)
+    actualizado_en = db.Column(db.DateTime, default=dt.datetime.now, onupdate=dt.datetime.now)
+
+class ReservasPorMinuto(db.Model):
+    """Reservas creadas e ingresos por minuto (según fecha_reserva)."""
+    __tablename__ = 'agg_reservas_minuto'
+    minuto = db.Column(db.DateTime, primary_key=True)
+    reservas = db.Column(db.Integer, nullable=False, default=0)
+    ingresos = db.Column(db.Float, nullable=False, default=0.0)
+
+class VotosPorMinuto(db.Model):
+    """Votos de Pagos por minuto y réplica, y cuántos no coincidieron con la mayoría."""
+    __tablename__ = 'agg_votos_minuto'
+    minuto = db.Column(db.DateTime, primary_key=True)
+    replica_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    votos = db.Column(db.Integer, nullable=False, default=0)
+    desacuerdos = db.Column(db.Integer, nullable=False, default=0)
+
+class OutboxPorMinuto(db.Model):
+    """
+    Lag de la Outbox por minuto de creación del evento (created_at -> processed_at), más el
+    backlog pendiente máximo observado en ese minuto.
+    """
+    __tablename__ = 'agg_outbox_minuto'
+    minuto = db.Column(db.DateTime, primary_key=True)
+    eventos = db.Column(db.Integer, nullable=False, default=0)
+    lag_total_segundos = db.Column(db.Float, nullable=False, default=0.0)
+    lag_max_segundos = db.Column(db.Float, nullable=False, default=0.0)
+    backlog_max = db.Column(db.Integer, nullable=False, default=0)
+
+class ReporteVotos(db.Model):
+    """Reporte periódico del análisis offline de votos (analisis_votos.py), para seguir H2 en el tiempo."""
+    __tablename__ = 'analisis_reportes_votos'
+    id = db.Column(db.Integer, primary_key=True)
+    creado_en = db.Column(db.DateTime, default=dt.datetime.now, index=True)
+    votos = db.Column(db.Integer, nullable=False, default=0)
+    reporte = db.Column(db.Text, nullable=False)  # JSON
@@ -0,0 +1 @@
+from .vistas import VistaResumenAnalisis, VistaReportesVotos
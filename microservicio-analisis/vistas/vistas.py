@@ -0,0 +1,31 @@
+import json
+from flask import request
+from flask_restful import Resource
+from modelos import ReporteVotos
+from agregacion import resumen
+
+# Ventana máxima consultable: los agregados se purgan tras ANALISIS_RETENCION_HORAS.
+ANALISIS_VENTANA_MAX_MINUTOS = 24 * 60
+
+
+class VistaResumenAnalisis(Resource):
+    """
+    Agregados de la ventana `?minutos=N` (15 por defecto): reservas/min, ingresos, tasa de
+    desacuerdo por réplica de Pagos y lag de la Outbox. Se leen de las tablas por minuto,
+    nunca de las bases operativas.
+    """
+    def get(self):
+        minutos = request.args.get('minutos', 15, type=int)
+        if minutos is None or not 1 <= minutos <= ANALISIS_VENTANA_MAX_MINUTOS:
+            return {"error": f"minutos must be between 1 and {ANALISIS_VENTANA_MAX_MINUTOS}"}, 400
+        return resumen(minutos), 200
+
+
+class VistaReportesVotos(Resource):
+    """Últimos `?ultimos=N` reportes del análisis offline de votos (analisis_votos.py), del más nuevo al más viejo."""
+    def get(self):
+        ultimos = request.args.get('ultimos', 10, type=int)
+        if ultimos is None or not 1 <= ultimos <= 100:
+            return {"error": "ultimos must be between 1 and 100"}, 400
+        filas = ReporteVotos.query.order_by(ReporteVotos.id.desc()).limit(ultimos).all()
+        return {"reportes": [json.loads(fila.reporte) for fila in filas]}, 200
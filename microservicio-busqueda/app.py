@@ -1,14 +1,14 @@
 import os
+import atexit
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
 from modelos import db
-import redis
-from vistas import VistaBusqueda
-
-# Redis config could go here or in a separate file
-redis_client = redis.Redis(host=os.environ.get('REDIS_HOST', 'localhost'), port=6379, db=0)
+from metricas import instrumentar_app, registro
+from cache import cache_busqueda
+from disponibilidad import snapshot_disponibilidad
+from vistas import VistaBusqueda, VistaCacheBusqueda, VistaDisponibilidadBusqueda
 
 def create_flask_app():
     app = Flask(__name__)
@@ -27,13 +27,47 @@ def create_flask_app():
     
     api = Api(app)
     api.add_resource(VistaBusqueda, '/busqueda')
+    api.add_resource(VistaCacheBusqueda, '/busqueda/cache')
+    api.add_resource(VistaDisponibilidadBusqueda, '/busqueda/disponibilidad')
     
     jwt = JWTManager(app)
+    db.init_app(app)
+
+    # Latencia por endpoint, requests en vuelo, tiempo de DB y GET /metrics
+    instrumentar_app(app)
+    registrar_metricas()
 
     return app
 
-app = create_flask_app()
-db.init_app(app)
+def registrar_metricas():
+    registro.gauge(
+        "busqueda_cache_total", "Consultas al cache de búsqueda por resultado.", ("resultado",),
+        funcion=lambda: {
+            (resultado,): valor for resultado, valor in cache_busqueda.estadisticas().items()
+            if resultado in ("hits", "misses", "esperas", "refrescos", "errores_redis", "omitidas")
+        },
+        tipo="counter",
+    )
+    registro.gauge(
+        "disponibilidad_snapshot_version", "Versión del snapshot de disponibilidad de Inventario en memoria.",
+        funcion=lambda: snapshot_disponibilidad.version,
+    )
+    registro.gauge(
+        "disponibilidad_snapshot_age_seconds", "Segundos desde el último refresco exitoso del snapshot.",
+        funcion=snapshot_disponibilidad.antiguedad,
+    )
+
+def iniciar_tareas(app):
+    """
+    Refresco incremental del snapshot de disponibilidad. Corre en CADA worker: el snapshot
+    vive en memoria del proceso para que anotar una búsqueda no cueste ninguna llamada.
+    """
+    snapshot_disponibilidad.iniciar()
+    atexit.register(snapshot_disponibilidad.detener)
+    return snapshot_disponibilidad
 
 if __name__ == "__main__":
+    # Servidor de desarrollo (un proceso). En producción: gunicorn -c gunicorn.conf.py wsgi:app
+    app = create_flask_app()
+    iniciar_tareas(app)
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5001)), debug=False)
@@ -0,0 +1,292 @@
+import os
+import json
+import time
+import uuid
+import threading
+from urllib.parse import urlencode
+import redis
+from redis.backoff import NoBackoff
+from redis.retry import Retry
+
+# Backend del cache: "redis" (por defecto) o "memoria" (FakeRedis local, para pruebas/desarrollo).
+CACHE_BACKEND = os.environ.get("CACHE_BACKEND", "redis")
+REDIS_HOST = os.environ.get("REDIS_HOST", "localhost")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
+# TTL de cada resultado de búsqueda.
+BUSQUEDA_CACHE_TTL = int(os.environ.get("BUSQUEDA_CACHE_TTL", 60))
+# Lock de single-flight: sólo un request recalcula una clave a la vez.
+BUSQUEDA_CACHE_LOCK_MS = int(os.environ.get("BUSQUEDA_CACHE_LOCK_MS", 2000))
+# Refresco anticipado: pasado este porcentaje del TTL, un request refresca en segundo plano.
+BUSQUEDA_CACHE_REFRESCO = float(os.environ.get("BUSQUEDA_CACHE_REFRESCO", 0.8))
+# Tras un error de Redis se omite el cache durante este tiempo (no pagar el timeout en cada request).
+BUSQUEDA_CACHE_REINTENTO_SEGUNDOS = float(os.environ.get("BUSQUEDA_CACHE_REINTENTO_SEGUNDOS", 5))
+
+# Compare-and-delete atómico: sólo se borra el lock si todavía tiene nuestro token. Si un
+# recálculo dura más que BUSQUEDA_CACHE_LOCK_MS, el lock ya es de otro worker y no se toca.
+SOLTAR_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class FakeRedis:
+    """
+    Subconjunto en memoria de la API de redis-py usado por CacheLectura (get/set/delete/incr/ping),
+    más `eliminar_si_igual`, el equivalente del script SOLTAR_LOCK.
+    """
+    def __init__(self):
+        self._datos = {}
+        self._lock = threading.Lock()
+
+    def _vivo(self, clave):
+        item = self._datos.get(clave)
+        if item is None:
+            return None
+        valor, expira = item
+        if expira is not None and expira < time.monotonic():
+            del self._datos[clave]
+            return None
+        return valor
+
+    def get(self, clave):
+        with self._lock:
+            return self._vivo(clave)
+
+    def set(self, clave, valor, ex=None, px=None, nx=False):
+        with self._lock:
+            if nx and self._vivo(clave) is not None:
+                return None
+            ttl = ex if ex is not None else (px / 1000 if px is not None else None)
+            if isinstance(valor, str):
+                valor = valor.encode()
+            self._datos[clave] = (valor, time.monotonic() + ttl if ttl is not None else None)
+            return True
+
+    def delete(self, *claves):
+        with self._lock:
+            return sum(1 for clave in claves if self._datos.pop(clave, None) is not None)
+
+    def eliminar_si_igual(self, clave, valor):
+        with self._lock:
+            if isinstance(valor, str):
+                valor = valor.encode()
+            if self._vivo(clave) != valor:
+                return 0
+            del self._datos[clave]
+            return 1
+
+    def incr(self, clave):
+        with self._lock:
+            valor = int(self._vivo(clave) or 0) + 1
+            self._datos[clave] = (str(valor).encode(), None)
+            return valor
+
+    def ping(self):
+        return True
+
+
+def crear_cliente_redis():
+    if CACHE_BACKEND == "memoria":
+        return FakeRedis()
+    # Sin reintentos internos: si Redis falla, la búsqueda va directo a la fuente
+    return redis.Redis(
+        host=REDIS_HOST, port=REDIS_PORT, db=0,
+        socket_timeout=0.2, socket_connect_timeout=0.2, retry=Retry(NoBackoff(), 0),
+    )
+
+
+class CacheLectura:
+    """
+    Cache read-through sobre Redis.
+
+    - Clave: prefijo + versión del namespace + parámetros normalizados (orden, mayúsculas, espacios).
+    - Single-flight: ante un miss, sólo quien toma el lock `<clave>:lock` recalcula;
+      los demás esperan a que aparezca el valor (sin estampida sobre la fuente).
+    - Refresco anticipado: pasado BUSQUEDA_CACHE_REFRESCO del TTL, un request refresca
+      la entrada en segundo plano y todos siguen leyendo el valor vigente.
+    - Si Redis no responde se calcula directo y se omite el cache durante
+      BUSQUEDA_CACHE_REINTENTO_SEGUNDOS: el cache nunca tumba la búsqueda.
+    """
+    def __init__(self, cliente, prefijo, ttl=BUSQUEDA_CACHE_TTL):
+        self._cliente = cliente
+        self._prefijo = prefijo
+        self._ttl = ttl
+        self._lock = threading.Lock()
+        self._omitir_hasta = 0.0
+        self._stats = {"hits": 0, "misses": 0, "esperas": 0, "refrescos": 0, "errores_redis": 0, "omitidas": 0}
+        self._latencia = {"hit": [0, 0.0, 0.0], "miss": [0, 0.0, 0.0]}  # [n, suma_ms, max_ms]
+
+    # ------------------------------------------------------------------
+    # Claves
+    # ------------------------------------------------------------------
+    @staticmethod
+    def normalizar(params):
+        return urlencode(sorted(
+            (str(k).strip().lower(), str(v).strip().lower())
+            for k, v in (params or {}).items() if str(v).strip()
+        ))
+
+    def _clave(self, params):
+        version = self._cliente.get(f"{self._prefijo}:version") or b"0"
+        if isinstance(version, bytes):
+            version = version.decode()
+        return f"{self._prefijo}:v{version}:{self.normalizar(params)}"
+
+    # ------------------------------------------------------------------
+    # Lectura
+    # ------------------------------------------------------------------
+    def obtener(self, params, calcular, deadline=None):
+        """
+        Valor cacheado de `params`, o `calcular(deadline)` ante un miss. El deadline del request
+        sólo se usa cuando este request espera el cálculo; el refresco en segundo plano es
+        compartido y corre con `calcular(None)`.
+        """
+        if time.monotonic() < self._omitir_hasta:
+            self._contar("omitidas")
+            return calcular(deadline)
+
+        inicio = time.perf_counter()
+        try:
+            clave = self._clave(params)
+            crudo = self._cliente.get(clave)
+        except redis.RedisError:
+            self._fallo_redis()
+            return calcular(deadline)
+
+        if crudo is not None:
+            entrada = json.loads(crudo)
+            if time.time() - entrada["calculado_en"] > self._ttl * BUSQUEDA_CACHE_REFRESCO:
+                self._refrescar_en_segundo_plano(clave, calcular)
+            self._contar("hits")
+            self._medir("hit", inicio)
+            return entrada["valor"]
+
+        self._contar("misses")
+        valor = self._calcular_single_flight(clave, calcular, deadline)
+        self._medir("miss", inicio)
+        return valor
+
+    def _guardar(self, clave, valor):
+        entrada = json.dumps({"valor": valor, "calculado_en": time.time()})
+        self._cliente.set(clave, entrada, ex=self._ttl)
+
+    def _tomar_lock(self, clave):
+        """Token del lock de recálculo de `clave`, o None si otro worker lo tiene."""
+        token = uuid.uuid4().hex
+        if self._cliente.set(f"{clave}:lock", token, nx=True, px=BUSQUEDA_CACHE_LOCK_MS):
+            return token
+        return None
+
+    def _soltar_lock(self, clave, token):
+        if isinstance(self._cliente, FakeRedis):
+            return self._cliente.eliminar_si_igual(f"{clave}:lock", token)
+        return self._cliente.eval(SOLTAR_LOCK, 1, f"{clave}:lock", token)
+
+    def _calcular_single_flight(self, clave, calcular, deadline):
+        try:
+            token = self._tomar_lock(clave)
+        except redis.RedisError:
+            self._fallo_redis()
+            return calcular(deadline)
+
+        if token:
+            try:
+                valor = calcular(deadline)
+            except Exception:
+                try:
+                    self._soltar_lock(clave, token)
+                except redis.RedisError:
+                    self._fallo_redis()
+                raise
+            try:
+                self._guardar(clave, valor)
+                self._soltar_lock(clave, token)
+            except redis.RedisError:
+                self._fallo_redis()
+            return valor
+
+        # Otro request está recalculando: esperar su resultado en lugar de recalcular
+        self._contar("esperas")
+        limite = time.monotonic() + BUSQUEDA_CACHE_LOCK_MS / 1000
+        try:
+            while time.monotonic() < limite:
+                time.sleep(0.01)
+                crudo = self._cliente.get(clave)
+                if crudo is not None:
+                    return json.loads(crudo)["valor"]
+                if self._cliente.get(f"{clave}:lock") is None:
+                    # Quien recalculaba falló (p. ej. venció su deadline): recalcular aquí
+                    break
+        except redis.RedisError:
+            self._fallo_redis()
+        return calcular(deadline)
+
+    def _refrescar_en_segundo_plano(self, clave, calcular):
+        try:
+            token = self._tomar_lock(clave)
+        except redis.RedisError:
+            self._fallo_redis()
+            return
+        if not token:
+            return
+        self._contar("refrescos")
+
+        def refrescar():
+            try:
+                # Sin el deadline del request que lo disparó: el resultado es para todos
+                self._guardar(clave, calcular(None))
+            except Exception as e:
+                print(f"Background cache refresh failed for {clave}: {e}")
+            finally:
+                try:
+                    self._soltar_lock(clave, token)
+                except redis.RedisError:
+                    self._fallo_redis()
+
+        threading.Thread(target=refrescar, daemon=True).start()
+
+    # ------------------------------------------------------------------
+    # Invalidación
+    # ------------------------------------------------------------------
+    def invalidar(self, params):
+        """Invalida la entrada de una búsqueda concreta."""
+        return self._cliente.delete(self._clave(params))
+
+    def invalidar_todo(self):
+        """Invalida todo el namespace en O(1): las claves viejas expiran solas por TTL."""
+        return self._cliente.incr(f"{self._prefijo}:version")
+
+    # ------------------------------------------------------------------
+    # Métricas
+    # ------------------------------------------------------------------
+    def _fallo_redis(self):
+        self._omitir_hasta = time.monotonic() + BUSQUEDA_CACHE_REINTENTO_SEGUNDOS
+        self._contar("errores_redis")
+
+    def _contar(self, clave):
+        with self._lock:
+            self._stats[clave] += 1
+
+    def _medir(self, tipo, inicio):
+        ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            registro = self._latencia[tipo]
+            registro[0] += 1
+            registro[1] += ms
+            registro[2] = max(registro[2], ms)
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            consultas = stats["hits"] + stats["misses"]
+            stats["hit_ratio"] = round(stats["hits"] / consultas, 3) if consultas else 0.0
+            for tipo, (n, suma, maximo) in self._latencia.items():
+                stats[f"latencia_{tipo}_promedio_ms"] = round(suma / n, 3) if n else None
+                stats[f"latencia_{tipo}_max_ms"] = round(maximo, 3)
+        return stats
+
+
+redis_client = crear_cliente_redis()
+cache_busqueda = CacheLectura(redis_client, "busqueda")
@@ -0,0 +1,107 @@
+import os
+import time
+import threading
+import requests
+
+# Snapshot de disponibilidad publicado por Inventario (GET /inventario/snapshot).
+INVENTARIO_URL = os.environ.get("INVENTARIO_URL", "http://127.0.0.1:5004")
+DISPONIBILIDAD_INTERVALO_SEGUNDOS = float(os.environ.get("DISPONIBILIDAD_INTERVALO_SEGUNDOS", 2))
+DISPONIBILIDAD_TIMEOUT_SEGUNDOS = float(os.environ.get("DISPONIBILIDAD_TIMEOUT_SEGUNDOS", 1))
+# Con 0 las ofertas agotadas se anotan (disponibles: 0) pero no se filtran.
+DISPONIBILIDAD_FILTRAR_AGOTADAS = os.environ.get("DISPONIBILIDAD_FILTRAR_AGOTADAS", "1") == "1"
+
+
+class SnapshotDisponibilidad:
+    """
+    Copia en memoria de la disponibilidad de Inventario (producto -> unidades).
+
+    Un hilo de fondo la refresca cada DISPONIBILIDAD_INTERVALO_SEGUNDOS pidiendo sólo lo que
+    cambió desde la última versión (`?desde=`), así que cada consulta de búsqueda lee un
+    dict local: sin llamadas a Inventario en el camino del request. Si Inventario cae, se
+    sigue sirviendo el último snapshot (la búsqueda nunca falla por disponibilidad).
+    """
+    def __init__(self, url=INVENTARIO_URL):
+        self._url = url.rstrip("/") + "/inventario/snapshot"
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._productos = {}
+        self.version = 0
+        self._actualizado = None  # time.monotonic() del último refresco exitoso
+        self._detener = threading.Event()
+        self._stats = {"refrescos": 0, "completos": 0, "cambios": 0, "errores": 0}
+        self._fallando = False
+
+    def refrescar(self):
+        """Trae el delta desde la versión local; retorna False si Inventario no respondió."""
+        try:
+            resp = self._session.get(self._url, params={"desde": self.version}, timeout=DISPONIBILIDAD_TIMEOUT_SEGUNDOS)
+            resp.raise_for_status()
+            datos = resp.json()
+        except (requests.RequestException, ValueError) as e:
+            with self._lock:
+                self._stats["errores"] += 1
+            if not self._fallando:
+                self._fallando = True
+                print(f"Availability snapshot refresh failed, serving version {self.version}: {e}")
+            return False
+        if self._fallando:
+            self._fallando = False
+            print("Availability snapshot refresh recovered")
+
+        with self._lock:
+            if datos["completo"]:
+                # Reemplazo atómico: los lectores ven el snapshot viejo o el nuevo, nunca uno a medias
+                self._productos = dict(datos["productos"])
+                self._stats["completos"] += 1
+            elif datos["productos"]:
+                productos = dict(self._productos)
+                productos.update(datos["productos"])
+                self._productos = productos
+            self._stats["refrescos"] += 1
+            self._stats["cambios"] += len(datos["productos"])
+            self.version = datos["version"]
+            self._actualizado = time.monotonic()
+        return True
+
+    def disponibles(self, producto):
+        """Unidades disponibles, o None si el producto no está en el snapshot."""
+        return self._productos.get(producto)
+
+    def anotar(self, ofertas):
+        """Copia de `ofertas` con `disponibles` según el snapshot; sin las agotadas si corresponde."""
+        productos = self._productos
+        resultado = []
+        for oferta in ofertas:
+            disponibles = productos.get(oferta.get("producto"))
+            if disponibles == 0 and DISPONIBILIDAD_FILTRAR_AGOTADAS:
+                continue
+            resultado.append(dict(oferta, disponibles=disponibles))
+        return resultado
+
+    def antiguedad(self):
+        """Segundos desde el último refresco exitoso (None si nunca se obtuvo)."""
+        actualizado = self._actualizado
+        return time.monotonic() - actualizado if actualizado is not None else None
+
+    def _loop(self):
+        while not self._detener.is_set():
+            self.refrescar()
+            self._detener.wait(DISPONIBILIDAD_INTERVALO_SEGUNDOS)
+
+    def iniciar(self):
+        threading.Thread(target=self._loop, name="disponibilidad", daemon=True).start()
+
+    def detener(self):
+        self._detener.set()
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats["productos"] = len(self._productos)
+        stats["version"] = self.version
+        antiguedad = self.antiguedad()
+        stats["antiguedad_segundos"] = round(antiguedad, 1) if antiguedad is not None else None
+        return stats
+
+
+snapshot_disponibilidad = SnapshotDisponibilidad()
@@ -0,0 +1,16 @@
+import os
+import multiprocessing
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+bind = f"0.0.0.0:{os.environ.get('PORT', 5001)}"
+# Un proceso por core (x2 + 1) para usar toda la CPU del dyno; Heroku fija WEB_CONCURRENCY.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Hilos por worker: las vistas esperan a Redis y a la consulta de ofertas.
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 10))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Heartbeat de los workers en memoria (en contenedores /tmp puede ser un disco lento).
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
@@ -0,0 +1,252 @@
+import os
+import time
+import threading
+import functools
+from flask import Response, g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Buckets (segundos) compartidos por todos los histogramas de latencia.
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Sólo se publican estas operaciones SQL como etiqueta; el resto cuenta como OTRA.
+OPERACIONES_SQL = {"SELECT", "INSERT", "UPDATE", "DELETE", "WITH"}
+LE_INF = 'le="+Inf"'
+
+
+def _etiquetas(nombres, valores, extra=""):
+    pares = [
+        '{}="{}"'.format(n, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for n, v in zip(nombres, valores)
+    ]
+    if extra:
+        pares.append(extra)
+    return "{" + ",".join(pares) + "}" if pares else ""
+
+
+def _numero(valor):
+    return "+Inf" if valor == float("inf") else repr(float(valor))
+
+
+class Histograma:
+    def __init__(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        self.nombre = nombre
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.buckets = tuple(buckets)
+        self._series = {}  # valores de etiquetas -> [conteos por bucket, suma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, **etiquetas):
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        with self._lock:
+            serie = self._series.get(clave)
+            if serie is None:
+                serie = self._series[clave] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def exponer(self):
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} histogram"]
+        with self._lock:
+            series = [(clave, list(conteos), suma, total) for clave, (conteos, suma, total) in sorted(self._series.items())]
+        for clave, conteos, suma, total in series:
+            acumulado = 0
+            for limite, cantidad in zip(self.buckets, conteos):
+                acumulado += cantidad
+                le = 'le="{}"'.format(_numero(limite))
+                lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, le)} {acumulado}")
+            lineas.append(f"{self.nombre}_bucket{_etiquetas(self.etiquetas, clave, LE_INF)} {total}")
+            lineas.append(f"{self.nombre}_sum{_etiquetas(self.etiquetas, clave)} {_numero(suma)}")
+            lineas.append(f"{self.nombre}_count{_etiquetas(self.etiquetas, clave)} {total}")
+        return lineas
+
+
+class Gauge:
+    """
+    Gauge con valor propio (`sumar`/`fijar`) o calculado al exponer (`funcion`).
+    Con tipo="counter" expone un contador monótono que ya lleva otro módulo.
+    """
+    def __init__(self, nombre, ayuda, etiquetas=(), funcion=None, tipo="gauge"):
+        self.nombre = nombre
+        self.tipo = tipo
+        self.ayuda = ayuda
+        self.etiquetas = tuple(etiquetas)
+        self.funcion = funcion
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def sumar(self, delta=1, **etiquetas):
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = self._valores.get(clave, 0) + delta
+
+    def fijar(self, valor, **etiquetas):
+        clave = tuple(etiquetas.get(n, "") for n in self.etiquetas)
+        with self._lock:
+            self._valores[clave] = valor
+
+    def exponer(self):
+        if self.funcion is not None:
+            # La función retorna un número, o {tupla de etiquetas: número}; None = sin dato
+            try:
+                valor = self.funcion()
+            except Exception as e:
+                print(f"Metric {self.nombre} could not be collected: {e}")
+                return []
+            if valor is None:
+                return []
+            valores = valor if isinstance(valor, dict) else {(): valor}
+        else:
+            with self._lock:
+                valores = dict(self._valores)
+        lineas = [f"# HELP {self.nombre} {self.ayuda}", f"# TYPE {self.nombre} {self.tipo}"]
+        for clave, valor in sorted(valores.items()):
+            lineas.append(f"{self.nombre}{_etiquetas(self.etiquetas, clave)} {_numero(valor)}")
+        return lineas
+
+
+class Registro:
+    def __init__(self):
+        self._metricas = {}
+        self._lock = threading.Lock()
+
+    def _registrar(self, metrica):
+        with self._lock:
+            return self._metricas.setdefault(metrica.nombre, metrica)
+
+    def histograma(self, nombre, ayuda, etiquetas=(), buckets=BUCKETS_SEGUNDOS):
+        return self._registrar(Histograma(nombre, ayuda, etiquetas, buckets))
+
+    def gauge(self, nombre, ayuda, etiquetas=(), funcion=None, tipo="gauge"):
+        return self._registrar(Gauge(nombre, ayuda, etiquetas, funcion, tipo))
+
+    def exponer(self):
+        with self._lock:
+            metricas = list(self._metricas.values())
+        lineas = []
+        for metrica in metricas:
+            lineas.extend(metrica.exponer())
+        return "\n".join(lineas) + "\n"
+
+
+registro = Registro()
+
+
+def memorizar(funcion, segundos=1.0):
+    """
+    Envuelve una función costosa que alimenta varias métricas (p. ej. una consulta que da
+    backlog y lag): dentro de un mismo scrape de /metrics se calcula una sola vez.
+    """
+    lock = threading.Lock()
+    memo = {"calculado_en": None, "valor": None}
+
+    def envoltura():
+        with lock:
+            ahora = time.monotonic()
+            if memo["calculado_en"] is None or ahora - memo["calculado_en"] >= segundos:
+                memo["valor"] = funcion()
+                memo["calculado_en"] = ahora
+            return memo["valor"]
+    return envoltura
+
+HTTP_DURACION = registro.histograma(
+    "http_request_duration_seconds", "Latencia de los requests HTTP atendidos.", ("metodo", "endpoint", "estado")
+)
+HTTP_EN_VUELO = registro.gauge("http_requests_in_flight", "Requests HTTP en curso.", ("endpoint",))
+DB_DURACION = registro.histograma(
+    "db_query_duration_seconds", "Duración de las sentencias SQL.", ("base", "operacion")
+)
+SALIENTE_DURACION = registro.histograma(
+    "http_client_request_duration_seconds", "Latencia de las llamadas HTTP salientes.", ("upstream", "resultado")
+)
+JOB_DURACION = registro.histograma(
+    "scheduler_job_duration_seconds", "Duración de los jobs del scheduler.", ("job", "resultado")
+)
+
+
+def instrumentar_app(app):
+    """Registra latencia y requests en vuelo por endpoint, el tiempo de DB y el endpoint /metrics."""
+    @app.before_request
+    def _inicio_request():
+        g._metricas_inicio = time.perf_counter()
+        g._metricas_endpoint = request.url_rule.rule if request.url_rule else "sin_ruta"
+        HTTP_EN_VUELO.sumar(1, endpoint=g._metricas_endpoint)
+
+    @app.after_request
+    def _fin_request(response):
+        g._metricas_estado = response.status_code
+        return response
+
+    @app.teardown_request
+    def _cerrar_request(error=None):
+        inicio = g.pop("_metricas_inicio", None)
+        if inicio is None:
+            return
+        endpoint = g.pop("_metricas_endpoint")
+        estado = g.pop("_metricas_estado", 500)
+        HTTP_EN_VUELO.sumar(-1, endpoint=endpoint)
+        if endpoint == "/metrics":
+            return
+        HTTP_DURACION.observar(time.perf_counter() - inicio, metodo=request.method, endpoint=endpoint, estado=estado)
+
+    app.add_url_rule("/metrics", "metrics", lambda: Response(registro.exponer(), mimetype="text/plain; version=0.0.4"))
+    instrumentar_db()
+
+
+_db_instrumentada = False
+
+
+def instrumentar_db():
+    """Mide todas las sentencias SQL del proceso (cualquier Engine, incluido el de otra base)."""
+    global _db_instrumentada
+    if _db_instrumentada:
+        return
+    _db_instrumentada = True
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _antes(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_metricas_inicio", []).append(time.perf_counter())
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _despues(conn, cursor, statement, parameters, context, executemany):
+        inicios = conn.info.get("_metricas_inicio")
+        if not inicios:
+            return
+        operacion = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+        DB_DURACION.observar(
+            time.perf_counter() - inicios.pop(),
+            base=os.path.basename(conn.engine.url.database or conn.engine.url.host or ""),
+            operacion=operacion if operacion in OPERACIONES_SQL else "OTRA",
+        )
+
+    @event.listens_for(Engine, "handle_error")
+    def _error(contexto):
+        # Una sentencia que falla no llega a after_cursor_execute: descartar su inicio para que
+        # la lista no crezca en las conexiones del pool
+        conn = contexto.connection
+        if conn is None or getattr(contexto, "execution_context", None) is None:
+            return
+        inicios = conn.info.get("_metricas_inicio")
+        if inicios:
+            inicios.pop()
+
+
+def medir_job(nombre):
+    """Decorador para jobs del scheduler: registra su duración y si terminaron con error."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            inicio = time.perf_counter()
+            resultado = "error"
+            try:
+                valor = funcion(*args, **kwargs)
+                resultado = "ok"
+                return valor
+            finally:
+                JOB_DURACION.observar(time.perf_counter() - inicio, job=nombre, resultado=resultado)
+        return envoltura
+    return decorador
@@ -1 +1 @@
-from .vistas import VistaBusqueda
+from .vistas import VistaBusqueda, VistaCacheBusqueda, VistaDisponibilidadBusqueda
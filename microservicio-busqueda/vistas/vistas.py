@@ -1,12 +1,75 @@
+from flask import request
 from flask_restful import Resource
 import time
 import random
+from cache import cache_busqueda
+from disponibilidad import snapshot_disponibilidad
+
+# Deadline absoluto (epoch en ms) propagado por el Gateway.
+DEADLINE_HEADER = "X-Request-Deadline"
+# Marca los duplicados del hedging del Gateway.
+HEDGE_HEADER = "X-Hedged-Request"
+
+
+class DeadlineExcedido(Exception):
+    pass
+
+
+def deadline_entrante():
+    try:
+        return int(request.headers.get(DEADLINE_HEADER)) / 1000
+    except (TypeError, ValueError):
+        return None
+
+
+def buscar_ofertas(params, deadline=None):
+    # Simular latencia variable de la consulta a la DB
+    latencia = random.uniform(0.1, 0.5)
+    if deadline is not None and time.time() + latencia > deadline:
+        # El cliente se rinde antes de que la consulta termine: abandonar el trabajo
+        time.sleep(max(deadline - time.time(), 0))
+        raise DeadlineExcedido()
+    time.sleep(latencia)
+    return [
+        {"id": 1, "nombre": "Hotel Playa", "precio": 100, "producto": "Habitacion_Standard"},
+        {"id": 2, "nombre": "Hotel Montaña", "precio": 80, "producto": "Habitacion_Montana"}
+    ]
+
 
 class VistaBusqueda(Resource):
     def get(self):
-        # Simular latencia variable
-        time.sleep(random.uniform(0.1, 0.5))
-        return [
-            {"id": 1, "nombre": "Hotel Playa", "precio": 100},
-            {"id": 2, "nombre": "Hotel Montaña", "precio": 80}
-        ], 200
+        # Read-through: la clave es la búsqueda normalizada (?destino=Cancun == ?DESTINO=cancun)
+        params = request.args.to_dict()
+        deadline = deadline_entrante()
+        if deadline is not None and time.time() >= deadline:
+            return {"error": "Deadline exceeded"}, 504
+        try:
+            if request.headers.get(HEDGE_HEADER):
+                # Un duplicado sólo existe porque el original tardó (miss): calcular en paralelo
+                # en lugar de esperar el lock single-flight que tiene el original
+                ofertas = buscar_ofertas(params, deadline)
+            else:
+                ofertas = cache_busqueda.obtener(params, lambda limite: buscar_ofertas(params, limite), deadline)
+        except DeadlineExcedido:
+            return {"error": "Deadline exceeded"}, 504
+        # La disponibilidad se anota en cada respuesta (no se cachea con las ofertas):
+        # sale del snapshot en memoria, sin llamar a Inventario por consulta.
+        return snapshot_disponibilidad.anotar(ofertas), 200
+
+
+class VistaCacheBusqueda(Resource):
+    def get(self):
+        return cache_busqueda.estadisticas(), 200
+
+    def delete(self):
+        # Hook de invalidación: con parámetros invalida esa búsqueda; sin ellos, todo el namespace
+        params = request.args.to_dict()
+        if params:
+            return {"invalidadas": cache_busqueda.invalidar(params)}, 200
+        return {"version": cache_busqueda.invalidar_todo()}, 200
+
+
+class VistaDisponibilidadBusqueda(Resource):
+    def get(self):
+        # Versión, antigüedad y contadores del snapshot de disponibilidad de Inventario
+        return snapshot_disponibilidad.estadisticas(), 200
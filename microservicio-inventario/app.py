@@ -1,11 +1,19 @@
 import os
+import atexit
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
+from sqlalchemy import inspect, text
 from modelos import db, Inventario
+from vistas import VistaInventario, VistaSnapshotInventario
+from stock import PRODUCTO_POR_DEFECTO, INVENTARIO_STOCK_INICIAL, existencias, sobreventa_acumulada
+from metricas import instrumentar_app, medir_job, memorizar, registro
 from apscheduler.schedulers.background import BackgroundScheduler
-from tasks import poll_reservations
+from tasks import poll_reservations, purgar_eventos_aplicados, estado_consumidor, eventos_ilegibles
+from notificaciones import iniciar_modo_push
+from reservas_db import estadisticas_pool
+from liderazgo import EleccionLider
 
 def create_flask_app():
     app = Flask(__name__)
@@ -23,26 +31,137 @@ def create_flask_app():
     CORS(app, resources={r"/*": {"origins": "*"}})
     
     api = Api(app)
+    api.add_resource(VistaInventario, '/inventario')
+    api.add_resource(VistaSnapshotInventario, '/inventario/snapshot')
     
     jwt = JWTManager(app)
+    db.init_app(app)
+
+    # Latencia por endpoint, requests en vuelo, tiempo de DB y GET /metrics
+    instrumentar_app(app)
+    registrar_metricas()
 
     return app
 
-app = create_flask_app()
-db.init_app(app)
+def registrar_metricas():
+    # Lag del consumidor de la Outbox (se calcula al consultar /metrics, una consulta por scrape)
+    estado = memorizar(estado_consumidor)
+    registro.gauge(
+        "outbox_backlog_events", "Eventos de la Outbox de Reservas pendientes de aplicar.",
+        funcion=lambda: estado()["pendientes"],
+    )
+    registro.gauge(
+        "outbox_consumer_lag_seconds", "Antigüedad del evento pendiente más viejo (lag del consumidor).",
+        funcion=lambda: estado()["lag_segundos"],
+    )
+    registro.gauge(
+        "outbox_consumer_cursor", "Último evento aplicado por este consumidor.",
+        funcion=lambda: estado()["cursor"],
+    )
+    registro.gauge(
+        "outbox_unreadable_events_total", "Eventos con payload ilegible dejados pendientes por este proceso.",
+        funcion=eventos_ilegibles, tipo="counter",
+    )
+    # Pool de conexiones hacia la DB de Reservas (checkouts y espera por una conexión)
+    registro.gauge(
+        "reservas_db_pool_connections_created_total", "Conexiones abiertas hacia la DB de Reservas.",
+        funcion=lambda: estadisticas_pool()["conexiones_creadas"], tipo="counter",
+    )
+    registro.gauge(
+        "reservas_db_pool_checkouts_total", "Conexiones tomadas del pool de Reservas.",
+        funcion=lambda: estadisticas_pool()["checkouts"], tipo="counter",
+    )
+    registro.gauge(
+        "reservas_db_pool_checked_out", "Conexiones del pool de Reservas en uso.",
+        funcion=lambda: estadisticas_pool()["en_uso"],
+    )
+    registro.gauge(
+        "reservas_db_pool_checkout_wait_seconds_total", "Tiempo total esperando una conexión del pool de Reservas.",
+        funcion=lambda: estadisticas_pool()["espera_total_ms"] / 1000, tipo="counter",
+    )
+    registro.gauge(
+        "reservas_db_pool_checkout_waits_total", "Checkouts con espera medida (denominador del tiempo total de espera).",
+        funcion=lambda: estadisticas_pool()["esperas_medidas"], tipo="counter",
+    )
+    registro.gauge(
+        "reservas_db_pool_checkout_wait_max_seconds", "Mayor espera por una conexión del pool de Reservas.",
+        funcion=lambda: estadisticas_pool()["espera_max_ms"] / 1000,
+    )
+    registro.gauge(
+        "inventario_stock", "Unidades disponibles por producto.", ("producto",),
+        funcion=lambda: {(producto,): cantidad for producto, cantidad in existencias().items()},
+    )
+    registro.gauge(
+        "inventario_sobreventa_total", "Unidades reservadas sin stock por producto.", ("producto",),
+        funcion=lambda: {(producto,): unidades for producto, unidades in sobreventa_acumulada().items()},
+        tipo="counter",
+    )
+
+def inicializar_db(app):
+    """Crea las tablas y el stock inicial. Con gunicorn corre una sola vez en el master (on_starting)."""
+    with app.app_context():
+        db.create_all()
+        # create_all no toca tablas existentes: las columnas nuevas y los índices se agregan aparte
+        columnas = {c["name"] for c in inspect(db.engine).get_columns("inventario")}
+        for columna in ("version", "sobreventa"):
+            if columna not in columnas:
+                with db.engine.begin() as connection:
+                    connection.execute(text(f"ALTER TABLE inventario ADD COLUMN {columna} INTEGER NOT NULL DEFAULT 0"))
+        for indice in Inventario.__table__.indexes:
+            indice.create(db.engine, checkfirst=True)
+        # Seed initial inventory if empty
+        if not Inventario.query.first():
+            db.session.add(Inventario(producto=PRODUCTO_POR_DEFECTO, cantidad=INVENTARIO_STOCK_INICIAL))
+            db.session.commit()
+
+def iniciar_tareas(app):
+    """
+    Consumidor de la Outbox (polling + modo push opcional). El scheduler arranca pausado
+    en cada proceso y sólo el líder electo lo reanuda y escucha las notificaciones.
+    """
+    @medir_job("poll_reservations")
+    def job_poll_reservations():
+        # Contexto por ejecución (antes se hacía push() en cada tick y nunca se liberaba)
+        with app.app_context():
+            poll_reservations()
+
+    @medir_job("purgar_eventos_aplicados")
+    def job_purgar_eventos_aplicados():
+        with app.app_context():
+            purgar_eventos_aplicados()
+
+    scheduler = BackgroundScheduler()
+    # Run polling every 10 seconds as per H1
+    scheduler.add_job(job_poll_reservations, 'interval', seconds=10)
+    scheduler.add_job(job_purgar_eventos_aplicados, 'interval', hours=1)
+    scheduler.start(paused=True)
+
+    push = []
+
+    def al_ganar():
+        scheduler.resume()
+        # Modo push opcional (OUTBOX_PUSH=1): despierta al consumidor apenas Reservas confirma
+        # un evento. El job de polling de arriba se mantiene como respaldo. Sólo en el líder:
+        # el puerto UDP / la conexión LISTEN son únicos, y el listener no se detiene.
+        if not push:
+            push.append(iniciar_modo_push(job_poll_reservations))
 
-with app.app_context():
-    db.create_all()
-    # Seed initial inventory if empty
-    if not Inventario.query.first():
-        db.session.add(Inventario(producto='Habitacion_Standard', cantidad=100))
-        db.session.commit()
+    lider = EleccionLider(
+        "inventario", app.config["SQLALCHEMY_DATABASE_URI"], al_ganar=al_ganar, al_perder=scheduler.pause
+    ).iniciar()
 
-# Scheduler setup
-scheduler = BackgroundScheduler()
-# Run polling every 10 seconds as per H1
-scheduler.add_job(lambda: app.app_context().push() or poll_reservations(), 'interval', seconds=10)
-scheduler.start()
+    # Apagado limpio: atexit es LIFO, así que el scheduler se detiene antes de que
+    # reservas_db cierre el pool hacia Reservas (registrado al importarlo).
+    def apagar():
+        # Primero soltar el liderazgo (otro worker lo toma), luego detener los jobs
+        lider.detener()
+        scheduler.shutdown(wait=False)
+    atexit.register(apagar)
+    return scheduler
 
 if __name__ == "__main__":
+    # Servidor de desarrollo (un proceso). En producción: gunicorn -c gunicorn.conf.py wsgi:app
+    app = create_flask_app()
+    inicializar_db(app)
+    iniciar_tareas(app)
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5004)), debug=False, use_reloader=False)
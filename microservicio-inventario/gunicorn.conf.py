@@ -0,0 +1,47 @@
+import os
+import signal
+import multiprocessing
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+bind = f"0.0.0.0:{os.environ.get('PORT', 5004)}"
+# Un proceso por core (x2 + 1) para usar toda la CPU del dyno; Heroku fija WEB_CONCURRENCY.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Hilos por worker para solapar la espera de la DB.
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 10))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Heartbeat de los workers en memoria (en contenedores /tmp puede ser un disco lento).
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def on_starting(server):
+    # Una sola vez en el master, antes de crear los workers: tablas sin carreras entre procesos
+    from app import create_flask_app, inicializar_db
+    from modelos import db
+    app = create_flask_app()
+    inicializar_db(app)
+    # Sin conexiones heredadas: cada worker abre su propio pool después del fork
+    with app.app_context():
+        db.engine.dispose()
+
+
+def post_worker_init(worker):
+    # SIGTERM (apagado de gunicorn): antes de que el worker empiece a salir, deja de competir
+    # por el liderazgo. Si no, al soltar el lock el líder se lo pasa a otro worker que también
+    # está saliendo, y cada uno reanuda el scheduler por un momento.
+    from liderazgo import retirarse
+    handler_gunicorn = signal.getsignal(signal.SIGTERM)
+
+    def al_terminar(sig, frame):
+        retirarse()
+        handler_gunicorn(sig, frame)
+    signal.signal(signal.SIGTERM, al_terminar)
+    signal.siginterrupt(signal.SIGTERM, False)
+
+
+def worker_int(worker):
+    # SIGINT / SIGQUIT: el mismo retiro antes de salir
+    from liderazgo import retirarse
+    retirarse()
@@ -0,0 +1,149 @@
+import os
+import tempfile
+import threading
+import zlib
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import NullPool
+
+# Archivo de lock para la elección local (SQLite / una sola máquina).
+LIDER_DIR = os.environ.get("LIDER_DIR", "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+# Cada cuánto un seguidor reintenta tomar el liderazgo y el líder verifica que lo conserva.
+LIDER_REINTENTO_SEGUNDOS = float(os.environ.get("LIDER_REINTENTO_SEGUNDOS", 15))
+
+# Elecciones iniciadas en este proceso (para `retirarse` desde los hooks de gunicorn).
+_elecciones = []
+
+
+def _bloquear_sin_esperar(archivo):
+    """Lock exclusivo no bloqueante sobre `archivo`; lanza OSError si otro proceso lo tiene."""
+    try:
+        import fcntl
+    except ImportError:
+        # Windows (sólo modo desarrollo, un proceso): lock del primer byte con msvcrt
+        import msvcrt
+        archivo.seek(0)
+        msvcrt.locking(archivo.fileno(), msvcrt.LK_NBLCK, 1)
+        return
+    fcntl.flock(archivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+
+def retirarse():
+    """
+    El proceso está por salir: sus elecciones dejan de competir por el liderazgo. Un líder
+    conserva el lock hasta `detener` (atexit), así que al apagar gunicorn el liderazgo no pasa
+    de un worker que sale al siguiente. Sólo marca un Event: se puede llamar desde un signal handler.
+    """
+    for eleccion in list(_elecciones):
+        eleccion._detener.set()
+
+
+class EleccionLider:
+    """
+    Elige UN proceso por servicio para las tareas de fondo (scheduler, listeners).
+
+    Con gunicorn cada worker es un proceso con su propia copia del scheduler: sin elección
+    los jobs correrían N veces. Todos los workers compiten; el que gana llama `al_ganar`.
+    - PostgreSQL: `pg_try_advisory_lock` sobre una conexión dedicada. Es exclusivo entre
+      workers Y entre dynos; si el proceso o la conexión mueren, Postgres libera el lock.
+    - SQLite / local: `flock` (msvcrt en Windows) sobre un archivo en LIDER_DIR. Exclusivo
+      entre los procesos de la máquina; el sistema operativo lo libera si el proceso muere.
+    Los seguidores reintentan cada LIDER_REINTENTO_SEGUNDOS, así que si el líder cae otro
+    worker toma su lugar. Si el líder pierde la conexión del lock, llama `al_perder`.
+    """
+    def __init__(self, nombre, database_url=None, al_ganar=None, al_perder=None):
+        self.nombre = nombre
+        self.database_url = database_url or ""
+        self.al_ganar = al_ganar
+        self.al_perder = al_perder
+        self.es_lider = False
+        self._recurso = None
+        self._detener = threading.Event()
+
+    def _intentar_postgres(self):
+        # crc32 cabe en el bigint de pg_try_advisory_lock y es estable entre procesos
+        clave = zlib.crc32(f"travelhub_lider_{self.nombre}".encode())
+        engine = create_engine(self.database_url, poolclass=NullPool)
+        conexion = engine.connect()
+        if conexion.execute(text("SELECT pg_try_advisory_lock(:clave)"), {"clave": clave}).scalar():
+            conexion.commit()
+            self._recurso = (engine, conexion)
+            return True
+        conexion.close()
+        engine.dispose()
+        return False
+
+    def _intentar_archivo(self):
+        archivo = open(os.path.join(LIDER_DIR, f"travelhub_lider_{self.nombre}.lock"), "a")
+        try:
+            _bloquear_sin_esperar(archivo)
+        except OSError:
+            archivo.close()
+            return False
+        self._recurso = archivo
+        return True
+
+    def _intentar(self):
+        try:
+            if self.database_url.startswith("postgresql"):
+                return self._intentar_postgres()
+            return self._intentar_archivo()
+        except Exception as e:
+            print(f"Leader election for {self.nombre} failed: {e}")
+            return False
+
+    def _conserva_lock(self):
+        if not isinstance(self._recurso, tuple):
+            return True  # flock: se mantiene mientras el proceso viva
+        try:
+            conexion = self._recurso[1]
+            conexion.execute(text("SELECT 1"))
+            conexion.commit()  # sin transacciones abiertas: no retener el snapshot (VACUUM)
+            return True
+        except Exception:
+            return False
+
+    def _liberar(self):
+        if isinstance(self._recurso, tuple):
+            engine, conexion = self._recurso
+            try:
+                conexion.close()
+            except Exception:
+                pass
+            engine.dispose()
+        elif self._recurso is not None:
+            self._recurso.close()
+        self._recurso = None
+
+    def _loop(self):
+        while not self._detener.is_set():
+            if not self.es_lider and self._intentar():
+                if self._detener.is_set():
+                    # Se ganó el lock mientras el proceso se apagaba: devolverlo
+                    self._liberar()
+                    break
+                self.es_lider = True
+                print(f"Process {os.getpid()} is now the {self.nombre} leader")
+                self._notificar(self.al_ganar)
+            elif self.es_lider and not self._conserva_lock():
+                self.es_lider = False
+                self._liberar()
+                print(f"Process {os.getpid()} lost the {self.nombre} leadership")
+                self._notificar(self.al_perder)
+            self._detener.wait(LIDER_REINTENTO_SEGUNDOS)
+
+    def _notificar(self, callback):
+        if callback is None:
+            return
+        try:
+            callback()
+        except Exception as e:
+            print(f"Leadership callback for {self.nombre} failed: {e}")
+
+    def iniciar(self):
+        _elecciones.append(self)
+        threading.Thread(target=self._loop, name=f"lider-{self.nombre}", daemon=True).start()
+        return self
+
+    def detener(self):
+        self._detener.set()
+        self._liberar()
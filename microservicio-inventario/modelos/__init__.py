@@ -1 +1 @@
-from .modelos import db, Inventario
+from .modelos import db, Inventario, VersionInventario, CursorEventos, EventoAplicado
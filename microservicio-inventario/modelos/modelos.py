@@ -1,9 +1,38 @@
 from flask_sqlalchemy import SQLAlchemy
+import datetime as dt
 
 db = SQLAlchemy()
 
 class Inventario(db.Model):
     __tablename__ = 'inventario'
     id = db.Column(db.Integer, primary_key=True)
-    producto = db.Column(db.String(100))
-    cantidad = db.Column(db.Integer)
+    producto = db.Column(db.String(100), nullable=False)
+    cantidad = db.Column(db.Integer, nullable=False, default=0)
+    # Versión del stock en la que cambió esta fila (snapshot incremental para Búsqueda)
+    version = db.Column(db.Integer, nullable=False, default=0, index=True)
+    # Unidades reservadas sin stock (acumulado); se escribe en la transacción del lote
+    sobreventa = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Un registro por producto: búsqueda por índice en cada descuento y sin altas duplicadas
+        db.Index('ux_inventario_producto', 'producto', unique=True),
+    )
+
+class VersionInventario(db.Model):
+    """Fila única con la versión global del stock: sube una vez por lote que cambia existencias."""
+    __tablename__ = 'version_inventario'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+class CursorEventos(db.Model):
+    """Cursor durable del consumidor de la Outbox: último evento aplicado (marca de agua para medir el lag)."""
+    __tablename__ = 'cursor_eventos'
+    consumidor = db.Column(db.String(50), primary_key=True)
+    ultimo_evento_id = db.Column(db.Integer, nullable=False, default=0)
+    actualizado_en = db.Column(db.DateTime, default=dt.datetime.now, onupdate=dt.datetime.now)
+
+class EventoAplicado(db.Model):
+    """Ledger de eventos de la Outbox ya aplicados: garantiza que cada evento se aplique una sola vez."""
+    __tablename__ = 'eventos_aplicados'
+    event_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    aplicado_en = db.Column(db.DateTime, default=dt.datetime.now, index=True)
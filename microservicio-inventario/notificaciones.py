@@ -0,0 +1,114 @@
+import os
+import select
+import socket
+import threading
+import time
+from sqlalchemy import create_engine
+from sqlalchemy.pool import NullPool
+import reservas_db
+
+# MODO PUSH DE LA OUTBOX (H1)
+# Con OUTBOX_PUSH=1 Inventario escucha notificaciones de Reservas y despierta al
+# consumidor por lotes de inmediato. El polling del scheduler queda como respaldo
+# (resincronización tras un reinicio o si se pierde una notificación).
+OUTBOX_PUSH = os.environ.get("OUTBOX_PUSH", "0") == "1"
+OUTBOX_CANAL = os.environ.get("OUTBOX_CANAL", "reservation_events")
+# Respaldo para SQLite: Reservas envía un datagrama UDP local tras el commit.
+OUTBOX_NOTIFY_HOST = os.environ.get("OUTBOX_NOTIFY_HOST", "127.0.0.1")
+OUTBOX_NOTIFY_PORT = int(os.environ.get("OUTBOX_NOTIFY_PORT", 5104))
+
+# Tiempo máximo bloqueado en select()/recv() antes de revisar la conexión.
+ESPERA_SEGUNDOS = 5
+REINTENTO_SEGUNDOS = 2
+
+
+class DespertadorConsumidor:
+    """
+    Hilo que ejecuta el consumidor cada vez que llega una notificación.
+
+    Las notificaciones que llegan mientras el consumidor corre se colapsan en una sola
+    ejecución adicional: el lote siguiente leerá todos los eventos nuevos de una vez.
+    """
+    def __init__(self, consumir):
+        self._consumir = consumir
+        self._pendiente = threading.Event()
+
+    def despertar(self):
+        self._pendiente.set()
+
+    def _loop(self):
+        while True:
+            self._pendiente.wait()
+            self._pendiente.clear()
+            try:
+                self._consumir()
+            except Exception as e:
+                print(f"Error in push-triggered sync: {e}")
+
+    def iniciar(self):
+        threading.Thread(target=self._loop, name="outbox-despertador", daemon=True).start()
+
+
+def _escuchar_postgres(despertar):
+    # Conexión dedicada (fuera del pool): LISTEN la mantiene ocupada indefinidamente.
+    engine = create_engine(reservas_db.RESERVAS_DB_URL, poolclass=NullPool)
+    while True:
+        conexion = None
+        try:
+            conexion = engine.raw_connection()
+            driver = conexion.driver_connection
+            driver.autocommit = True
+            with driver.cursor() as cursor:
+                cursor.execute(f"LISTEN {OUTBOX_CANAL}")
+            print(f"Push mode: LISTEN {OUTBOX_CANAL} on Reservations DB")
+            # Despertar una vez al (re)conectar por si se perdieron avisos mientras tanto
+            despertar()
+            while True:
+                if select.select([driver], [], [], ESPERA_SEGUNDOS) == ([], [], []):
+                    continue
+                driver.poll()
+                if driver.notifies:
+                    driver.notifies.clear()
+                    despertar()
+        except Exception as e:
+            print(f"Push listener error (retrying in {REINTENTO_SEGUNDOS}s): {e}")
+            time.sleep(REINTENTO_SEGUNDOS)
+        finally:
+            if conexion is not None:
+                try:
+                    conexion.close()
+                except Exception:
+                    pass
+
+
+def _escuchar_udp(despertar):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind((OUTBOX_NOTIFY_HOST, OUTBOX_NOTIFY_PORT))
+    sock.settimeout(ESPERA_SEGUNDOS)
+    print(f"Push mode: listening UDP {OUTBOX_NOTIFY_HOST}:{OUTBOX_NOTIFY_PORT}")
+    while True:
+        try:
+            sock.recv(4096)
+        except socket.timeout:
+            continue
+        except OSError as e:
+            print(f"Push listener error: {e}")
+            time.sleep(REINTENTO_SEGUNDOS)
+            continue
+        despertar()
+
+
+def iniciar_modo_push(consumir):
+    """Arranca el listener (LISTEN en Postgres, UDP local en SQLite) si OUTBOX_PUSH está activo."""
+    if not OUTBOX_PUSH:
+        return None
+
+    despertador = DespertadorConsumidor(consumir)
+    despertador.iniciar()
+
+    if reservas_db.RESERVAS_DB_URL.startswith("postgresql"):
+        escuchar = _escuchar_postgres
+    else:
+        escuchar = _escuchar_udp
+    threading.Thread(target=escuchar, args=(despertador.despertar,), name="outbox-listener", daemon=True).start()
+    return despertador
@@ -0,0 +1,111 @@
+import os
+import threading
+import time
+import atexit
+from contextlib import contextmanager
+from sqlalchemy import create_engine, event
+
+# Definir la URL de la DB de Reservas (Para el experimento local, apuntamos al archivo o servicio)
+# En un entorno real, esto sería una variable de entorno apuntando a la DB de Reservas
+basedir = os.path.abspath(os.path.dirname(__file__))
+# Asumimos estructura: parent/microservicio-inventario/tasks.py, db está en parent/microservicio-reservas/instance/db.sqlite o parent/microservicio-reservas/db.sqlite
+# Flask-SQLAlchemy 3+ pone db en instance/ por defecto, pero aquí lo configuramos manual en app.py como "sqlite:///db.sqlite" (relative to app.py working dir)
+reservas_db_path = os.path.join(basedir, '..', 'microservicio-reservas', 'instance', 'db.sqlite')
+# Sin embargo, app.py de reservas usa "sqlite:///db.sqlite", que suele crearse en el root carpeta si no se especifica.
+reservas_db_path_v1 = os.path.join(basedir, '..', 'microservicio-reservas', 'db.sqlite')
+
+# Probamos V1 porque en app.py no se ve 'instance' y Flask<3 lo ponía en root.
+RESERVAS_DB_URL = os.environ.get("RESERVAS_DB_URL", f"sqlite:///{reservas_db_path}")
+if RESERVAS_DB_URL.startswith("postgres://"):
+    RESERVAS_DB_URL = RESERVAS_DB_URL.replace("postgres://", "postgresql://", 1)
+
+# Configuración del pool (cross-database read hacia Reservas)
+RESERVAS_DB_POOL_SIZE = int(os.environ.get("RESERVAS_DB_POOL_SIZE", 5))
+RESERVAS_DB_MAX_OVERFLOW = int(os.environ.get("RESERVAS_DB_MAX_OVERFLOW", 2))
+RESERVAS_DB_POOL_TIMEOUT = float(os.environ.get("RESERVAS_DB_POOL_TIMEOUT", 10))
+# Heroku Postgres cierra conexiones inactivas: reciclamos antes de que el servidor lo haga.
+RESERVAS_DB_POOL_RECYCLE = int(os.environ.get("RESERVAS_DB_POOL_RECYCLE", 1800))
+
+_engine = None
+_engine_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+pool_stats = {
+    "conexiones_creadas": 0,
+    "checkouts": 0,
+    "checkins": 0,
+    "esperas_medidas": 0,  # checkouts hechos por `conectar` (los únicos con espera medida)
+    "espera_total_ms": 0.0,
+    "espera_max_ms": 0.0,
+}
+
+
+def _contar(clave, valor=1):
+    with _stats_lock:
+        pool_stats[clave] += valor
+
+
+def _crear_engine():
+    opciones = {"pool_pre_ping": True, "pool_recycle": RESERVAS_DB_POOL_RECYCLE}
+    if not RESERVAS_DB_URL.startswith("sqlite"):
+        # SQLite usa su propio pool por archivo; los tamaños sólo aplican a servidores reales.
+        opciones.update(
+            pool_size=RESERVAS_DB_POOL_SIZE,
+            max_overflow=RESERVAS_DB_MAX_OVERFLOW,
+            pool_timeout=RESERVAS_DB_POOL_TIMEOUT,
+        )
+    engine = create_engine(RESERVAS_DB_URL, **opciones)
+
+    event.listen(engine, "connect", lambda *args: _contar("conexiones_creadas"))
+    event.listen(engine, "checkout", lambda *args: _contar("checkouts"))
+    event.listen(engine, "checkin", lambda *args: _contar("checkins"))
+    return engine
+
+
+def get_engine():
+    """Engine compartido (con pool) hacia la DB de Reservas; se crea una sola vez por proceso."""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = _crear_engine()
+    return _engine
+
+
+@contextmanager
+def conectar():
+    """Toma una conexión del pool midiendo el tiempo de espera del checkout."""
+    inicio = time.perf_counter()
+    connection = get_engine().connect()
+    espera_ms = (time.perf_counter() - inicio) * 1000
+    with _stats_lock:
+        pool_stats["esperas_medidas"] += 1
+        pool_stats["espera_total_ms"] += espera_ms
+        pool_stats["espera_max_ms"] = max(pool_stats["espera_max_ms"], espera_ms)
+    try:
+        yield connection
+    finally:
+        connection.close()
+
+
+def dispose_engine():
+    """Cierra todas las conexiones del pool (apagado limpio o cambio de configuración)."""
+    global _engine
+    with _engine_lock:
+        if _engine is not None:
+            _engine.dispose()
+            _engine = None
+
+
+def estadisticas_pool():
+    """Contadores del pool (expuestos en /metrics) más el promedio de espera y el estado del pool."""
+    with _stats_lock:
+        stats = dict(pool_stats)
+    stats["en_uso"] = stats["checkouts"] - stats["checkins"]
+    medidas = stats["esperas_medidas"]
+    stats["espera_promedio_ms"] = round(stats["espera_total_ms"] / medidas, 3) if medidas else 0.0
+    stats["pool"] = _engine.pool.status() if _engine is not None else "sin inicializar"
+    return stats
+
+
+atexit.register(dispose_engine)
@@ -0,0 +1,187 @@
+import os
+from collections import defaultdict
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from modelos import db, Inventario, VersionInventario
+from eventos import CABECERA, MARCA, VERSION, TIPOS, decodificar
+
+# Producto y cantidad de los eventos que no los traen (reservas anteriores al modelo de stock).
+PRODUCTO_POR_DEFECTO = 'Habitacion_Standard'
+CANTIDAD_POR_DEFECTO = 1
+# Stock inicial del producto por defecto (seed al arrancar). Un producto que aparece por
+# primera vez en un evento no recibe stock: se da de alta en 0 y su demanda es sobreventa.
+INVENTARIO_STOCK_INICIAL = int(os.environ.get("INVENTARIO_STOCK_INICIAL", 100))
+
+# Descuento atómico y condicional: la DB verifica el stock y lo descuenta en la misma
+# sentencia, sin read-modify-write en Python ni carreras entre workers.
+DESCONTAR = text(
+    "UPDATE inventario SET cantidad = cantidad - :n, version = :version "
+    "WHERE producto = :producto AND cantidad >= :n"
+)
+# Stock insuficiente: se toma lo que queda (la reserva ya fue confirmada por Reservas) y la
+# diferencia se acumula en la fila, dentro de la misma transacción que el descuento.
+AGOTAR = text(
+    "UPDATE inventario SET cantidad = 0, sobreventa = sobreventa + :faltante, version = :version "
+    "WHERE producto = :producto"
+)
+INCREMENTAR_VERSION = text("UPDATE version_inventario SET version = version + 1 WHERE id = 1")
+
+_CREADA = TIPOS['RESERVATION_CREATED']
+
+
+class EventoIlegible(ValueError):
+    """Payload que este consumidor no sabe leer (versión de sobre desconocida, truncado o basura)."""
+
+
+def linea_de_evento(event_type, payload):
+    """
+    (producto, cantidad) que descuenta un evento de la Outbox, o None si no afecta stock.
+
+    Sólo un payload JSON anterior al sobre toma los valores por defecto de lo que le falte.
+    Un payload que no se puede leer lanza EventoIlegible: nunca se descuenta a ciegas.
+    """
+    if event_type != 'RESERVATION_CREATED':
+        return None
+    if isinstance(payload, memoryview):
+        payload = payload.tobytes()
+    # Camino rápido: sobre binario actual, decodificado con un solo unpack_from de la cabecera
+    if isinstance(payload, bytes) and len(payload) >= CABECERA.size and payload[0] == MARCA and payload[1] == VERSION:
+        if payload[2] != _CREADA:
+            return None
+        _, _, _, _, cantidad, _, largo = CABECERA.unpack_from(payload)
+        if len(payload) < CABECERA.size + largo:
+            raise EventoIlegible("truncated event envelope")
+        try:
+            producto = payload[CABECERA.size:CABECERA.size + largo].decode("utf-8")
+        except UnicodeDecodeError as e:
+            raise EventoIlegible(f"invalid product name: {e}")
+        return producto or PRODUCTO_POR_DEFECTO, cantidad
+    # Otra versión del sobre, sobre truncado, JSON anterior al sobre o basura
+    try:
+        datos = decodificar(payload)
+    except (TypeError, ValueError) as e:
+        raise EventoIlegible(str(e))
+    if datos["version"] != 0:
+        # Sobre legible con un tipo que no descuenta stock
+        return None
+    producto = datos.get('producto') or PRODUCTO_POR_DEFECTO
+    cantidad = datos.get('cantidad')
+    try:
+        cantidad = int(CANTIDAD_POR_DEFECTO if cantidad is None else cantidad)
+    except (TypeError, ValueError):
+        cantidad = CANTIDAD_POR_DEFECTO
+    return str(producto), max(cantidad, 0)
+
+
+def demanda_por_producto(eventos):
+    """
+    Agrega los eventos (id, event_type, payload) en unidades a descontar por producto.
+    Retorna (demanda, {id: motivo} de los eventos ilegibles, que no se aplican).
+    """
+    demanda = defaultdict(int)
+    ilegibles = {}
+    for event_id, event_type, payload in eventos:
+        try:
+            linea = linea_de_evento(event_type, payload)
+        except EventoIlegible as e:
+            ilegibles[event_id] = str(e)
+            continue
+        if linea and linea[1]:
+            demanda[linea[0]] += linea[1]
+    return dict(demanda), ilegibles
+
+
+def _alta_producto(producto, version):
+    # Sin stock: nadie lo cargó, así que reservarlo es sobreventa (visible en GET /inventario).
+    # SAVEPOINT: si otro worker da de alta el mismo producto a la vez, el índice único
+    # rechaza el duplicado sin abortar la transacción del lote.
+    try:
+        with db.session.begin_nested():
+            db.session.add(Inventario(producto=producto, cantidad=0, version=version))
+        print(f"Unknown product {producto!r} registered with no stock")
+        return True
+    except IntegrityError:
+        return False
+
+
+def nueva_version():
+    """
+    Sube la versión global del stock y la retorna. El UPDATE bloquea la fila hasta el commit
+    del lote, así que dos lotes nunca publican cambios con la misma versión.
+    """
+    if not db.session.execute(INCREMENTAR_VERSION).rowcount:
+        try:
+            with db.session.begin_nested():
+                db.session.add(VersionInventario(id=1, version=1))
+            return 1
+        except IntegrityError:
+            db.session.execute(INCREMENTAR_VERSION)
+    return db.session.query(VersionInventario.version).filter_by(id=1).scalar()
+
+
+def descontar(demanda):
+    """
+    Aplica la demanda de un lote: UNA sentencia por producto (no una por evento).
+
+    Debe correr dentro de la transacción del lote (con el ledger y el cursor): si el lote
+    se revierte, el descuento también. Retorna {producto: unidades sin stock}.
+    """
+    sobreventa = {}
+    if not demanda:
+        return sobreventa
+    version = nueva_version()
+    for producto, n in sorted(demanda.items()):  # orden fijo: sin deadlocks entre workers
+        params = {"producto": producto, "n": n, "version": version}
+        if db.session.execute(DESCONTAR, params).rowcount:
+            continue
+        disponible = (
+            db.session.query(Inventario.cantidad).filter_by(producto=producto).with_for_update().scalar()
+        )
+        if disponible is None:
+            # Producto desconocido: se da de alta sin stock (si otro worker ya lo creó, se
+            # relee su fila) y la demanda se agota contra lo que haya
+            _alta_producto(producto, version)
+            disponible = (
+                db.session.query(Inventario.cantidad).filter_by(producto=producto).with_for_update().scalar()
+            )
+            if disponible is not None and disponible >= n:
+                db.session.execute(DESCONTAR, params)
+                continue
+        sobreventa[producto] = n - (disponible or 0)
+        db.session.execute(AGOTAR, dict(params, faltante=sobreventa[producto]))
+
+    if sobreventa:
+        print(f"Oversold (reserved without stock): {sobreventa}")
+    return sobreventa
+
+
+def sobreventa_acumulada():
+    """Unidades reservadas sin stock por producto (persistidas: iguales en todos los workers)."""
+    filas = db.session.query(Inventario.producto, Inventario.sobreventa).filter(Inventario.sobreventa > 0).all()
+    return {producto: unidades for producto, unidades in filas}
+
+
+def existencias():
+    """Stock actual por producto."""
+    filas = db.session.query(Inventario.producto, Inventario.cantidad).order_by(Inventario.producto).all()
+    return {producto: cantidad for producto, cantidad in filas}
+
+
+def snapshot(desde=0):
+    """
+    Disponibilidad publicada para Búsqueda: {"version", "completo", "productos"}.
+
+    Con `desde` > 0 sólo viajan los productos que cambiaron después de esa versión (los
+    valores son absolutos, así que re-aplicar un delta es inofensivo). Si `desde` es mayor
+    que la versión actual (la base se recreó), se envía el snapshot completo.
+    """
+    version = db.session.query(VersionInventario.version).filter_by(id=1).scalar() or 0
+    consulta = db.session.query(Inventario.producto, Inventario.cantidad)
+    completo = not desde or desde > version
+    if not completo:
+        consulta = consulta.filter(Inventario.version > desde)
+    return {
+        "version": version,
+        "completo": completo,
+        "productos": {producto: cantidad for producto, cantidad in consulta.all()},
+    }
@@ -1,88 +1,272 @@
 import os
-from sqlalchemy import create_engine, text
-from modelos import db, Inventario
-from datetime import datetime
-
-# Definir la URL de la DB de Reservas (Para el experimento local, apuntamos al archivo o servicio)
-# En un entorno real, esto sería una variable de entorno apuntando a la DB de Reservas
-basedir = os.path.abspath(os.path.dirname(__file__))
-# Asumimos estructura: parent/microservicio-inventario/tasks.py, db está en parent/microservicio-reservas/instance/db.sqlite o parent/microservicio-reservas/db.sqlite
-# Flask-SQLAlchemy 3+ pone db en instance/ por defecto, pero aquí lo configuramos manual en app.py como "sqlite:///db.sqlite" (relative to app.py working dir)
-reservas_db_path = os.path.join(basedir, '..', 'microservicio-reservas', 'instance', 'db.sqlite') 
-# Sin embargo, app.py de reservas usa "sqlite:///db.sqlite", que suele crearse en el root carpeta si no se especifica.
-reservas_db_path_v1 = os.path.join(basedir, '..', 'microservicio-reservas', 'db.sqlite')
-
-# Probamos V1 porque en app.py no se ve 'instance' y Flask<3 lo ponía en root.
-# Probamos V1 porque en app.py no se ve 'instance' y Flask<3 lo ponía en root.
-# Probamos V1 porque en app.py no se ve 'instance' y Flask<3 lo ponía en root.
-RESERVAS_DB_URL = os.environ.get("RESERVAS_DB_URL", f"sqlite:///{reservas_db_path}")
+import socket
+import threading
+from sqlalchemy import text, bindparam, insert
+from sqlalchemy.exc import IntegrityError
+from modelos import db, CursorEventos, EventoAplicado
+from stock import demanda_por_producto, descontar
+from datetime import datetime, timedelta
+import reservas_db
+
+# Tamaño de lote: cuántos eventos se leen, aplican y confirman por iteración.
+# Acota la memoria usada durante la resincronización tras una caída larga.
+OUTBOX_BATCH_SIZE = int(os.environ.get("OUTBOX_BATCH_SIZE", 500))
+# Límite de lotes por ejecución del scheduler (0 = drenar todo el backlog).
+OUTBOX_MAX_BATCHES = int(os.environ.get("OUTBOX_MAX_BATCHES", 0))
+
+# Nombre de este consumidor en la tabla de cursores (común a todos sus workers).
+CONSUMIDOR = 'inventario'
+
+# Identidad de este consumidor para reclamar eventos (un valor distinto por dyno/proceso).
+WORKER_ID = "{}:{}".format(
+    os.environ.get("OUTBOX_WORKER_ID") or os.environ.get("DYNO") or socket.gethostname(),
+    os.getpid(),
+)
+# Duración del lease: si el worker cae, sus eventos vuelven a estar disponibles tras este tiempo.
+OUTBOX_LEASE_SECONDS = int(os.environ.get("OUTBOX_LEASE_SECONDS", 60))
+# Cuánto se conserva el ledger de eventos aplicados (sólo se necesita mientras un evento pueda re-entregarse).
+OUTBOX_LEDGER_RETENTION_HOURS = int(os.environ.get("OUTBOX_LEDGER_RETENTION_HOURS", 72))
+
+# El scheduler (polling) y el modo push pueden disparar el consumidor a la vez.
+_consumidor_lock = threading.Lock()
+# Eventos con payload ilegible vistos por este proceso (quedan pendientes en la Outbox).
+_ilegibles_lock = threading.Lock()
+_ilegibles_total = 0
+
+# Reclamo en PostgreSQL: FOR UPDATE SKIP LOCKED reparte el backlog entre N workers
+# sin que se bloqueen entre sí ni tomen los mismos eventos.
+RECLAMAR_POSTGRES = text(
+    "UPDATE reservation_events SET claimed_by = :worker, lease_expires_at = :expira "
+    "WHERE id IN ("
+    "    SELECT id FROM reservation_events "
+    "    WHERE processed_at IS NULL AND (lease_expires_at IS NULL OR lease_expires_at < :now) "
+    "    ORDER BY id LIMIT :limite FOR UPDATE SKIP LOCKED"
+    ") RETURNING id, event_type, payload"
+)
+# Reclamo emulado en SQLite: no hay SKIP LOCKED, pero un UPDATE es atómico bajo el lock
+# de escritura de la base, así que dos workers nunca reclaman el mismo evento.
+RECLAMAR_SQLITE = text(
+    "UPDATE reservation_events SET claimed_by = :worker, lease_expires_at = :expira "
+    "WHERE id IN ("
+    "    SELECT id FROM reservation_events "
+    "    WHERE processed_at IS NULL AND (lease_expires_at IS NULL OR lease_expires_at < :now) "
+    "    ORDER BY id LIMIT :limite"
+    ")"
+)
+SELECT_RECLAMADOS = text(
+    "SELECT id, event_type, payload FROM reservation_events "
+    "WHERE claimed_by = :worker AND lease_expires_at = :expira AND processed_at IS NULL"
+)
+ACK_LOTE = text(
+    "UPDATE reservation_events SET processed_at = :now WHERE id IN :ids AND claimed_by = :worker"
+).bindparams(bindparam("ids", expanding=True))
+LIBERAR_LOTE = text(
+    "UPDATE reservation_events SET claimed_by = NULL, lease_expires_at = NULL "
+    "WHERE id IN :ids AND claimed_by = :worker AND processed_at IS NULL"
+).bindparams(bindparam("ids", expanding=True))
+
+
+def reclamar_lote(connection, worker, limite):
+    """Reclama hasta `limite` eventos pendientes (sin lease vigente) para `worker`."""
+    now = datetime.now()
+    params = {
+        "worker": worker,
+        "expira": now + timedelta(seconds=OUTBOX_LEASE_SECONDS),
+        "now": now,
+        "limite": limite,
+    }
+    if connection.dialect.name == "postgresql":
+        events = connection.execute(RECLAMAR_POSTGRES, params).fetchall()
+    else:
+        connection.execute(RECLAMAR_SQLITE, params)
+        events = connection.execute(SELECT_RECLAMADOS, params).fetchall()
+    # El commit libera los locks de fila: desde aquí el lease protege el reclamo.
+    connection.commit()
+    return sorted((tuple(e) for e in events), key=lambda e: e[0])
+
+
+def _avanzar_cursor(ultimo_id):
+    # UPDATE condicional: el cursor sólo avanza, aunque varios workers lo actualicen a la vez.
+    if not db.session.get(CursorEventos, CONSUMIDOR):
+        db.session.add(CursorEventos(consumidor=CONSUMIDOR, ultimo_evento_id=0))
+        db.session.flush()
+    CursorEventos.query.filter(
+        CursorEventos.consumidor == CONSUMIDOR,
+        CursorEventos.ultimo_evento_id < ultimo_id,
+    ).update({"ultimo_evento_id": ultimo_id}, synchronize_session=False)
+
+
+def procesar_lote(connection, limite=None, worker=None):
+    """
+    Procesa un lote acotado de eventos pendientes y retorna cuántos se reclamaron.
+
+    1.  Claim: reclama hasta `limite` eventos con un lease (claimed_by, lease_expires_at).
+    2.  Process: descarta los ya registrados en el ledger local (eventos_aplicados) y
+        aplica el resto como un descuento atómico por producto. Descuento + ledger +
+        cursor se confirman en la MISMA transacción local: cada evento se aplica
+        exactamente una vez.
+    3.  Ack: confirma todo el lote con un solo UPDATE set-based en Reservas.
+
+    Si el proceso cae entre (2) y (3), el lease expira, otro worker reclama los eventos,
+    los encuentra en el ledger y sólo los confirma, sin volver a restar inventario.
+
+    Un evento con payload ilegible (p. ej. un sobre de una versión más nueva) no se aplica,
+    no entra al ledger ni se confirma: conserva su lease y se reintenta cuando vence, así que
+    un consumidor actualizado lo aplicará. Queda visible en el backlog y el lag.
+    """
+    limite = limite or OUTBOX_BATCH_SIZE
+    worker = worker or WORKER_ID
+    events = reclamar_lote(connection, worker, limite)
+    if not events:
+        return 0
+
+    ids = [event_id for event_id, _, _ in events]
+    aplicados = {
+        event_id for (event_id,) in
+        db.session.query(EventoAplicado.event_id).filter(EventoAplicado.event_id.in_(ids))
+    }
+    nuevos = [evento for evento in events if evento[0] not in aplicados]
+
+    # ---------------------------------------------------------------------
+    # PASO 2: DEMANDA POR PRODUCTO + LEDGER + CURSOR
+    # Los eventos traen producto y cantidad: el lote se agrega en unidades por producto
+    # y se descuenta con un UPDATE condicional por producto (no una lectura por evento).
+    # ---------------------------------------------------------------------
+    ilegibles = {}
+    if nuevos:
+        demanda, ilegibles = demanda_por_producto(nuevos)
+        if ilegibles:
+            _registrar_ilegibles(ilegibles)
+            nuevos = [evento for evento in nuevos if evento[0] not in ilegibles]
+            ids = [event_id for event_id in ids if event_id not in ilegibles]
+        descontar(demanda)
+
+    if nuevos:
+        ahora = datetime.now()
+        db.session.execute(
+            insert(EventoAplicado),
+            [{"event_id": event_id, "aplicado_en": ahora} for event_id, _, _ in nuevos],
+        )
+        _avanzar_cursor(nuevos[-1][0])
+
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Otro worker aplicó alguno de estos eventos (lease expirado mientras trabajábamos).
+        # La PK del ledger impidió el doble descuento; liberamos el reclamo y seguimos.
+        db.session.rollback()
+        connection.execute(LIBERAR_LOTE, {"ids": ids, "worker": worker})
+        connection.commit()
+        print(f"Batch released by {worker}: events already applied by another worker")
+        return 0
+
+    # ---------------------------------------------------------------------
+    # PASO 3: CONFIRMACIÓN (ACK) SET-BASED
+    # Un único UPDATE ... WHERE id IN (...) y un único commit por lote.
+    # ---------------------------------------------------------------------
+    if ids:
+        connection.execute(ACK_LOTE, {"now": datetime.now(), "ids": ids, "worker": worker})
+        connection.commit()
+
+    print(
+        f"Batch applied by {worker}: {len(ids)} events ({len(ids) - len(nuevos)} already applied, "
+        f"{len(ilegibles)} unreadable left pending)"
+    )
+    return len(events)
+
+
+def _registrar_ilegibles(ilegibles):
+    global _ilegibles_total
+    with _ilegibles_lock:
+        _ilegibles_total += len(ilegibles)
+    for event_id, motivo in sorted(ilegibles.items()):
+        print(f"Unreadable payload in event {event_id}, left pending: {motivo}")
+
+
+def eventos_ilegibles():
+    with _ilegibles_lock:
+        return _ilegibles_total
+
+
+ESTADO_BACKLOG = text(
+    "SELECT COUNT(*), MIN(created_at) FROM reservation_events WHERE processed_at IS NULL"
+)
+
+
+def estado_consumidor():
+    """
+    Lag del consumidor: eventos pendientes en la Outbox de Reservas, antigüedad del más viejo
+    (segundos) y último evento aplicado según el cursor local.
+    """
+    with reservas_db.conectar() as connection:
+        pendientes, mas_antiguo = connection.execute(ESTADO_BACKLOG).one()
+    if isinstance(mas_antiguo, str):
+        # SQLite devuelve el DateTime como texto en una consulta cruda
+        mas_antiguo = datetime.fromisoformat(mas_antiguo)
+    cursor = db.session.get(CursorEventos, CONSUMIDOR)
+    db.session.rollback()
+    return {
+        "pendientes": pendientes,
+        "lag_segundos": (datetime.now() - mas_antiguo).total_seconds() if mas_antiguo else 0.0,
+        "cursor": cursor.ultimo_evento_id if cursor else 0,
+    }
+
+
+def purgar_eventos_aplicados():
+    """Elimina entradas antiguas del ledger; esos eventos ya fueron confirmados en Reservas."""
+    limite = datetime.now() - timedelta(hours=OUTBOX_LEDGER_RETENTION_HOURS)
+    borrados = EventoAplicado.query.filter(EventoAplicado.aplicado_en < limite).delete(synchronize_session=False)
+    db.session.commit()
+    if borrados:
+        print(f"Ledger purge: {borrados} applied events older than {OUTBOX_LEDGER_RETENTION_HOURS}h removed")
+    return borrados
+
 
 def poll_reservations():
     """
     IMPLEMENTACIÓN DE POLLING CONSUMER (H1: Eventual Consistency)
-    
+
     Esta función se ejecuta periódicamente (scheduler) para sincronizar estado.
     Actúa como un "Worker" que procesa mensajes de la 'Outbox' de Reservas.
-    
+
     Flujo:
-    1.  Pull: Conecta a la DB de Reservas y busca eventos NO procesados (processed_at IS NULL).
-    2.  Process: Por cada evento, actualiza el inventario local (Idempotencia requerida).
-    3.  Ack: Marca el evento como procesado en la DB de Reservas para no repetirlo.
+    1.  Pull: Conecta a la DB de Reservas y lee eventos NO procesados en lotes acotados.
+    2.  Process: Aplica cada lote como un descuento atómico por producto (stock.py),
+        registrando cada evento en un ledger local para garantizar idempotencia.
+    3.  Ack: Marca el lote completo como procesado en la DB de Reservas para no repetirlo.
+
+    Seguro con varios workers (dynos): cada uno reclama su propio lote con un lease.
+
+    Repite lotes hasta drenar el backlog (o hasta OUTBOX_MAX_BATCHES).
     """
+    with _consumidor_lock:
+        return _poll_reservations()
+
+
+def _poll_reservations():
     print(f"[{datetime.now()}] Polling events from Reservations DB...")
-    
-    # ---------------------------------------------------------------------
-    # PASO 1: LECTURA DE EVENTOS (PULL)
-    # Buscamos en la 'Cola' (Tabla reservation_events) todo lo pendiente.
-    # ---------------------------------------------------------------------
+
     try:
-        engine = create_engine(RESERVAS_DB_URL)
-        with engine.connect() as connection:
-            # Seleccionamos solo eventos que nadie más ha procesado
-            query = text("SELECT id, event_type, payload FROM reservation_events WHERE processed_at IS NULL ORDER BY created_at ASC")
-            result = connection.execute(query)
-            events = result.fetchall()
-            
-            if not events:
+        # Engine compartido a nivel de módulo: el pool se reutiliza entre ticks del scheduler.
+        with reservas_db.conectar() as connection:
+            total = 0
+            lotes = 0
+            while True:
+                procesados = procesar_lote(connection)
+                total += procesados
+                lotes += 1
+                if procesados < OUTBOX_BATCH_SIZE:
+                    break
+                if OUTBOX_MAX_BATCHES and lotes >= OUTBOX_MAX_BATCHES:
+                    break
+
+            if not total:
                 print("No pending events found.")
-                return
-
-            print(f"Found {len(events)} pending events.")
-            
-            # ---------------------------------------------------------------------
-            # PASO 2: PROCESAMIENTO E IDEMPOTENCIA
-            # Iteramos sobre cada mensaje para aplicar el cambio de estado local.
-            # ---------------------------------------------------------------------
-            for event in events:
-                event_id, event_type, payload = event
-                print(f"Processing event {event_id}: {event_type}")
-                
-                # Simulación de lógica de negocio: Restar inventario
-                # En un caso real, la operación debe ser idempotente (si procesamos el mismo id 2 veces, no restart 2 veces)
-                
-                # Ejemplo: Restar 1 al inventario global 'Habitaciones'
-                item = Inventario.query.filter_by(producto='Habitacion_Standard').first()
-                if not item:
-                    item = Inventario(producto='Habitacion_Standard', cantidad=100)
-                    db.session.add(item)
-                
-                if item.cantidad > 0:
-                    item.cantidad -= 1
-                    db.session.add(item)
-                
-                # ---------------------------------------------------------------------
-                # PASO 3: CONFIRMACIÓN (ACK)
-                # Marcamos el evento en la fuente como completado.
-                # Esto saca el mensaje de la 'Cola'.
-                # ---------------------------------------------------------------------
-                update_query = text("UPDATE reservation_events SET processed_at = :now WHERE id = :id")
-                connection.execute(update_query, {"now": datetime.now(), "id": event_id})
-                connection.commit()
-            
-            # Commit local changes
-            db.session.commit()
-            print("Sync completed successfully.")
-            
+                return total
+
+            print(f"Sync completed successfully ({total} events in {lotes} batches).")
+            return total
+
     except Exception as e:
         print(f"Error polling reservations: {e}")
         db.session.rollback()
@@ -0,0 +1 @@
+from .vistas import VistaInventario, VistaSnapshotInventario
@@ -0,0 +1,22 @@
+from flask import request
+from flask_restful import Resource
+from stock import existencias, sobreventa_acumulada, snapshot
+
+
+class VistaInventario(Resource):
+    """Stock actual por producto y unidades reservadas sin stock (acumuladas)."""
+    def get(self):
+        return {
+            "productos": existencias(),
+            "sobreventa": sobreventa_acumulada(),
+        }, 200
+
+
+class VistaSnapshotInventario(Resource):
+    """
+    Snapshot compacto de disponibilidad (producto -> unidades) con versión, para que Búsqueda
+    lo mantenga en memoria. `?desde=<version>` retorna sólo los productos que cambiaron.
+    """
+    def get(self):
+        desde = request.args.get('desde', 0, type=int)
+        return snapshot(max(desde, 0)), 200
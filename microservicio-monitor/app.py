@@ -1,12 +1,25 @@
 
 import os
+import atexit
+from datetime import datetime
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_restful import Api, Resource
 from modelos import db
+from metricas import instrumentar_app, medir_job, registro
 from apscheduler.schedulers.background import BackgroundScheduler
-import requests
+from sondeo import monitor_servicios, MONITOR_INTERVALO_SEGUNDOS
+
+class HealthCheck(Resource):
+    def get(self):
+        # Snapshot del último sondeo paralelo: {"servicio": "online" | "offline"}
+        return jsonify(monitor_servicios.resumen())
+
+class HealthCheckDetalle(Resource):
+    def get(self):
+        # Latencia, último cambio de estado y uptime de cada servicio
+        return jsonify(monitor_servicios.detalle())
 
 def create_flask_app():
     app = Flask(__name__)
@@ -24,52 +37,43 @@ def create_flask_app():
     CORS(app, resources={r"/*": {"origins": "*"}})
     
     api = Api(app)
+    api.add_resource(HealthCheck, '/health-check')
+    api.add_resource(HealthCheckDetalle, '/health-check/detalle')
     
     jwt = JWTManager(app)
+    db.init_app(app)
 
-    return app, api
-
-app, api = create_flask_app()
-db.init_app(app)
-
-class HealthCheck(Resource):
-    def get(self):
-        services = {
-            "reservas": "http://127.0.0.1:5002/reservas",
-            "pagos": "http://127.0.0.1:5003/pago", # Assuming root or similar exists, or just port check
-            "inventario": "http://127.0.0.1:5004", # Inventario root
-            "busqueda": "http://127.0.0.1:5001/busqueda",
-            "gateway": "http://127.0.0.1:5007/search", # Gateway check
-            "monitor": "http://127.0.0.1:5006" # Self
-        }
-        
-        status_report = {}
-        
-        for name, url in services.items():
-            if name == "monitor":
-                status_report[name] = "online"
-                continue
-                
-            try:
-                # Short timeout to detect failures quickly
-                response = requests.get(url, timeout=1)
-                # Any response (even 404 or 401) means the service is alive/reachable at network level
-                # For this experiment, connectivity = online.
-                # If we want functional check, we'd check 200 OK.
-                # However, some endpoints need auth or valid data.
-                # A connection error means offline.
-                status_report[name] = "online"
-            except requests.exceptions.RequestException:
-                status_report[name] = "offline"
+    # Latencia por endpoint, requests en vuelo, tiempo de DB y GET /metrics
+    instrumentar_app(app)
+    registrar_metricas()
 
-        return jsonify(status_report)
+    return app
 
-api.add_resource(HealthCheck, '/health-check')
+def registrar_metricas():
+    registro.gauge(
+        "servicio_online", "1 si el último sondeo encontró el servicio online.", ("servicio",),
+        funcion=lambda: {
+            (nombre,): int(estado == "online") for nombre, estado in (monitor_servicios.ultimo_resumen() or {}).items()
+        },
+    )
 
-# Scheduler setup
-scheduler = BackgroundScheduler()
-# scheduler.add_job(func, 'interval', seconds=60)
-scheduler.start()
+def iniciar_tareas(app):
+    """
+    Sondeo periódico de los servicios. Corre en CADA worker: el snapshot que sirve
+    /health-check vive en memoria del proceso. Por eso gunicorn.conf.py usa 1 worker por
+    defecto (las lecturas del snapshot son O(1); los hilos bastan).
+    """
+    scheduler = BackgroundScheduler()
+    scheduler.add_job(
+        medir_job("sondear_servicios")(monitor_servicios.sondear), 'interval', seconds=MONITOR_INTERVALO_SEGUNDOS,
+        next_run_time=datetime.now(), max_instances=1, coalesce=True
+    )
+    scheduler.start()
+    atexit.register(lambda: scheduler.shutdown(wait=False))
+    return scheduler
 
 if __name__ == "__main__":
+    # Servidor de desarrollo (un proceso). En producción: gunicorn -c gunicorn.conf.py wsgi:app
+    app = create_flask_app()
+    iniciar_tareas(app)
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5006)), debug=False)
@@ -0,0 +1,16 @@
+import os
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+bind = f"0.0.0.0:{os.environ.get('PORT', 5006)}"
+# Un solo worker por defecto: cada worker sondea por su cuenta y guarda su propio snapshot,
+# y servirlo es O(1). Con más workers se multiplican los sondeos, no la capacidad útil.
+workers = int(os.environ.get("MONITOR_WORKERS", 1))
+# Hilos por worker: /health-check sólo lee el último snapshot.
+threads = int(os.environ.get("GUNICORN_THREADS", 8))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 10))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Heartbeat de los workers en memoria (en contenedores /tmp puede ser un disco lento).
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
@@ -0,0 +1,129 @@
+import os
+import time
+import threading
+import concurrent.futures
+from collections import deque
+from datetime import datetime
+from cliente_http import cliente_http
+
+# Cada cuánto se sondean los servicios (en segundo plano, con el scheduler).
+MONITOR_INTERVALO_SEGUNDOS = float(os.environ.get("MONITOR_INTERVALO_SEGUNDOS", 5))
+MONITOR_TIMEOUT_SEGUNDOS = float(os.environ.get("MONITOR_TIMEOUT_SEGUNDOS", 1))
+# Sondeos retenidos por servicio para el uptime (720 x 5s = 1 hora).
+MONITOR_HISTORIAL = int(os.environ.get("MONITOR_HISTORIAL", 720))
+# Cambios de estado retenidos por servicio.
+MONITOR_TRANSICIONES = int(os.environ.get("MONITOR_TRANSICIONES", 20))
+
+SERVICIOS = {
+    "reservas": "http://127.0.0.1:5002/reservas",
+    "pagos": "http://127.0.0.1:5003/pago", # Assuming root or similar exists, or just port check
+    "inventario": "http://127.0.0.1:5004", # Inventario root
+    "busqueda": "http://127.0.0.1:5001/busqueda",
+    "gateway": "http://127.0.0.1:5007/search", # Gateway check
+}
+
+ONLINE = "online"
+OFFLINE = "offline"
+
+
+class EstadoServicio:
+    def __init__(self):
+        self.estado = None
+        self.latencia_ms = None
+        self.ultimo_sondeo = None
+        self.ultimo_cambio = None
+        self.historial = deque(maxlen=MONITOR_HISTORIAL)  # True = online
+        self.transiciones = deque(maxlen=MONITOR_TRANSICIONES)
+
+    def actualizar(self, online, latencia_ms, ahora):
+        estado = ONLINE if online else OFFLINE
+        if estado != self.estado:
+            self.ultimo_cambio = ahora
+            self.transiciones.append({"estado": estado, "desde": ahora})
+        self.estado = estado
+        self.latencia_ms = latencia_ms
+        self.ultimo_sondeo = ahora
+        self.historial.append(online)
+
+    def detalle(self):
+        return {
+            "estado": self.estado,
+            "latencia_ms": self.latencia_ms,
+            "ultimo_sondeo": self.ultimo_sondeo,
+            "ultimo_cambio": self.ultimo_cambio,
+            "uptime_pct": round(100 * sum(self.historial) / len(self.historial), 2) if self.historial else None,
+            "sondeos": len(self.historial),
+            "transiciones": list(self.transiciones),
+        }
+
+
+class MonitorServicios:
+    """
+    Sondea todos los servicios EN PARALELO en segundo plano y publica un snapshot.
+
+    `/health-check` sólo lee el último snapshot (tiempo constante): sin importar cuántos
+    dashboards lo consulten ni cuántos servicios estén caídos, no genera tráfico extra
+    ni bloquea esperando timeouts.
+    """
+    def __init__(self, servicios=SERVICIOS):
+        self._servicios = servicios
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(servicios), thread_name_prefix="sondeo")
+        self._estados = {nombre: EstadoServicio() for nombre in servicios}
+        self._lock = threading.Lock()
+        self._resumen = None
+        self._detalle = None
+
+    def _sondear_servicio(self, nombre, url):
+        inicio = time.perf_counter()
+        try:
+            # Any response (even 404 or 401) means the service is alive/reachable at network level.
+            # For this experiment, connectivity = online. A connection error means offline.
+            # Un reintento (dentro del presupuesto) evita marcar offline por un paquete perdido
+            cliente_http.get(url, timeout=MONITOR_TIMEOUT_SEGUNDOS, reintentos=1, upstream=nombre)
+            online = True
+        except Exception:
+            online = False
+        return online, round((time.perf_counter() - inicio) * 1000, 1)
+
+    def sondear(self):
+        futuros = {
+            nombre: self._executor.submit(self._sondear_servicio, nombre, url)
+            for nombre, url in self._servicios.items()
+        }
+        resultados = {nombre: futuro.result() for nombre, futuro in futuros.items()}
+        ahora = datetime.now().isoformat(timespec="seconds")
+
+        with self._lock:
+            for nombre, (online, latencia_ms) in resultados.items():
+                estado = self._estados[nombre]
+                anterior = estado.estado
+                estado.actualizar(online, latencia_ms, ahora)
+                if anterior is not None and anterior != estado.estado:
+                    print(f"Service {nombre} is now {estado.estado}")
+
+            # Snapshots inmutables: los lectores sólo toman la referencia
+            resumen = {nombre: estado.estado for nombre, estado in self._estados.items()}
+            resumen["monitor"] = ONLINE  # Self
+            detalle = {nombre: estado.detalle() for nombre, estado in self._estados.items()}
+            self._resumen = resumen
+            self._detalle = {"generado_en": ahora, "intervalo_segundos": MONITOR_INTERVALO_SEGUNDOS, "servicios": detalle}
+
+    def _asegurar_snapshot(self):
+        # Antes del primer tick del scheduler se sondea una única vez de forma síncrona
+        if self._resumen is None:
+            self.sondear()
+
+    def ultimo_resumen(self):
+        """Último snapshot sin forzar un sondeo (None antes del primer tick)."""
+        return self._resumen
+
+    def resumen(self):
+        self._asegurar_snapshot()
+        return self._resumen
+
+    def detalle(self):
+        self._asegurar_snapshot()
+        return self._detalle
+
+
+monitor_servicios = MonitorServicios()
@@ -4,7 +4,9 @@ from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
 from modelos import db
+from metricas import instrumentar_app, registro
 from vistas import VistaPago
+from escritura import iniciar_write_behind
 
 def create_flask_app():
     app = Flask(__name__)
@@ -25,14 +27,38 @@ def create_flask_app():
     api.add_resource(VistaPago, '/pago')
     
     jwt = JWTManager(app)
+    db.init_app(app)
+
+    # Latencia por endpoint, requests en vuelo, tiempo de DB y GET /metrics
+    instrumentar_app(app)
 
     return app
 
-app = create_flask_app()
-db.init_app(app)
+def inicializar_db(app):
+    """Crea las tablas. Con gunicorn corre una sola vez en el master (on_starting), antes de los workers."""
+    with app.app_context():
+        db.create_all()
 
-with app.app_context():
-    db.create_all()
+def iniciar_tareas(app):
+    """
+    Write-behind opcional de PaymentVote (PAGOS_WRITE_BEHIND=1). Corre en CADA worker:
+    cada proceso agrupa sus propios votos, no hay un trabajo único que elegir.
+    """
+    buffer_votos = iniciar_write_behind(app)
+    if buffer_votos is not None:
+        registro.gauge(
+            "pagos_write_behind_pending_votes", "Votos encolados aún no escritos en la DB.",
+            funcion=buffer_votos.pendientes,
+        )
+        registro.gauge(
+            "pagos_write_behind_lost_votes_total", "Votos que no se pudieron escribir ni reintentando fila por fila.",
+            funcion=lambda: buffer_votos.stats["perdidos"], tipo="counter",
+        )
+    return buffer_votos
 
 if __name__ == "__main__":
+    # Servidor de desarrollo (un proceso). En producción: gunicorn -c gunicorn.conf.py wsgi:app
+    app = create_flask_app()
+    inicializar_db(app)
+    iniciar_tareas(app)
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5003)), debug=False)
@@ -0,0 +1,153 @@
+import os
+import time
+import queue
+import atexit
+import threading
+import datetime as dt
+from sqlalchemy import insert
+from modelos import db, PaymentVote
+
+# WRITE-BEHIND DE VOTOS (opcional, PAGOS_WRITE_BEHIND=1)
+# Agrupa los PaymentVote en inserts masivos en lugar de un commit (fsync) por voto.
+PAGOS_WRITE_BEHIND = os.environ.get("PAGOS_WRITE_BEHIND", "0") == "1"
+# Se hace flush al juntar este número de votos...
+PAGOS_WB_LOTE = int(os.environ.get("PAGOS_WB_LOTE", 200))
+# ...o cuando pasa este tiempo desde el primer voto pendiente.
+PAGOS_WB_INTERVALO_MS = float(os.environ.get("PAGOS_WB_INTERVALO_MS", 5))
+# Memoria acotada: máximo de votos en espera de escritura.
+PAGOS_WB_CAPACIDAD = int(os.environ.get("PAGOS_WB_CAPACIDAD", 10000))
+# Backpressure: tiempo máximo que un request espera lugar en el buffer antes de escribir síncrono.
+PAGOS_WB_ESPERA_SEGUNDOS = float(os.environ.get("PAGOS_WB_ESPERA_SEGUNDOS", 0.5))
+# Reintentos del INSERT de un lote (con backoff exponencial) antes de escribir voto por voto.
+PAGOS_WB_REINTENTOS = int(os.environ.get("PAGOS_WB_REINTENTOS", 4))
+PAGOS_WB_BACKOFF_SEGUNDOS = float(os.environ.get("PAGOS_WB_BACKOFF_SEGUNDOS", 0.1))
+
+
+class BufferVotos:
+    """
+    Buffer write-behind para PaymentVote.
+
+    Un hilo dedicado toma los votos encolados y los inserta con un único INSERT
+    multi-fila + commit por lote. Si el buffer está lleno, el request espera hasta
+    PAGOS_WB_ESPERA_SEGUNDOS y luego escribe de forma síncrona.
+
+    Un lote que falla se reintenta con backoff y, si sigue fallando, se escribe voto por
+    voto: sólo se pierde un voto que no se pudo insertar ni siquiera solo (queda en
+    stats["perdidos"] y en /metrics). Al apagar, lo pendiente se escribe de forma síncrona.
+    """
+    def __init__(self, app):
+        self._app = app
+        self._cola = queue.Queue(maxsize=PAGOS_WB_CAPACIDAD)
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._loop, name="pagos-write-behind", daemon=True)
+        self._stats_lock = threading.Lock()
+        self.stats = {"encolados": 0, "lotes": 0, "escritos": 0, "sincronos_por_backpressure": 0, "errores": 0,
+                      "por_fila": 0, "perdidos": 0}
+
+    def iniciar(self):
+        self._hilo.start()
+        atexit.register(self.cerrar)
+
+    def agregar(self, replica_id, amount):
+        """Encola un voto; retorna False si no hubo lugar (el llamador debe persistirlo síncrono)."""
+        if self._detener.is_set():
+            # Apagando: el drenado final puede haber terminado, así que el voto se escribe síncrono
+            return False
+        fila = {"replica_id": replica_id, "amount": amount, "timestamp": dt.datetime.now()}
+        try:
+            self._cola.put(fila, timeout=PAGOS_WB_ESPERA_SEGUNDOS)
+        except queue.Full:
+            self._contar("sincronos_por_backpressure")
+            return False
+        self._contar("encolados")
+        return True
+
+    def _tomar_lote(self):
+        try:
+            primero = self._cola.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        lote = [primero]
+        limite = time.monotonic() + PAGOS_WB_INTERVALO_MS / 1000
+        while len(lote) < PAGOS_WB_LOTE:
+            restante = limite - time.monotonic()
+            try:
+                lote.append(self._cola.get(timeout=restante) if restante > 0 else self._cola.get_nowait())
+            except queue.Empty:
+                break
+        return lote
+
+    def _contar(self, clave, valor=1):
+        with self._stats_lock:
+            self.stats[clave] += valor
+
+    def _escribir(self, lote):
+        with self._app.app_context():
+            espera = PAGOS_WB_BACKOFF_SEGUNDOS
+            for intento in range(1, PAGOS_WB_REINTENTOS + 1):
+                try:
+                    db.session.execute(insert(PaymentVote), lote)
+                    db.session.commit()
+                    self._contar("lotes")
+                    self._contar("escritos", len(lote))
+                    return
+                except Exception as e:
+                    db.session.rollback()
+                    self._contar("errores")
+                    print(f"Write-behind flush failed ({len(lote)} votes, attempt {intento}): {e}")
+                    if intento < PAGOS_WB_REINTENTOS:
+                        time.sleep(espera)
+                        espera *= 2
+            self._escribir_por_fila(lote)
+
+    def _escribir_por_fila(self, lote):
+        # Último recurso: una fila mala (o un error transitorio) no arrastra al resto del lote
+        for fila in lote:
+            try:
+                db.session.execute(insert(PaymentVote), [fila])
+                db.session.commit()
+                self._contar("por_fila")
+                self._contar("escritos")
+            except Exception as e:
+                db.session.rollback()
+                self._contar("perdidos")
+                print(f"Write-behind could not persist vote {fila}: {e}")
+
+    def _loop(self):
+        while not self._detener.is_set():
+            lote = self._tomar_lote()
+            if lote:
+                self._escribir(lote)
+
+    def cerrar(self):
+        """
+        Flush final: espera a que el hilo termine su lote en curso y escribe lo que quede en
+        la cola desde el hilo que apaga (sin un join con timeout que abandone votos).
+        """
+        self._detener.set()
+        if self._hilo.is_alive():
+            self._hilo.join()
+        while True:
+            lote = []
+            while len(lote) < PAGOS_WB_LOTE:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            if not lote:
+                break
+            self._escribir(lote)
+
+    def pendientes(self):
+        return self._cola.qsize()
+
+
+buffer_votos = None
+
+
+def iniciar_write_behind(app):
+    global buffer_votos
+    if PAGOS_WRITE_BEHIND and buffer_votos is None:
+        buffer_votos = BufferVotos(app)
+        buffer_votos.iniciar()
+    return buffer_votos
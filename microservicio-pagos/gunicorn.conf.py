@@ -0,0 +1,26 @@
+import os
+import multiprocessing
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+bind = f"0.0.0.0:{os.environ.get('PORT', 5003)}"
+# Un proceso por core (x2 + 1) para usar toda la CPU del dyno; Heroku fija WEB_CONCURRENCY.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+# Hilos por worker para solapar la espera de la DB.
+threads = int(os.environ.get("GUNICORN_THREADS", 4))
+worker_class = "gthread"
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", 30))
+graceful_timeout = int(os.environ.get("GUNICORN_GRACEFUL_TIMEOUT", 10))
+keepalive = int(os.environ.get("GUNICORN_KEEPALIVE", 5))
+# Heartbeat de los workers en memoria (en contenedores /tmp puede ser un disco lento).
+worker_tmp_dir = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+
+def on_starting(server):
+    # Una sola vez en el master, antes de crear los workers: tablas sin carreras entre procesos
+    from app import create_flask_app, inicializar_db
+    from modelos import db
+    app = create_flask_app()
+    inicializar_db(app)
+    # Sin conexiones heredadas: cada worker abre su propio pool después del fork
+    with app.app_context():
+        db.engine.dispose()
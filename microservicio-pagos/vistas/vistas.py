@@ -1,6 +1,7 @@
 from flask import request
 from flask_restful import Resource
 from modelos import db, PaymentVote
+import escritura
 
 class VistaPago(Resource):
     def post(self):
@@ -14,13 +15,21 @@ class VistaPago(Resource):
             final_amount = base_amount * 10 # Retorna $450 en vez de $45
             
         # Registrar voto
-        vote = PaymentVote(replica_id=replica_id, amount=final_amount)
-        db.session.add(vote)
-        db.session.commit()
+        # Con write-behind activo el voto se agrupa con otros en un insert masivo;
+        # "durable": true en el body fuerza la escritura síncrona de siempre.
+        persistencia = "sync"
+        buffer = escritura.buffer_votos
+        if buffer is not None and not data.get('durable', False) and buffer.agregar(replica_id, final_amount):
+            persistencia = "write-behind"
+        else:
+            vote = PaymentVote(replica_id=replica_id, amount=final_amount)
+            db.session.add(vote)
+            db.session.commit()
         
         return {
             "mensaje": "Pago procesado",
             "replica_id": replica_id,
             "processed_amount": final_amount,
-            "status": "success"
+            "status": "success",
+            "persistencia": persistencia
         }, 200
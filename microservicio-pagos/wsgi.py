@@ -0,0 +1,7 @@
+# Punto de entrada de producción:  gunicorn -c gunicorn.conf.py wsgi:app
+# Cada worker importa este módulo después del fork: arma su propia app y arranca su
+# write-behind propio (los hilos no sobreviven al fork del master).
+from app import create_flask_app, iniciar_tareas
+
+app = create_flask_app()
+iniciar_tareas(app)
@@ -1,10 +1,18 @@
 import os
+import atexit
 from flask import Flask
 from flask_cors import CORS
 from flask_jwt_extended import JWTManager
 from flask_restful import Api
-from modelos import db
-from vistas import VistaReservas, VistaReserva, VistaPagoReserva, VistaReservasNaive, VistaPagoReservaNaive
+from sqlalchemy import inspect, text, LargeBinary
+from modelos import db, ReservationEvent, IdempotencyKey
+from metricas import instrumentar_app, medir_job, memorizar, registro
+from vistas import VistaReservas, VistaReservasBulk, VistaReserva, VistaPagoReserva, VistaReplicasPago, VistaReservasNaive, VistaPagoReservaNaive
+from apscheduler.schedulers.background import BackgroundScheduler
+from tasks import archivar_eventos, estado_outbox
+from idempotencia import purgar_claves_expiradas
+from reputacion import reputacion_replicas
+from liderazgo import EleccionLider
 
 def create_flask_app():
     app = Flask(__name__)
@@ -23,21 +31,106 @@ def create_flask_app():
     
     api = Api(app)
     api.add_resource(VistaReservas, '/reservas')
+    api.add_resource(VistaReservasBulk, '/reservas/bulk')
     api.add_resource(VistaReserva, '/reservas/<int:id_reserva>')
     api.add_resource(VistaPagoReserva, '/reservas/<int:id_reserva>/pagar')
+    api.add_resource(VistaReplicasPago, '/pagos/replicas')
     # Naive endpoints (sin tácticas)
     api.add_resource(VistaReservasNaive, '/reservas/naive')
     api.add_resource(VistaPagoReservaNaive, '/reservas/<int:id_reserva>/pagar/naive')
     
     jwt = JWTManager(app)
+    db.init_app(app)
+
+    # Latencia por endpoint, requests en vuelo, tiempo de DB y GET /metrics
+    instrumentar_app(app)
+    registrar_metricas()
 
     return app
 
-app = create_flask_app()
-db.init_app(app)
+def registrar_metricas():
+    # Métricas propias de Reservas (se calculan al consultar /metrics)
+    outbox = memorizar(estado_outbox)
+    registro.gauge(
+        "outbox_backlog_events", "Eventos de la Outbox aún no confirmados por Inventario.",
+        funcion=lambda: outbox()[0],
+    )
+    registro.gauge(
+        "outbox_oldest_pending_seconds", "Antigüedad del evento pendiente más viejo de la Outbox.",
+        funcion=lambda: outbox()[1],
+    )
+    registro.gauge(
+        "pagos_replica_en_cuarentena", "1 si la réplica de Pagos está en cuarentena.", ("replica",),
+        funcion=lambda: {
+            (replica,): int(r["estado"] == "cuarentena") for replica, r in reputacion_replicas.estadisticas().items()
+        },
+    )
+
+def inicializar_db(app):
+    """Crea las tablas. Con gunicorn corre una sola vez en el master (on_starting), antes de los workers."""
+    with app.app_context():
+        db.create_all()
+        # create_all no toca tablas existentes: las columnas de lease (reclamo de la Outbox por
+        # Inventario, requests idempotentes en curso) se agregan aparte en una base anterior
+        for modelo, nuevas in ((ReservationEvent, ("claimed_by", "lease_expires_at")),
+                               (IdempotencyKey, ("en_curso_hasta",))):
+            tabla = modelo.__tablename__
+            columnas = {c["name"] for c in inspect(db.engine).get_columns(tabla)}
+            for columna in nuevas:
+                if columna not in columnas:
+                    tipo = modelo.__table__.c[columna].type.compile(dialect=db.engine.dialect)
+                    with db.engine.begin() as connection:
+                        connection.execute(text(f"ALTER TABLE {tabla} ADD COLUMN {columna} {tipo}"))
+        # Ídem para el índice parcial de pendientes: justo la tabla con el histórico grande
+        for indice in ReservationEvent.__table__.indexes:
+            indice.create(db.engine, checkfirst=True)
+        # En PostgreSQL el payload VARCHAR de la Outbox pasa a bytea conservando los eventos
+        # JSON anteriores (Inventario los sigue leyendo). SQLite guarda bytes en la columna
+        # vieja sin migrar.
+        if db.engine.dialect.name == "postgresql":
+            for tabla in ("reservation_events", "reservation_events_archive"):
+                columnas = {c["name"]: c["type"] for c in inspect(db.engine).get_columns(tabla)}
+                if not isinstance(columnas["payload"], LargeBinary):
+                    with db.engine.begin() as connection:
+                        connection.execute(text(
+                            f"ALTER TABLE {tabla} ALTER COLUMN payload TYPE bytea USING convert_to(payload, 'UTF8')"
+                        ))
+
+def iniciar_tareas(app):
+    """
+    Scheduler de mantenimiento. Arranca pausado en cada proceso y sólo el líder electo
+    lo reanuda: con N workers los jobs corren una única vez por servicio.
+    """
+    @medir_job("archivar_eventos")
+    def job_archivar_eventos():
+        with app.app_context():
+            archivar_eventos()
+
+    @medir_job("purgar_claves_expiradas")
+    def job_purgar_claves_expiradas():
+        with app.app_context():
+            purgar_claves_expiradas()
+
+    scheduler = BackgroundScheduler()
+    # Archivado periódico de la Outbox: mantiene constante el costo del escaneo de pendientes
+    scheduler.add_job(job_archivar_eventos, 'interval', minutes=10)
+    scheduler.add_job(job_purgar_claves_expiradas, 'interval', hours=1)
+    scheduler.start(paused=True)
+
+    lider = EleccionLider(
+        "reservas", app.config["SQLALCHEMY_DATABASE_URI"], al_ganar=scheduler.resume, al_perder=scheduler.pause
+    ).iniciar()
 
-with app.app_context():
-    db.create_all()
+    def apagar():
+        # Primero soltar el liderazgo (otro worker lo toma), luego detener los jobs
+        lider.detener()
+        scheduler.shutdown(wait=False)
+    atexit.register(apagar)
+    return scheduler
 
 if __name__ == "__main__":
+    # Servidor de desarrollo (un proceso). En producción: gunicorn -c gunicorn.conf.py wsgi:app
+    app = create_flask_app()
+    inicializar_db(app)
+    iniciar_tareas(app)
     app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5002)), debug=False)
@@ -0,0 +1,82 @@
+import json
+import struct
+
+# SOBRE BINARIO DE LOS EVENTOS DE LA OUTBOX (copiado en Reservas e Inventario)
+# Sólo viajan los campos que consumen los servicios, con un layout fijo de 25 bytes más
+# el nombre del producto:
+#   marca (0xE7) | version | tipo | reservation_id int64 | cantidad uint32 | monto float64 |
+#   largo del producto uint16 | producto utf-8
+# La marca nunca es '{', así que los payloads JSON anteriores (versión 0) se siguen leyendo.
+MARCA = 0xE7
+VERSION = 1
+CABECERA = struct.Struct("<BBBqIdH")
+CANTIDAD_MAX = 2 ** 32 - 1
+PRODUCTO_MAX_BYTES = 2 ** 16 - 1
+
+# Tipos de evento: el byte `tipo` permite descartar un evento sin decodificar el resto.
+TIPOS = {
+    'RESERVATION_CREATED': 1,
+    'RESERVATION_CANCELLED': 2,
+}
+NOMBRES_TIPO = {codigo: nombre for nombre, codigo in TIPOS.items()}
+
+
+def codificar(event_type, reservation_id, producto, cantidad, monto):
+    """Payload binario (bytes) de un evento de la Outbox."""
+    producto = producto.encode("utf-8")
+    return CABECERA.pack(
+        MARCA, VERSION, TIPOS[event_type], reservation_id, cantidad, float(monto), len(producto)
+    ) + producto
+
+
+def _bytes(payload):
+    # psycopg2 entrega bytea como memoryview; SQLite devuelve str para las filas JSON viejas
+    if isinstance(payload, memoryview):
+        return payload.tobytes()
+    if isinstance(payload, str):
+        return payload.encode("utf-8")
+    return payload or b""
+
+
+def tipo(payload):
+    """Nombre del tipo de un sobre binario leyendo sólo la cabecera (None si es JSON anterior)."""
+    payload = _bytes(payload)
+    if len(payload) < 3 or payload[0] != MARCA:
+        return None
+    return NOMBRES_TIPO.get(payload[2])
+
+
+def decodificar(payload):
+    """
+    Sobre completo: {"version", "tipo", "reservation_id", "producto", "cantidad", "monto"}.
+
+    Un payload JSON anterior al sobre se devuelve con version 0 y sólo los campos que tenga
+    (`tipo` y `reservation_id` vienen entonces de las columnas del evento). Lanza ValueError
+    si el payload no es ninguno de los dos formatos o tiene una versión desconocida.
+    """
+    payload = _bytes(payload)
+    if not payload or payload[0] != MARCA:
+        datos = json.loads(payload) if payload else {}
+        if not isinstance(datos, dict):
+            raise ValueError("event payload is not a JSON object")
+        return {
+            "version": 0,
+            "tipo": None,
+            "reservation_id": None,
+            "producto": datos.get("producto"),
+            "cantidad": datos.get("cantidad"),
+            "monto": datos.get("monto"),
+        }
+    if len(payload) < CABECERA.size:
+        raise ValueError("truncated event envelope")
+    _, version, codigo, reservation_id, cantidad, monto, largo = CABECERA.unpack_from(payload)
+    if version != VERSION:
+        raise ValueError(f"unsupported event envelope version {version}")
+    return {
+        "version": version,
+        "tipo": NOMBRES_TIPO.get(codigo),
+        "reservation_id": reservation_id,
+        "producto": payload[CABECERA.size:CABECERA.size + largo].decode("utf-8"),
+        "cantidad": cantidad,
+        "monto": monto,
+    }
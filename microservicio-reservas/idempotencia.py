@@ -0,0 +1,254 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import functools
+import datetime as dt
+from collections import OrderedDict
+from flask import request
+from sqlalchemy import or_, and_
+from sqlalchemy.exc import IntegrityError
+from modelos import db, IdempotencyKey
+
+# IDEMPOTENCIA DE POSTs (reintentos del cliente / gateway)
+# Un POST con el header `Idempotency-Key` se ejecuta una sola vez: los duplicados reciben
+# la primera respuesta (replay) y los que llegan mientras la original corre la esperan.
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCIA_TTL_SEGUNDOS = int(os.environ.get("IDEMPOTENCIA_TTL_SEGUNDOS", 24 * 3600))
+IDEMPOTENCIA_CACHE_MAX = int(os.environ.get("IDEMPOTENCIA_CACHE_MAX", 10000))
+# Cuánto espera un duplicado a que termine el request original antes de responder 409.
+IDEMPOTENCIA_ESPERA_SEGUNDOS = float(os.environ.get("IDEMPOTENCIA_ESPERA_SEGUNDOS", 10))
+# Lease de una clave en curso: si el worker muere sin responder, vencido este plazo otro
+# request con la misma clave la retoma (en vez de recibir 409 hasta que expire el TTL).
+# Debe cubrir el request más lento (por defecto, el timeout de gunicorn).
+IDEMPOTENCIA_LEASE_SEGUNDOS = float(os.environ.get("IDEMPOTENCIA_LEASE_SEGUNDOS", 30))
+
+
+class CacheLRU:
+    """Cache LRU con TTL para respuestas ya completadas (evita ir a la DB en cada duplicado)."""
+    def __init__(self, capacidad, ttl):
+        self._capacidad = capacidad
+        self._ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, clave):
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                return None
+            expira, valor = item
+            if expira < time.monotonic():
+                del self._datos[clave]
+                return None
+            self._datos.move_to_end(clave)
+            return valor
+
+    def put(self, clave, valor):
+        with self._lock:
+            self._datos[clave] = (time.monotonic() + self._ttl, valor)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self._capacidad:
+                self._datos.popitem(last=False)
+
+
+_cache = CacheLRU(IDEMPOTENCIA_CACHE_MAX, IDEMPOTENCIA_TTL_SEGUNDOS)
+_en_curso = {}
+_en_curso_lock = threading.Lock()
+
+
+def _huella():
+    return hashlib.sha256(request.get_data() or b"").hexdigest()
+
+
+def _replay(huella, guardada):
+    huella_original, estado, cuerpo = guardada
+    if huella_original != huella:
+        return {"error": f"{IDEMPOTENCY_HEADER} reutilizada con un cuerpo distinto"}, 422
+    return cuerpo, estado, {"Idempotent-Replayed": "true"}
+
+
+def _vigente(fila):
+    return fila.creado_en >= dt.datetime.now() - dt.timedelta(seconds=IDEMPOTENCIA_TTL_SEGUNDOS)
+
+
+def _lease_vencido(fila):
+    """Request en curso cuyo proceso dejó de responder (filas previas al lease: desde creado_en)."""
+    if fila.estado_http is not None:
+        return False
+    ahora = dt.datetime.now()
+    if fila.en_curso_hasta is not None:
+        return fila.en_curso_hasta < ahora
+    return fila.creado_en < ahora - dt.timedelta(seconds=IDEMPOTENCIA_LEASE_SEGUNDOS)
+
+
+def _retomar(clave, huella):
+    """Toma una clave en curso con el lease vencido. UPDATE condicional: sólo un proceso gana."""
+    ahora = dt.datetime.now()
+    retomadas = IdempotencyKey.query.filter(
+        IdempotencyKey.clave == clave,
+        IdempotencyKey.estado_http.is_(None),
+        or_(
+            IdempotencyKey.en_curso_hasta < ahora,
+            and_(
+                IdempotencyKey.en_curso_hasta.is_(None),
+                IdempotencyKey.creado_en < ahora - dt.timedelta(seconds=IDEMPOTENCIA_LEASE_SEGUNDOS),
+            ),
+        ),
+    ).update({
+        "huella": huella,
+        "creado_en": ahora,
+        "en_curso_hasta": ahora + dt.timedelta(seconds=IDEMPOTENCIA_LEASE_SEGUNDOS),
+    }, synchronize_session=False)
+    db.session.commit()
+    if retomadas:
+        print(f"Idempotency key {clave} taken over after its in-flight lease expired")
+    return retomadas == 1
+
+
+def _reservar(clave, huella):
+    """
+    Registra la clave como 'en curso' en la DB (visible para otros procesos/dynos).
+    Retorna None si quedó reservada por este request, o la fila existente.
+    """
+    fila = db.session.get(IdempotencyKey, clave)
+    if fila is not None and not _vigente(fila):
+        db.session.delete(fila)
+        db.session.commit()
+        fila = None
+    if fila is not None:
+        if _lease_vencido(fila) and _retomar(clave, huella):
+            return None
+        db.session.expire_all()
+        return db.session.get(IdempotencyKey, clave)
+    try:
+        ahora = dt.datetime.now()
+        db.session.add(IdempotencyKey(
+            clave=clave, huella=huella, creado_en=ahora,
+            en_curso_hasta=ahora + dt.timedelta(seconds=IDEMPOTENCIA_LEASE_SEGUNDOS),
+        ))
+        db.session.commit()
+        return None
+    except IntegrityError:
+        db.session.rollback()
+        return db.session.get(IdempotencyKey, clave)
+
+
+def _esperar_otro_proceso(clave):
+    """Espera a que el request original (en otro proceso) guarde su respuesta."""
+    limite = time.monotonic() + IDEMPOTENCIA_ESPERA_SEGUNDOS
+    while time.monotonic() < limite:
+        time.sleep(0.05)
+        db.session.expire_all()
+        fila = db.session.get(IdempotencyKey, clave)
+        if fila is None:
+            return None
+        if fila.estado_http is not None:
+            return fila
+        if _lease_vencido(fila):
+            # El original murió: se vuelve a intentar la reserva (que retoma la clave)
+            return None
+    return False
+
+
+def idempotente(metodo=None, *, transitorios=()):
+    """
+    Decorador para métodos POST de un Resource.
+
+    1.  Sin header: se ejecuta normal.
+    2.  Respuesta ya guardada (cache LRU/TTL o tabla idempotency_keys): replay.
+    3.  Duplicado en vuelo en este proceso: espera al original y hace replay.
+    4.  Duplicado en vuelo en otro proceso (fila 'en curso' en la DB): sondea la fila;
+        si el lease del original vence (worker caído), el duplicado retoma la clave.
+    5.  Primero en llegar: ejecuta y guarda la respuesta. Las respuestas 5xx y los
+        estados de `transitorios` no se guardan (se libera la clave para que el
+        reintento vuelva a ejecutar).
+    """
+    if metodo is None:
+        return lambda metodo: idempotente(metodo, transitorios=transitorios)
+
+    @functools.wraps(metodo)
+    def envoltura(self, *args, **kwargs):
+        clave_cliente = request.headers.get(IDEMPOTENCY_HEADER)
+        if not clave_cliente:
+            return metodo(self, *args, **kwargs)
+
+        clave = f"{request.method} {request.path} {clave_cliente}"[:300]
+        huella = _huella()
+
+        for _ in range(3):
+            guardada = _cache.get(clave)
+            if guardada is not None:
+                return _replay(huella, guardada)
+
+            with _en_curso_lock:
+                evento = _en_curso.get(clave)
+                propio = evento is None
+                if propio:
+                    evento = _en_curso[clave] = threading.Event()
+            if not propio:
+                evento.wait(IDEMPOTENCIA_ESPERA_SEGUNDOS)
+                continue
+
+            try:
+                fila = _reservar(clave, huella)
+                if fila is not None:
+                    if fila.estado_http is None:
+                        fila = _esperar_otro_proceso(clave)
+                        if fila is False:
+                            return {"error": "Request con la misma Idempotency-Key aún en curso"}, 409
+                        if fila is None:
+                            continue
+                    guardada = (fila.huella, fila.estado_http, json.loads(fila.respuesta))
+                    _cache.put(clave, guardada)
+                    return _replay(huella, guardada)
+
+                return _ejecutar(metodo, self, args, kwargs, clave, huella, transitorios)
+            finally:
+                with _en_curso_lock:
+                    _en_curso.pop(clave, None)
+                evento.set()
+
+        return {"error": "No fue posible resolver la Idempotency-Key"}, 409
+
+    return envoltura
+
+
+def _ejecutar(metodo, recurso, args, kwargs, clave, huella, transitorios):
+    try:
+        resultado = metodo(recurso, *args, **kwargs)
+    except Exception:
+        _liberar(clave)
+        raise
+
+    cuerpo, estado = (resultado[0], resultado[1]) if isinstance(resultado, tuple) else (resultado, 200)
+    if estado >= 500 or estado in transitorios:
+        _liberar(clave)
+        return resultado
+
+    fila = db.session.get(IdempotencyKey, clave)
+    if fila is not None:
+        fila.estado_http = estado
+        fila.respuesta = json.dumps(cuerpo)
+        fila.en_curso_hasta = None
+        db.session.commit()
+    _cache.put(clave, (huella, estado, cuerpo))
+    return resultado
+
+
+def _liberar(clave):
+    try:
+        db.session.rollback()
+        IdempotencyKey.query.filter_by(clave=clave).delete()
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Could not release idempotency key {clave}: {e}")
+
+
+def purgar_claves_expiradas():
+    limite = dt.datetime.now() - dt.timedelta(seconds=IDEMPOTENCIA_TTL_SEGUNDOS)
+    borradas = IdempotencyKey.query.filter(IdempotencyKey.creado_en < limite).delete(synchronize_session=False)
+    db.session.commit()
+    return borradas
@@ -0,0 +1,161 @@
+import os
+import json
+from sqlalchemy import insert
+from modelos import db, Reserva, ReservationEvent
+from notificaciones import notificar_evento
+from eventos import codificar, CANTIDAD_MAX
+
+# CREACIÓN MASIVA DE RESERVAS (POST /reservas/bulk)
+# Reservas por transacción: cada lote inserta sus reservas y sus eventos de la Outbox juntos.
+RESERVAS_BULK_LOTE = int(os.environ.get("RESERVAS_BULK_LOTE", 500))
+# Máximo de ítems por request (memoria y duración acotadas).
+RESERVAS_BULK_MAX = int(os.environ.get("RESERVAS_BULK_MAX", 10000))
+
+# Producto de las reservas que no indican uno (el único que existía antes del modelo de stock)
+PRODUCTO_POR_DEFECTO = 'Habitacion_Standard'
+
+
+class ErrorMasivo(Exception):
+    """Body inválido en su conjunto (no un ítem concreto): se responde con `estado_http`."""
+    def __init__(self, mensaje, estado_http=400):
+        super().__init__(mensaje)
+        self.estado_http = estado_http
+
+
+def normalizar_reserva(data):
+    """(producto, cantidad, monto) de una reserva, o un mensaje de error si es inválida."""
+    if not isinstance(data, dict):
+        return None, "item must be a JSON object"
+    cantidad = data.get('cantidad', 1)
+    if isinstance(cantidad, bool) or not isinstance(cantidad, int) or not 1 <= cantidad <= CANTIDAD_MAX:
+        return None, "cantidad must be a positive integer"
+    producto = data.get('producto') or PRODUCTO_POR_DEFECTO
+    # Mismo límite que la columna `producto` de Inventario
+    if not isinstance(producto, str) or len(producto) > 100:
+        return None, "producto must be a string of at most 100 characters"
+    monto = data.get('monto', 0.0)
+    if isinstance(monto, bool) or not isinstance(monto, (int, float)):
+        return None, "monto must be a number"
+    return (producto, cantidad, float(monto)), None
+
+
+def leer_items(cuerpo, es_ndjson):
+    """
+    Itera los ítems del body: un arreglo JSON o NDJSON (un objeto por línea, leído línea a
+    línea del stream sin cargar todo en memoria). Las líneas NDJSON inválidas se reportan
+    como error del ítem; un arreglo mal formado invalida el request.
+    """
+    if not es_ndjson:
+        try:
+            items = json.loads(cuerpo.read() or b"null")
+        except ValueError:
+            raise ErrorMasivo("body must be a JSON array or NDJSON")
+        if not isinstance(items, list):
+            raise ErrorMasivo("body must be a JSON array or NDJSON")
+        if len(items) > RESERVAS_BULK_MAX:
+            raise ErrorMasivo(f"at most {RESERVAS_BULK_MAX} reservations per request", 413)
+        yield from items
+        return
+    for linea in cuerpo:
+        linea = linea.strip()
+        if not linea:
+            continue
+        try:
+            yield json.loads(linea)
+        except ValueError:
+            yield ValueError("invalid JSON line")
+
+
+def insertar_lote(items):
+    """
+    Inserta un lote de reservas válidas [(data, producto, cantidad, monto)] con DOS sentencias
+    (INSERT ... RETURNING multi-fila de reservas y luego de eventos) y una notificación push.
+    No hace commit: lo decide el llamador (un commit por lote o uno para todo el request).
+    Retorna [(reserva_id, evento_id)] en el orden de `items`.
+    """
+    reservas_ids = db.session.scalars(
+        insert(Reserva).returning(Reserva.id, sort_by_parameter_order=True),
+        [{"cliente": data.get('cliente', 'Anonimo'), "monto": monto} for data, _, _, monto in items],
+    ).all()
+    eventos_ids = db.session.scalars(
+        insert(ReservationEvent).returning(ReservationEvent.id, sort_by_parameter_order=True),
+        [
+            {
+                "event_type": 'RESERVATION_CREATED',
+                "reservation_id": reserva_id,
+                "payload": codificar('RESERVATION_CREATED', reserva_id, producto, cantidad, monto),
+            }
+            for reserva_id, (_, producto, cantidad, monto) in zip(reservas_ids, items)
+        ],
+    ).all()
+    # Una notificación por lote basta: despierta al consumidor, que reclama todo lo pendiente
+    notificar_evento(db.session, eventos_ids[-1])
+    return list(zip(reservas_ids, eventos_ids))
+
+
+def crear_reservas(cuerpo, es_ndjson, atomico=False):
+    """
+    Crea las reservas del body en lotes de RESERVAS_BULK_LOTE.
+
+    Cada lote es una transacción (reservas + eventos de la Outbox juntos): un lote que falla
+    se revierte entero y sus ítems se reportan con error, los demás quedan confirmados.
+    Con `atomico` todo el request es UNA transacción: o se crean todas o ninguna.
+    Retorna (resultados por ítem en el orden del body, creadas, con error).
+    """
+    resultados = []
+    lote, indices = [], []
+    confirmadas = 0
+
+    def aplicar():
+        nonlocal lote, indices, confirmadas
+        if not lote:
+            return
+        try:
+            ids = insertar_lote(lote)
+            if not atomico:
+                db.session.commit()
+                confirmadas += len(ids)
+            for indice, (reserva_id, evento_id) in zip(indices, ids):
+                resultados[indice] = {"indice": indice, "id": reserva_id, "evento_id": evento_id}
+        except Exception as e:
+            db.session.rollback()
+            if atomico:
+                raise
+            print(f"Bulk reservation batch failed ({len(lote)} items): {e}")
+            for indice in indices:
+                resultados[indice] = {"indice": indice, "error": str(e)}
+        lote, indices = [], []
+
+    try:
+        for indice, data in enumerate(leer_items(cuerpo, es_ndjson)):
+            if indice >= RESERVAS_BULK_MAX:
+                # NDJSON: el tamaño se conoce recién al leer; los lotes ya confirmados se mantienen
+                raise ErrorMasivo(f"at most {RESERVAS_BULK_MAX} reservations per request", 413)
+            resultados.append(None)
+            linea, error = (None, str(data)) if isinstance(data, ValueError) else normalizar_reserva(data)
+            if error:
+                if atomico:
+                    raise ErrorMasivo(f"item {indice}: {error}; nothing was created")
+                resultados[indice] = {"indice": indice, "error": error}
+                continue
+            lote.append((data, *linea))
+            indices.append(indice)
+            if len(lote) >= RESERVAS_BULK_LOTE:
+                aplicar()
+        aplicar()
+        if not resultados:
+            raise ErrorMasivo("body has no reservations")
+        if atomico:
+            db.session.commit()
+            confirmadas = len(resultados)
+    except ErrorMasivo as e:
+        db.session.rollback()
+        if confirmadas:
+            # Lo ya confirmado no se deshace: se reporta junto con el error
+            for indice, resultado in enumerate(resultados):
+                if resultado is None:
+                    resultados[indice] = {"indice": indice, "error": str(e)}
+            return resultados, confirmadas, len(resultados) - confirmadas
+        raise
+
+    return resultados, confirmadas, len(resultados) - confirmadas
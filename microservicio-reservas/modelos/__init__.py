@@ -1 +1 @@
-from .modelos import db, Reserva, ReservationEvent
+from .modelos import db, Reserva, ReservationEvent, ReservationEventArchive, IdempotencyKey
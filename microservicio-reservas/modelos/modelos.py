@@ -16,6 +16,43 @@ class ReservationEvent(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     event_type = db.Column(db.String(50)) # 'CREATED', 'CANCELLED'
     reservation_id = db.Column(db.Integer)
-    payload = db.Column(db.String(500)) # JSON string
+    payload = db.Column(db.LargeBinary) # Sobre binario (eventos.py); JSON en los eventos anteriores
     created_at = db.Column(db.DateTime, default=dt.datetime.now)
     processed_at = db.Column(db.DateTime, nullable=True) # Para control, aunque Inventario maneja su propio cursor idealmente
+    # Lease del consumidor que reclamó el evento (varios workers de Inventario en paralelo)
+    claimed_by = db.Column(db.String(100), nullable=True)
+    lease_expires_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Índice parcial y cubriente para el reclamo de pendientes de Inventario
+        # (WHERE processed_at IS NULL ... ORDER BY id): sólo contiene eventos sin procesar,
+        # así que su tamaño no crece con el histórico.
+        db.Index(
+            'ix_reservation_events_pendientes', 'id', 'lease_expires_at',
+            postgresql_where=db.text('processed_at IS NULL'),
+            sqlite_where=db.text('processed_at IS NULL'),
+        ),
+    )
+
+class ReservationEventArchive(db.Model):
+    """Eventos ya procesados movidos fuera de la Outbox por el job de archivado."""
+    __tablename__ = 'reservation_events_archive'
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    event_type = db.Column(db.String(50))
+    reservation_id = db.Column(db.Integer)
+    payload = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime)
+    processed_at = db.Column(db.DateTime)
+
+class IdempotencyKey(db.Model):
+    """
+    Primera respuesta de un POST con `Idempotency-Key`; estado_http NULL = request en curso.
+    en_curso_hasta es el lease del request en curso: vencido, otro proceso puede retomar la clave.
+    """
+    __tablename__ = 'idempotency_keys'
+    clave = db.Column(db.String(300), primary_key=True)
+    huella = db.Column(db.String(64))
+    estado_http = db.Column(db.Integer, nullable=True)
+    respuesta = db.Column(db.Text, nullable=True)
+    creado_en = db.Column(db.DateTime, default=dt.datetime.now, index=True)
+    en_curso_hasta = db.Column(db.DateTime, nullable=True)
@@ -0,0 +1,51 @@
+import os
+import socket
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+# MODO PUSH DE LA OUTBOX (H1)
+# Opcional: avisa a Inventario apenas se confirma un ReservationEvent para que no
+# espere al siguiente tick del polling (0-10s). El polling sigue como respaldo.
+OUTBOX_PUSH = os.environ.get("OUTBOX_PUSH", "0") == "1"
+OUTBOX_CANAL = os.environ.get("OUTBOX_CANAL", "reservation_events")
+# Respaldo para SQLite (sin LISTEN/NOTIFY): datagrama UDP local hacia Inventario.
+OUTBOX_NOTIFY_HOST = os.environ.get("OUTBOX_NOTIFY_HOST", "127.0.0.1")
+OUTBOX_NOTIFY_PORT = int(os.environ.get("OUTBOX_NOTIFY_PORT", 5104))
+
+_PENDIENTES = "outbox_notificaciones_pendientes"
+
+_udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+
+def notificar_evento(session, evento_id):
+    """
+    Registra la notificación de un evento de la Outbox dentro de la transacción actual.
+
+    - PostgreSQL: `pg_notify` en la MISMA transacción que el insert; Postgres sólo la
+      entrega si el commit tiene éxito (un rollback la descarta).
+    - SQLite: se encola en la sesión y se envía por UDP después del commit.
+    """
+    if not OUTBOX_PUSH:
+        return
+    if session.get_bind().dialect.name == "postgresql":
+        session.execute(text("SELECT pg_notify(:canal, :payload)"),
+                        {"canal": OUTBOX_CANAL, "payload": str(evento_id)})
+    else:
+        session.info.setdefault(_PENDIENTES, []).append(evento_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _enviar_pendientes(session):
+    ids = session.info.pop(_PENDIENTES, None)
+    if not ids:
+        return
+    try:
+        _udp.sendto(",".join(str(i) for i in ids).encode(), (OUTBOX_NOTIFY_HOST, OUTBOX_NOTIFY_PORT))
+    except OSError:
+        # Best effort: si Inventario no escucha, el polling recupera el evento.
+        pass
+
+
+@event.listens_for(Session, "after_rollback")
+def _descartar_pendientes(session):
+    session.info.pop(_PENDIENTES, None)
@@ -0,0 +1,146 @@
+import os
+import time
+import threading
+from collections import deque
+
+# Ventana deslizante: últimas N observaciones por réplica.
+REPUTACION_VENTANA = int(os.environ.get("REPUTACION_VENTANA", 50))
+# Mínimo de observaciones antes de juzgar a una réplica.
+REPUTACION_MIN_MUESTRAS = int(os.environ.get("REPUTACION_MIN_MUESTRAS", 5))
+# Tasa de desacuerdo con la mayoría (o de errores) a partir de la cual se pone en cuarentena.
+REPUTACION_UMBRAL_DESACUERDO = float(os.environ.get("REPUTACION_UMBRAL_DESACUERDO", 0.5))
+REPUTACION_UMBRAL_ERRORES = float(os.environ.get("REPUTACION_UMBRAL_ERRORES", 0.5))
+# Cada cuánto se sondea una réplica en cuarentena, y cuántos sondeos correctos seguidos la reincorporan.
+REPUTACION_INTERVALO_SONDEO = float(os.environ.get("REPUTACION_INTERVALO_SONDEO", 30))
+REPUTACION_SONDEOS_REINCORPORACION = int(os.environ.get("REPUTACION_SONDEOS_REINCORPORACION", 3))
+
+ACUERDO = 'acuerdo'
+DESACUERDO = 'desacuerdo'
+ERROR = 'error'
+SIN_DECISION = 'sin_decision'
+
+
+class EstadoReplica:
+    def __init__(self):
+        self.observaciones = deque(maxlen=REPUTACION_VENTANA)  # (resultado, latencia_s)
+        self.en_cuarentena = False
+        self.cuarentena_desde = None
+        self.ultimo_sondeo = 0.0
+        self.sondeos_ok = 0
+        self.cuarentenas = 0
+
+    def tasas(self):
+        votos = sum(1 for r, _ in self.observaciones if r in (ACUERDO, DESACUERDO))
+        desacuerdos = sum(1 for r, _ in self.observaciones if r == DESACUERDO)
+        errores = sum(1 for r, _ in self.observaciones if r == ERROR)
+        total = len(self.observaciones)
+        return (
+            desacuerdos / votos if votos else 0.0,
+            errores / total if total else 0.0,
+        )
+
+
+class RastreadorReputacion:
+    """
+    Reputación de las réplicas de Pagos (H2).
+
+    Registra por réplica, en una ventana deslizante, si su voto coincidió con la mayoría,
+    su latencia y sus errores. Las réplicas que discrepan o fallan de forma persistente
+    pasan a cuarentena y salen del fan-out; se sondean cada REPUTACION_INTERVALO_SONDEO
+    segundos (su voto no cuenta) y se reincorporan tras varios sondeos correctos.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._replicas = {}
+
+    def _estado(self, replica_id):
+        estado = self._replicas.get(replica_id)
+        if estado is None:
+            estado = self._replicas[replica_id] = EstadoReplica()
+        return estado
+
+    def registrar(self, replica_id, resultado, latencia, sondeo=False):
+        with self._lock:
+            estado = self._estado(replica_id)
+            estado.observaciones.append((resultado, latencia))
+
+            if estado.en_cuarentena:
+                if not sondeo:
+                    return
+                if resultado == ACUERDO:
+                    estado.sondeos_ok += 1
+                    if estado.sondeos_ok >= REPUTACION_SONDEOS_REINCORPORACION:
+                        estado.en_cuarentena = False
+                        estado.cuarentena_desde = None
+                        estado.observaciones.clear()
+                        print(f"Replica {replica_id} reinstated after {estado.sondeos_ok} agreeing probes")
+                elif resultado != SIN_DECISION:
+                    estado.sondeos_ok = 0
+                return
+
+            if len(estado.observaciones) < REPUTACION_MIN_MUESTRAS:
+                return
+            tasa_desacuerdo, tasa_errores = estado.tasas()
+            if tasa_desacuerdo >= REPUTACION_UMBRAL_DESACUERDO or tasa_errores >= REPUTACION_UMBRAL_ERRORES:
+                estado.en_cuarentena = True
+                estado.cuarentena_desde = time.time()
+                estado.ultimo_sondeo = time.monotonic()
+                estado.sondeos_ok = 0
+                estado.cuarentenas += 1
+                print(f"Replica {replica_id} quarantined (disagreement={tasa_desacuerdo:.0%}, errors={tasa_errores:.0%})")
+
+    def seleccionar(self, configuracion):
+        """
+        Retorna (activas, sondeos): réplicas sanas para el fan-out y réplicas en cuarentena
+        a las que les toca sondeo. Si las sanas no alcanzan el quórum, se usan todas.
+        """
+        ahora = time.monotonic()
+        activas, sondeos = [], []
+        with self._lock:
+            for replica in configuracion.replicas:
+                estado = self._estado(replica.id)
+                if not estado.en_cuarentena:
+                    activas.append(replica)
+                elif ahora - estado.ultimo_sondeo >= REPUTACION_INTERVALO_SONDEO:
+                    estado.ultimo_sondeo = ahora
+                    sondeos.append(replica)
+        if not configuracion.alcanza_quorum(sum(r.peso for r in activas)):
+            return list(configuracion.replicas), []
+        return activas, sondeos
+
+    def factores_peso(self, replicas):
+        """
+        Factor por réplica para el peso por reputación: la tasa de acuerdo con la mayoría
+        en la ventana (1.0 mientras no haya REPUTACION_MIN_MUESTRAS observaciones).
+        """
+        factores = {}
+        with self._lock:
+            for replica in replicas:
+                estado = self._estado(replica.id)
+                if len(estado.observaciones) < REPUTACION_MIN_MUESTRAS:
+                    factores[replica.id] = 1.0
+                else:
+                    tasa_desacuerdo, _ = estado.tasas()
+                    factores[replica.id] = 1.0 - tasa_desacuerdo
+        return factores
+
+    def estadisticas(self):
+        with self._lock:
+            reporte = {}
+            for replica_id, estado in sorted(self._replicas.items()):
+                tasa_desacuerdo, tasa_errores = estado.tasas()
+                latencias = sorted(l for r, l in estado.observaciones if r != ERROR)
+                reporte[str(replica_id)] = {
+                    "estado": "cuarentena" if estado.en_cuarentena else "activa",
+                    "muestras": len(estado.observaciones),
+                    "tasa_desacuerdo": round(tasa_desacuerdo, 3),
+                    "tasa_errores": round(tasa_errores, 3),
+                    "latencia_p50_ms": round(latencias[len(latencias) // 2] * 1000, 1) if latencias else None,
+                    "cuarentena_desde": estado.cuarentena_desde,
+                    "sondeos_ok": estado.sondeos_ok,
+                    "cuarentenas": estado.cuarentenas,
+                }
+            return reporte
+
+
+reputacion_replicas = RastreadorReputacion()
@@ -0,0 +1,60 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, insert, delete, func
+from modelos import db, ReservationEvent, ReservationEventArchive
+
+# Ventana de retención: los eventos confirmados (processed_at) más antiguos que esto
+# se mueven a `reservation_events_archive` para que la Outbox sólo contenga lo reciente.
+OUTBOX_RETENTION_HOURS = int(os.environ.get("OUTBOX_RETENTION_HOURS", 24))
+OUTBOX_ARCHIVE_BATCH = int(os.environ.get("OUTBOX_ARCHIVE_BATCH", 5000))
+
+COLUMNAS_ARCHIVO = ['id', 'event_type', 'reservation_id', 'payload', 'created_at', 'processed_at']
+
+
+def archivar_eventos():
+    """
+    ARCHIVADO DE LA OUTBOX (H1)
+
+    Mueve en lotes los eventos ya confirmados por Inventario y más antiguos que la
+    ventana de retención. Cada lote es un INSERT ... SELECT + DELETE en una sola
+    transacción, así que un evento nunca queda duplicado ni se pierde.
+    """
+    limite = datetime.now() - timedelta(hours=OUTBOX_RETENTION_HOURS)
+    total = 0
+    try:
+        while True:
+            ids = db.session.execute(
+                select(ReservationEvent.id)
+                .where(ReservationEvent.processed_at < limite)
+                .order_by(ReservationEvent.id)
+                .limit(OUTBOX_ARCHIVE_BATCH)
+            ).scalars().all()
+            if not ids:
+                break
+
+            origen = select(*[getattr(ReservationEvent, c) for c in COLUMNAS_ARCHIVO]).where(ReservationEvent.id.in_(ids))
+            db.session.execute(insert(ReservationEventArchive).from_select(COLUMNAS_ARCHIVO, origen))
+            db.session.execute(delete(ReservationEvent).where(ReservationEvent.id.in_(ids)))
+            db.session.commit()
+
+            total += len(ids)
+            if len(ids) < OUTBOX_ARCHIVE_BATCH:
+                break
+    except Exception as e:
+        print(f"Error archiving outbox events: {e}")
+        db.session.rollback()
+
+    if total:
+        print(f"[{datetime.now()}] Archived {total} processed events older than {OUTBOX_RETENTION_HOURS}h")
+    return total
+
+
+def estado_outbox():
+    """(eventos pendientes, antigüedad en segundos del pendiente más viejo) de la Outbox."""
+    pendientes, mas_antiguo = db.session.execute(
+        select(func.count(ReservationEvent.id), func.min(ReservationEvent.created_at))
+        .where(ReservationEvent.processed_at.is_(None))
+    ).one()
+    db.session.rollback()
+    antiguedad = (datetime.now() - mas_antiguo).total_seconds() if mas_antiguo else 0.0
+    return pendientes, antiguedad
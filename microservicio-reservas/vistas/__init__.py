@@ -1 +1 @@
-from .vistas import VistaReservas, VistaReserva, VistaPagoReserva, VistaReservasNaive, VistaPagoReservaNaive
+from .vistas import VistaReservas, VistaReservasBulk, VistaReserva, VistaPagoReserva, VistaReplicasPago, VistaReservasNaive, VistaPagoReservaNaive
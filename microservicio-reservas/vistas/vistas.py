@@ -1,7 +1,12 @@
 from flask import request
 from flask_restful import Resource
 from modelos import db, Reserva, ReservationEvent
-import json
+from notificaciones import notificar_evento
+from idempotencia import idempotente, IDEMPOTENCY_HEADER
+from masivo import normalizar_reserva, crear_reservas, ErrorMasivo
+from eventos import codificar
+import io
+import time
 
 class VistaReservas(Resource):
     """
@@ -26,10 +31,19 @@ class VistaReservas(Resource):
     5. Observar logs de Inventario:
        - Detectará eventos pendientes y los procesará ("Found X pending events").
        - Actualizará su stock local.
+
+    Con el header `Idempotency-Key`, un reintento del mismo POST no crea una segunda
+    reserva ni un segundo evento: recibe la respuesta original.
     """
+    @idempotente
     def post(self):
         try:
             data = request.get_json()
+            # El evento lleva producto y cantidad: Inventario descuenta stock por producto
+            linea, error = normalizar_reserva(data)
+            if error:
+                return {"error": error}, 400
+            producto, cantidad, monto = linea
             
             # ---------------------------------------------------------------------
             # PASO 1: TRANSACCIÓN LOCAL (Reserva)
@@ -37,7 +51,7 @@ class VistaReservas(Resource):
             # ---------------------------------------------------------------------
             nueva_reserva = Reserva(
                 cliente=data.get('cliente', 'Anonimo'),
-                monto=data.get('monto', 0.0)
+                monto=monto
             )
             db.session.add(nueva_reserva)
             db.session.flush() # Para obtener ID
@@ -46,13 +60,18 @@ class VistaReservas(Resource):
             # PASO 2: CREACIÓN DEL EVENTO DE DOMINIO (Outbox)
             # Creamos un registro 'ReservationEvent' con estado inicial 'procesado = NULL'.
             # Esto actúa como cola de mensajes persistente dentro de la misma DB.
+            # El payload es el sobre binario de eventos.py (sólo lo que usa Inventario).
             # ---------------------------------------------------------------------
             evento = ReservationEvent(
                 event_type='RESERVATION_CREATED',
                 reservation_id=nueva_reserva.id,
-                payload=json.dumps(data)
+                payload=codificar('RESERVATION_CREATED', nueva_reserva.id, producto, cantidad, monto)
             )
             db.session.add(evento)
+            db.session.flush()
+            # Modo push (opcional): NOTIFY en la misma transacción para que Inventario
+            # procese el evento de inmediato en lugar de esperar el polling.
+            notificar_evento(db.session, evento.id)
             
             # ---------------------------------------------------------------------
             # PASO 3: COMMIT ATÓMICO
@@ -71,13 +90,51 @@ class VistaReservas(Resource):
             db.session.rollback()
             return {"error": str(e)}, 500
 
+class VistaReservasBulk(Resource):
+    """
+    CREACIÓN MASIVA CON OUTBOX (H1)
+
+    Acepta un arreglo JSON de reservas o NDJSON (`Content-Type: application/x-ndjson`, un
+    objeto por línea, leído como stream). Cada lote de RESERVAS_BULK_LOTE inserta sus
+    reservas y sus eventos con dos INSERT ... RETURNING multi-fila en UNA transacción, así
+    que la garantía de la Outbox se mantiene: no hay reserva confirmada sin su evento.
+    Con `?atomico=1` todo el request es una sola transacción.
+
+    Responde 201 si se crearon todas, 207 si algunas fallaron (resultado por ítem, en el
+    orden del body, con `id` y `evento_id` o `error`) y 400 si ninguna era válida.
+    """
+    @idempotente
+    def post(self):
+        es_ndjson = (request.mimetype or "").endswith("ndjson")
+        atomico = request.args.get('atomico', '0') == '1'
+        # Con Idempotency-Key el body ya se leyó entero (huella): se parsea desde esa copia
+        cuerpo = io.BytesIO(request.get_data()) if request.headers.get(IDEMPOTENCY_HEADER) else request.stream
+        try:
+            resultados, creadas, fallidas = crear_reservas(cuerpo, es_ndjson, atomico)
+        except ErrorMasivo as e:
+            return {"error": str(e)}, e.estado_http
+        except Exception as e:
+            db.session.rollback()
+            return {"error": str(e)}, 500
+
+        if not creadas and fallidas:
+            estado = 400
+        else:
+            estado = 207 if fallidas else 201
+        return {
+            "mensaje": f"{creadas} reservas creadas (eventos pendientes de sync)",
+            "creadas": creadas,
+            "fallidas": fallidas,
+            "resultados": resultados,
+        }, estado
+
 class VistaReserva(Resource):
     def get(self, id_reserva):
         return {"mensaje": "Detalle reserva"}
 
-import requests
-from collections import Counter
-import concurrent.futures
+from cliente_http import cliente_http, deadline_entrante
+from votacion import motor_votacion, configuracion_votacion, PAGOS_PRESUPUESTO_SEGUNDOS
+from reputacion import reputacion_replicas
 
 class VistaPagoReserva(Resource):
     """
@@ -89,85 +146,88 @@ class VistaPagoReserva(Resource):
     
     Flujo:
     1.  Scatter: Envía la misma petición a N réplicas en paralelo.
-    2.  Gather: Recolecta respuestas, descartando fallos de conexión (timeouts/500).
-    3.  Vote: Agrupa respuestas idénticas.
-    4.  Decide: Si una respuesta tiene > 50% de los votos, se acepta como la "verdad".
+    2.  Gather: Recolecta respuestas a medida que llegan, descartando fallos (timeouts/500).
+    3.  Vote: Agrupa respuestas equivalentes (tolerancia numérica), ponderadas por el peso de cada réplica.
+    4.  Decide: Apenas una respuesta alcanza la mayoría se acepta como la "verdad",
+        sin esperar a las réplicas más lentas (terminación temprana).
 
     PARA PROBAR ESTA TÁCTICA:
-    1. El sistema simula 5 réplicas de pagos (IDs 1-5).
+    1. El sistema simula 5 réplicas de pagos (IDs 1-5); configurable con PAGOS_REPLICAS.
     2. La réplica #5 está programada para fallar (retorna valor x10).
     3. En el Frontend, clic en 'Pagar Reserva (Consenso)'.
        - El sistema hace Fan-Out (5 peticiones paralelas).
     4. Observar la respuesta:
        - ÉXITO: "Pago Exitoso (Consenso)".
        - El algoritmo de votación descartó la respuesta errónea de la réplica 5.
-       - Se confirma que la mayoría (4 vs 1) coincidió en el valor correcto.
+       - Se confirma que la mayoría (>= 3 de 5) coincidió en el valor correcto.
+
+    Con el header `Idempotency-Key`, un reintento no dispara otra ronda de votación.
+    El 409 por consenso fallido es transitorio: no se guarda y el reintento vuelve a votar.
     """
+    @idempotente(transitorios=(409,))
     def post(self, id_reserva):
-        # URL del servicio de pagos (Orquestador llama a Pagos)
-        PAYMENTS_URL = "http://127.0.0.1:5003/pago"
-        
-        # Simular 5 replicas llamando al mismo servicio con diferente ID
-        # En producción, serían 5 URLs/IPs distintas.
-        param_list = [{"replica_id": i, "amount": 45.0} for i in range(1, 6)]
-        
-        results = []
-        
-        def call_replica(params):
-            """Función auxiliar para llamar a una réplica individual con timeout."""
-            try:
-                resp = requests.post(PAYMENTS_URL, json=params, timeout=2)
-                if resp.status_code == 200:
-                    return resp.json()['processed_amount']
-            except:
-                return None
-            return None
+        # Réplicas de Pagos desde configuración (PAGOS_REPLICAS / PAGOS_URL + PAGOS_N_REPLICAS).
+        # Por defecto se simulan 5 réplicas llamando al mismo servicio con diferente ID;
+        # en producción serían N URLs/IPs distintas, opcionalmente con pesos.
+        configuracion = configuracion_votacion
+
+        # El presupuesto de la votación nunca excede el deadline del cliente (X-Request-Deadline):
+        # no tiene sentido seguir votando cuando quien preguntó ya se rindió.
+        presupuesto = PAGOS_PRESUPUESTO_SEGUNDOS
+        deadline = deadline_entrante(request.headers)
+        if deadline is not None:
+            presupuesto = min(presupuesto, deadline - time.time())
+            if presupuesto <= 0:
+                return {"error": "Deadline exceeded"}, 504
 
         # ---------------------------------------------------------------------
-        # PASO 1: EJECUCIÓN PARALELA (FAN-OUT)
-        # Usamos hilos para no bloquear el proceso esperando a cada réplica secuencialmente.
-        # Si una réplica es lenta, no afecta el tiempo total de las demás.
-        # ---------------------------------------------------------------------
-        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-            results = list(executor.map(call_replica, param_list))
-        
-        # ---------------------------------------------------------------------
-        # PASO 2: FILTRADO DE FALLOS
-        # Ignoramos réplicas que no respondieron (None) o dieron error 500.
-        # Solo votan las que están vivas.
+        # PASO 1-3: FAN-OUT, FILTRADO DE FALLOS Y CONTEO DE VOTOS
+        # El motor compartido (hilos + conexiones keep-alive reutilizados) envía las
+        # peticiones en paralelo, ignora réplicas caídas (None) y agrupa respuestas
+        # equivalentes dentro de la tolerancia numérica. Ej: {45.0: 4 votos, 450.0: 1 voto}
+        # Con pesos 1 y N=5, la mayoría es 3 (5 // 2 + 1): al llegar el 3er voto
+        # coincidente se decide y se cancelan las réplicas rezagadas.
         # ---------------------------------------------------------------------
-        valid_results = [r for r in results if r is not None]
+        # Las réplicas en cuarentena (por discrepar de la mayoría de forma persistente)
+        # quedan fuera del fan-out y sólo se sondean cada cierto tiempo.
+        resultado = motor_votacion.votar(
+            configuracion, {"amount": 45.0}, presupuesto=presupuesto, reputacion=reputacion_replicas
+        )
         
-        if not valid_results:
+        if not resultado.respuestas:
             return {"error": "Payment failed completely (0 replicas available)"}, 500
             
-        # ---------------------------------------------------------------------
-        # PASO 3: CONTEO DE VOTOS
-        # Agrupamos las respuestas idénticas.
-        # Ej: {45.0: 4 votos, 450.0: 1 voto}
-        # ---------------------------------------------------------------------
-        counts = Counter(valid_results)
-        most_common_amount, votes = counts.most_common(1)[0]
-        
         # ---------------------------------------------------------------------
         # PASO 4: REGLA DE MAYORÍA (CONSENSO)
-        # Para N=5, la mayoría simple es 3 (5 // 2 + 1).
-        # Si la opción ganadora no alcanza este umbral, el sistema no confía.
+        # Si la opción ganadora no alcanza el umbral, el sistema no confía.
         # ---------------------------------------------------------------------
-        if votes >= 3:
+        if resultado.valor is not None:
             return {
                 "mensaje": "Pago Exitoso (Consenso)",
-                "monto_acordado": most_common_amount,
-                "votos": votes,
-                "distribucion_votos": dict(counts)
+                "monto_acordado": resultado.valor,
+                "votos": resultado.votos,
+                "quorum": configuracion.descripcion_quorum(),
+                "distribucion_votos": resultado.distribucion,
+                "replicas_consultadas": resultado.enviadas,
+                "respuestas": resultado.respuestas,
+                "terminacion_temprana": resultado.terminacion_temprana
             }, 200
         else:
             return {
                 "error": "Consenso fallido (No majority agreement)",
-                "distribucion_votos": dict(counts)
+                "quorum": configuracion.descripcion_quorum(),
+                "distribucion_votos": resultado.distribucion
             }, 409
 
 
+class VistaReplicasPago(Resource):
+    """Estadísticas de reputación por réplica de Pagos (acuerdo, errores, latencia, cuarentena)."""
+    def get(self):
+        return {
+            "quorum": configuracion_votacion.descripcion_quorum(),
+            "replicas": reputacion_replicas.estadisticas()
+        }, 200
+
 # =============================================================================
 # VERSIONES NAIVE (SIN TÁCTICAS) — Para contraste experimental
 # =============================================================================
@@ -207,7 +267,7 @@ class VistaPagoReservaNaive(Resource):
         PAYMENTS_URL = "http://127.0.0.1:5003/pago"
 
         try:
-            resp = requests.post(PAYMENTS_URL, json={"replica_id": 1, "amount": 45.0}, timeout=5)
+            resp = cliente_http.post(PAYMENTS_URL, json={"replica_id": 1, "amount": 45.0}, timeout=5, upstream="pagos")
             if resp.status_code == 200:
                 data = resp.json()
                 return {
@@ -0,0 +1,255 @@
+import os
+import json
+import math
+import time
+import concurrent.futures
+from cliente_http import cliente_http, cabecera_deadline
+from reputacion import ACUERDO, DESACUERDO, ERROR, SIN_DECISION
+
+# Presupuesto total de la votación: ninguna réplica puede consumir más que lo que resta.
+PAGOS_PRESUPUESTO_SEGUNDOS = float(os.environ.get("PAGOS_PRESUPUESTO_SEGUNDOS", 2.0))
+# Hilos compartidos por todas las votaciones del proceso (antes: un pool nuevo por request).
+PAGOS_MAX_WORKERS = int(os.environ.get("PAGOS_MAX_WORKERS", 64))
+# Por debajo de este timeout no vale la pena iniciar la llamada.
+TIMEOUT_MINIMO_SEGUNDOS = 0.05
+
+# Réplicas de Pagos. PAGOS_REPLICAS acepta:
+#   - JSON: '[{"id": 1, "url": "http://host-a/pago", "peso": 2}, {"id": 2, "url": "http://host-b/pago"}]'
+#   - Lista de URLs separadas por coma: 'http://host-a/pago,http://host-b/pago' (ids 1..N, peso 1)
+# Sin PAGOS_REPLICAS se simulan PAGOS_N_REPLICAS réplicas sobre PAGOS_URL (una por replica_id).
+PAGOS_URL = os.environ.get("PAGOS_URL", "http://127.0.0.1:5003/pago")
+PAGOS_N_REPLICAS = int(os.environ.get("PAGOS_N_REPLICAS", 5))
+# Peso mínimo para decidir. Por defecto: mayoría estricta del peso total (N=5 -> 3 votos).
+PAGOS_QUORUM = os.environ.get("PAGOS_QUORUM")
+# Tolerancia numérica: montos a esta distancia cuentan como el mismo voto (45.0 == 45.0000001).
+PAGOS_TOLERANCIA_ABS = float(os.environ.get("PAGOS_TOLERANCIA_ABS", 1e-6))
+PAGOS_TOLERANCIA_REL = float(os.environ.get("PAGOS_TOLERANCIA_REL", 1e-9))
+# Peso por reputación: el voto de cada réplica vale su peso configurado por su tasa de acuerdo
+# con la mayoría. El quórum sigue calculándose sobre los pesos configurados.
+PAGOS_PESO_POR_REPUTACION = os.environ.get("PAGOS_PESO_POR_REPUTACION", "false").lower() == "true"
+
+
+class Replica:
+    def __init__(self, id, url, peso=1.0):
+        self.id = int(id)
+        self.url = url
+        self.peso = float(peso)
+
+    def __repr__(self):
+        return f"Replica(id={self.id}, url={self.url!r}, peso={self.peso})"
+
+
+class ConfiguracionVotacion:
+    """
+    Réplicas participantes y regla de quórum.
+
+    Las réplicas con peso 0 quedan fuera del fan-out (útil para sacar del camino
+    crítico una réplica lenta sin cambiar código).
+    """
+    def __init__(self, replicas, quorum=None):
+        self.replicas = [r for r in replicas if r.peso > 0]
+        if not self.replicas:
+            raise ValueError("Se requiere al menos una réplica de Pagos con peso > 0")
+        self.peso_total = sum(r.peso for r in self.replicas)
+        self.quorum = float(quorum) if quorum is not None else None
+
+    def alcanza_quorum(self, peso):
+        if self.quorum is not None:
+            return peso >= self.quorum
+        return peso * 2 > self.peso_total
+
+    def descripcion_quorum(self):
+        if self.quorum is not None:
+            return self.quorum
+        # Menor peso entero que es mayoría estricta (N=5 -> 3)
+        return math.floor(self.peso_total / 2) + 1
+
+    @classmethod
+    def desde_entorno(cls):
+        crudo = os.environ.get("PAGOS_REPLICAS", "").strip()
+        if crudo.startswith("["):
+            replicas = [
+                Replica(r.get("id", i), r["url"], r.get("peso", 1.0))
+                for i, r in enumerate(json.loads(crudo), start=1)
+            ]
+        elif crudo:
+            replicas = [Replica(i, url.strip()) for i, url in enumerate(crudo.split(","), start=1) if url.strip()]
+        else:
+            replicas = [Replica(i, PAGOS_URL) for i in range(1, PAGOS_N_REPLICAS + 1)]
+        return cls(replicas, quorum=PAGOS_QUORUM)
+
+
+def mismo_voto(a, b):
+    return math.isclose(a, b, rel_tol=PAGOS_TOLERANCIA_REL, abs_tol=PAGOS_TOLERANCIA_ABS)
+
+
+class ConteoVotos:
+    """Agrupa votos numéricos en buckets por tolerancia y acumula su peso."""
+    def __init__(self):
+        self._buckets = []  # [representante, peso, votos]
+
+    def agregar(self, valor, peso):
+        for bucket in self._buckets:
+            if mismo_voto(bucket[0], valor):
+                bucket[1] += peso
+                bucket[2] += 1
+                return
+        self._buckets.append([valor, peso, 1])
+
+    def ganador(self):
+        """(valor, peso, votos) del bucket con más peso, o (None, 0, 0) si no hay votos."""
+        if not self._buckets:
+            return None, 0.0, 0
+        return tuple(max(self._buckets, key=lambda b: b[1]))
+
+    def distribucion(self):
+        return {valor: votos for valor, _, votos in self._buckets}
+
+
+class ResultadoVotacion:
+    def __init__(self, valor, votos, peso, distribucion, respuestas, enviadas, temprana):
+        self.valor = valor
+        self.votos = votos
+        self.peso = peso
+        self.distribucion = distribucion
+        self.respuestas = respuestas
+        self.enviadas = enviadas
+        self.terminacion_temprana = temprana
+
+
+class MotorVotacion:
+    """
+    Motor de scatter-gather reutilizable para la votación de Pagos (H2).
+
+    - Un único ThreadPoolExecutor para todo el proceso y el cliente HTTP compartido
+      (conexiones keep-alive por host): sin creación de hilos ni handshakes TCP por pago.
+    - Terminación temprana: apenas un valor alcanza el quórum se decide, sin esperar a
+      las réplicas restantes; también se corta si el quórum ya es inalcanzable.
+    - Las llamadas aún no iniciadas se cancelan; las que están en curso terminan solas
+      porque su timeout es el presupuesto restante de la votación.
+    """
+    def __init__(self, max_workers=PAGOS_MAX_WORKERS):
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="votacion")
+
+    def _llamar(self, replica, params, deadline):
+        """Llama a una réplica individual con el tiempo que le queda a la votación: (valor, latencia)."""
+        inicio = time.monotonic()
+        restante = deadline - inicio
+        if restante < TIMEOUT_MINIMO_SEGUNDOS:
+            return None, 0.0
+        try:
+            # Sin reintentos: la redundancia de la votación ya cubre una réplica que falla.
+            # El fin de la votación viaja como deadline para que la réplica no trabaje de más.
+            resp = cliente_http.post(
+                replica.url, json=dict(params, replica_id=replica.id), timeout=restante, upstream="pagos",
+                headers=cabecera_deadline(time.time() + restante),
+            )
+            if resp.status_code == 200:
+                return float(resp.json()['processed_amount']), time.monotonic() - inicio
+        except Exception:
+            pass
+        return None, time.monotonic() - inicio
+
+    def votar(self, configuracion, params, presupuesto=PAGOS_PRESUPUESTO_SEGUNDOS, reputacion=None):
+        """
+        Envía `params` a las réplicas de `configuracion` en paralelo y decide por mayoría
+        ponderada. `valor` es None si ningún bucket alcanzó el quórum.
+
+        Con `reputacion`, el fan-out sólo incluye réplicas sanas (más los sondeos de las que
+        están en cuarentena, cuyo voto no cuenta), y cada respuesta -incluidas las que
+        llegan después de decidir- se registra como acuerdo/desacuerdo con la mayoría.
+        Con PAGOS_PESO_POR_REPUTACION, además, su voto pesa según esa tasa de acuerdo.
+        """
+        if reputacion is not None:
+            replicas, sondeos = reputacion.seleccionar(configuracion)
+        else:
+            replicas, sondeos = configuracion.replicas, []
+        if reputacion is not None and PAGOS_PESO_POR_REPUTACION:
+            factores = reputacion.factores_peso(replicas)
+            pesos = {r.id: r.peso * factores[r.id] for r in replicas}
+        else:
+            pesos = {r.id: r.peso for r in replicas}
+
+        deadline = time.monotonic() + presupuesto
+        pendientes = {
+            self._executor.submit(self._llamar, replica, params, deadline): replica
+            for replica in replicas
+        }
+        futuros_sondeo = {
+            self._executor.submit(self._llamar, replica, params, deadline): replica
+            for replica in sondeos
+        }
+        peso_pendiente = sum(pesos.values())
+        conteo = ConteoVotos()
+        observados = []
+        respuestas = 0
+        valor, peso, votos = None, 0.0, 0
+
+        while pendientes:
+            restante = deadline - time.monotonic()
+            if restante <= 0:
+                break
+            hechos, _ = concurrent.futures.wait(
+                pendientes, timeout=restante, return_when=concurrent.futures.FIRST_COMPLETED
+            )
+            for futuro in hechos:
+                replica = pendientes.pop(futuro)
+                peso_pendiente -= pesos[replica.id]
+                resultado, latencia = futuro.result()
+                observados.append((replica, resultado, latencia))
+                if resultado is not None:
+                    conteo.agregar(resultado, pesos[replica.id])
+                    respuestas += 1
+            valor, peso, votos = conteo.ganador()
+            if configuracion.alcanza_quorum(peso):
+                break
+            if not configuracion.alcanza_quorum(peso + peso_pendiente):
+                # Ni con todas las réplicas restantes se llega al quórum
+                break
+
+        decidido = configuracion.alcanza_quorum(peso)
+        decision = valor if decidido else None
+
+        rezagados = {futuro: replica for futuro, replica in pendientes.items() if not futuro.cancel()}
+        if reputacion is not None:
+            self._registrar_reputacion(reputacion, decision, observados, rezagados, futuros_sondeo)
+
+        return ResultadoVotacion(
+            valor=decision,
+            votos=votos,
+            peso=peso,
+            distribucion=conteo.distribucion(),
+            respuestas=respuestas,
+            enviadas=len(replicas),
+            temprana=decidido and bool(pendientes),
+        )
+
+    @staticmethod
+    def _registrar_reputacion(reputacion, decision, observados, rezagados, sondeos):
+        def clasificar(resultado):
+            if resultado is None:
+                return ERROR
+            if decision is None:
+                return SIN_DECISION
+            return ACUERDO if mismo_voto(resultado, decision) else DESACUERDO
+
+        for replica, resultado, latencia in observados:
+            reputacion.registrar(replica.id, clasificar(resultado), latencia)
+
+        # Las respuestas que llegan después de decidir también cuentan para la reputación
+        def al_terminar(replica, sondeo):
+            def callback(futuro):
+                if futuro.cancelled():
+                    return
+                resultado, latencia = futuro.result()
+                reputacion.registrar(replica.id, clasificar(resultado), latencia, sondeo=sondeo)
+            return callback
+
+        for futuro, replica in rezagados.items():
+            futuro.add_done_callback(al_terminar(replica, sondeo=False))
+        for futuro, replica in sondeos.items():
+            futuro.add_done_callback(al_terminar(replica, sondeo=True))
+
+
+motor_votacion = MotorVotacion()
+configuracion_votacion = ConfiguracionVotacion.desde_entorno()
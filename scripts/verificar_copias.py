@@ -0,0 +1,76 @@
+"""
+Verifica que los módulos compartidos sigan idénticos en todos los servicios.
+
+Cada microservicio se despliega por separado (su propio directorio es la raíz de la app),
+así que los módulos comunes viven copiados en cada uno. Al cambiar uno hay que copiarlo al
+resto; este script falla si alguna copia quedó distinta.
+
+Uso:
+    python scripts/verificar_copias.py
+"""
+import ast
+import hashlib
+import os
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Módulo -> servicios que tienen una copia
+COPIAS = {
+    "metricas.py": ["api-gateway", "microservicio-analisis", "microservicio-busqueda", "microservicio-inventario",
+                    "microservicio-monitor", "microservicio-pagos", "microservicio-reservas"],
+    "liderazgo.py": ["microservicio-analisis", "microservicio-inventario", "microservicio-reservas"],
+    "cliente_http.py": ["api-gateway", "microservicio-monitor", "microservicio-reservas"],
+    "eventos.py": ["microservicio-inventario", "microservicio-reservas"],
+}
+# Hooks de gunicorn compartidos por los servicios con scheduler + líder (el resto del
+# gunicorn.conf.py -puerto, hilos- es propio de cada servicio)
+HOOKS_GUNICORN = ["on_starting", "post_worker_init", "worker_int"]
+SERVICIOS_CON_LIDER = ["microservicio-analisis", "microservicio-inventario", "microservicio-reservas"]
+
+
+def huella(contenido):
+    return hashlib.sha256(contenido.encode("utf-8")).hexdigest()[:12]
+
+
+def hooks(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        fuente = f.read()
+    funciones = {n.name: n for n in ast.parse(fuente).body if isinstance(n, ast.FunctionDef)}
+    return "\n".join(
+        ast.get_source_segment(fuente, funciones[nombre]) if nombre in funciones else f"# falta {nombre}"
+        for nombre in HOOKS_GUNICORN
+    )
+
+
+def comparar(nombre, contenidos):
+    """Imprime el resultado de un grupo de copias; True si todas coinciden."""
+    huellas = {servicio: huella(contenido) for servicio, contenido in contenidos.items()}
+    if len(set(huellas.values())) == 1:
+        print(f"OK    {nombre} ({len(huellas)} copies)")
+        return True
+    print(f"DIFF  {nombre}")
+    for servicio, h in huellas.items():
+        print(f"        {h}  {servicio}")
+    return False
+
+
+def main():
+    iguales = True
+    for modulo, servicios in COPIAS.items():
+        contenidos = {}
+        for servicio in servicios:
+            with open(os.path.join(ROOT, servicio, modulo), encoding="utf-8") as f:
+                contenidos[servicio] = f.read()
+        iguales &= comparar(modulo, contenidos)
+    iguales &= comparar(
+        "gunicorn.conf.py hooks",
+        {s: hooks(os.path.join(ROOT, s, "gunicorn.conf.py")) for s in SERVICIOS_CON_LIDER},
+    )
+    if not iguales:
+        print("Shared modules diverged: copy the intended version to every service listed above")
+    return 0 if iguales else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())